@@ -1,5 +1,5 @@
 import React, { useEffect, useState, useRef } from 'react';
-import { initializeSocket, getSocket, sendMessage, onReceiveMessage, joinUserRoom, sendReaction, onReaction, sendTyping, onTyping, onMessageSentAck, sendSticker, requestContactsList, onCommandResponse, sendFriendRequest, onFriendRequestReceived, sendFriendAccept, sendFriendReject, onFriendAccepted, onFriendRejected, sendBlockUser, sendUnblockUser, onUserBlocked, requestContactsSync, onContactUpdated, onUserJoined, onUserOffline } from '../../services/socket';
+import { initializeSocket, getSocket, sendMessage, onReceiveMessage, joinUserRoom, sendReaction, removeReaction, onReaction, sendTyping, onTyping, onMessageSentAck, sendSticker, requestContactsList, onCommandResponse, sendFriendRequest, onFriendRequestReceived, sendFriendAccept, sendFriendReject, onFriendAccepted, onFriendRejected, sendBlockUser, sendUnblockUser, onUserBlocked, requestContactsSync, onContactUpdated, onUserJoined, onUserOffline } from '../../services/socket';
 import { showToast, showSystemNotification, playSound, showMessageToast } from '../../services/notifications';
 import api, { userAPI, messageAPI, groupAPI } from '../../services/api';
 import profileSync from '../../services/profileSync';
@@ -283,6 +283,8 @@ const ChatBox = () => {
   // New states for reply/forward/reaction
   const [replyTo, setReplyTo] = useState(null);
   const [reactions, setReactions] = useState({});
+  // { msgId: { emoji: true | false } } for the current user's own live reaction changes
+  const [myReactions, setMyReactions] = useState({});
   const [remotePeerIsTyping, setRemotePeerIsTyping] = useState(false);
   
   // ReactionButton state
@@ -312,6 +314,11 @@ const ChatBox = () => {
   
   // Ref để scroll xuống cuối chat
   const messagesEndRef = useRef(null);
+  const messagesAreaRef = useRef(null);
+  // Cursor of the open conversation's history (X-Has-More / X-Next-Before-Id headers)
+  const historyRef = useRef({ key: null, beforeId: null, hasMore: false, loading: false });
+  // Scroll height/top to restore after older messages are prepended
+  const scrollRestoreRef = useRef(null);
   const fileInputRef = useRef(null);
   const inputRef = useRef(null);
   const isDev = process.env.NODE_ENV === 'development';
@@ -952,18 +959,19 @@ const ChatBox = () => {
       if (isDev) console.debug('[REACTION]', data);
         setReactions((prev) => {
           const msgId = data.message_id;
-          const existing = prev[msgId] || [];
-          // Add reaction if not already present (avoid duplicates)
-          const reactionExists = existing.some(
-            (r) => r.reaction === data.reaction && r.user_id === data.user_id
-          );
-          if (reactionExists) return prev;
-        
+          // Server sends deltas: { reaction, user_id, delta: +1 | -1, count }.
+          // `count` is the new total, so it overrides the count from history.
           return {
             ...prev,
-            [msgId]: [...existing, { reaction: data.reaction, user_id: data.user_id }]
+            [msgId]: { ...(prev[msgId] || {}), [data.reaction]: data.count }
           };
         });
+        if (String(data.user_id) === String(currentUserId)) {
+          setMyReactions((prev) => ({
+            ...prev,
+            [data.message_id]: { ...(prev[data.message_id] || {}), [data.reaction]: data.delta > 0 }
+          }));
+        }
     });
 
     // Presence: listen for users joining/leaving to update online status in lists
@@ -1351,6 +1359,22 @@ const ChatBox = () => {
           return;
         }
 
+        // Admin rebroadcast: a batch of profiles, merged without a toast per user
+        if (ev === 'PROFILES_UPDATED' && Array.isArray(data)) {
+          const byId = new Map(data.map((u) => [String(u.id), u]));
+          setUsers((prev) => prev.map((p) => {
+            const u = byId.get(String(p.id));
+            return u ? { ...p, ...u, avatar_url: cacheBustUrl(u.avatar_url) || p.avatar_url } : p;
+          }));
+          try {
+            if (selectedUser && byId.has(String(selectedUser.id))) {
+              const u = byId.get(String(selectedUser.id));
+              setSelectedUser((s) => ({ ...s, ...u, avatar_url: cacheBustUrl(u.avatar_url) || s.avatar_url }));
+            }
+          } catch (e) {}
+          return;
+        }
+
         // CONTACT_UPDATED may carry an array of matches (from contacts sync)
         if (ev === 'CONTACT_UPDATED' && Array.isArray(data)) {
           // merge contacts into users list
@@ -1437,8 +1461,15 @@ const ChatBox = () => {
     }
   }, [currentUserId, users]);
 
-  // Auto-scroll xuống cuối khi có tin nhắn mới
+  // Auto-scroll xuống cuối khi có tin nhắn mới (giữ nguyên vị trí khi vừa tải tin cũ hơn)
   useEffect(() => {
+    const restore = scrollRestoreRef.current;
+    if (restore && messagesAreaRef.current) {
+      scrollRestoreRef.current = null;
+      const el = messagesAreaRef.current;
+      el.scrollTop = el.scrollHeight - restore.height + restore.top;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
@@ -1714,31 +1745,79 @@ const ChatBox = () => {
     return () => clearTimeout(t);
   }, [searchQuery]);
 
+  // Chuẩn hoá một trang lịch sử (1:1 hoặc group) sang dạng UI dùng
+  const normalizeHistory = (raw, isGroup) => {
+    const seen = new Set();
+    return raw.reduce((acc, m) => {
+      if (seen.has(m.id)) return acc;
+      seen.add(m.id);
+      const timestamp = m.timestamp ? new Date(m.timestamp).toISOString() : new Date().toISOString();
+      const msgCopy = { ...m };
+      if (isGroup) {
+        // server returns sender info for convenience: map to fields expected by UI
+        msgCopy.sender_username = m.sender_username || m.sender_name || msgCopy.sender_username;
+        msgCopy.sender_name = m.sender_name || msgCopy.sender_name;
+      } else if ((!msgCopy.message_type || msgCopy.message_type === 'text') && msgCopy.content && typeof msgCopy.content === 'string') {
+        const lower = msgCopy.content.toLowerCase();
+        if (lower.endsWith('.gif') || lower.endsWith('.png') || lower.endsWith('.jpg') || lower.includes('giphy.com') || lower.includes('media.giphy.com')) {
+          msgCopy.message_type = 'sticker';
+          msgCopy.sticker_url = msgCopy.sticker_url || msgCopy.content;
+        }
+      }
+      acc.push({ ...msgCopy, timestamp, isSent: msgCopy.sender_id === currentUserId });
+      return acc;
+    }, []);
+  };
+
+  const readHistoryCursor = (resp) => ({
+    hasMore: resp.headers?.['x-has-more'] === 'true',
+    beforeId: resp.headers?.['x-next-before-id'] || null,
+  });
+
+  // Tải trang cũ hơn khi cuộn lên đầu, cho tới khi X-Has-More = false
+  const loadOlderMessages = async () => {
+    const cursor = historyRef.current;
+    if (!cursor.hasMore || cursor.loading || !cursor.beforeId) return;
+    const key = selectedGroup ? `group-${selectedGroup.id}` : selectedUser ? `user-${selectedUser.id}` : null;
+    if (!key || key !== cursor.key) return;
+    cursor.loading = true;
+    try {
+      const page = { before_id: cursor.beforeId };
+      const resp = selectedGroup
+        ? await groupAPI.getGroupMessages(selectedGroup.id, page)
+        : await messageAPI.getMessages(currentUserId, selectedUser.id, page);
+      // the conversation may have changed while the page was loading
+      if (historyRef.current !== cursor) return;
+      Object.assign(cursor, readHistoryCursor(resp));
+      const older = normalizeHistory(resp.data || [], !!selectedGroup);
+      if (older.length === 0) return;
+      const el = messagesAreaRef.current;
+      if (el) scrollRestoreRef.current = { height: el.scrollHeight, top: el.scrollTop };
+      setMessages((prev) => {
+        const known = new Set(prev.map((m) => m.id));
+        return [...older.filter((m) => !known.has(m.id)), ...prev];
+      });
+    } catch (err) {
+      console.error('Lỗi tải tin nhắn cũ hơn:', err);
+    } finally {
+      cursor.loading = false;
+    }
+  };
+
+  const handleMessagesScroll = (e) => {
+    if (e.currentTarget.scrollTop < 80) loadOlderMessages();
+  };
+
   // Tải messages cho user hoặc group (group ưu tiên)
   useEffect(() => {
     if (!currentUserId) return;
+    historyRef.current = { key: null, beforeId: null, hasMore: false, loading: false };
 
     const loadUserMessages = async (user) => {
       try {
         const response = await messageAPI.getMessages(currentUserId, user.id);
-        const raw = response.data || [];
-        const seen = new Set();
-        const normalized = raw.reduce((acc, m) => {
-          if (seen.has(m.id)) return acc;
-          seen.add(m.id);
-          const timestamp = m.timestamp ? new Date(m.timestamp).toISOString() : new Date().toISOString();
-          const msgCopy = { ...m };
-          if ((!msgCopy.message_type || msgCopy.message_type === 'text') && msgCopy.content && typeof msgCopy.content === 'string') {
-            const lower = msgCopy.content.toLowerCase();
-            if (lower.endsWith('.gif') || lower.endsWith('.png') || lower.endsWith('.jpg') || lower.includes('giphy.com') || lower.includes('media.giphy.com')) {
-              msgCopy.message_type = 'sticker';
-              msgCopy.sticker_url = msgCopy.sticker_url || msgCopy.content;
-            }
-          }
-          acc.push({ ...msgCopy, timestamp, isSent: msgCopy.sender_id === currentUserId });
-          return acc;
-        }, []);
-        setMessages(normalized);
+        historyRef.current = { key: `user-${user.id}`, ...readHistoryCursor(response), loading: false };
+        setMessages(normalizeHistory(response.data || [], false));
       } catch (error) {
         console.error('Lỗi tải messages (user):', error);
       }
@@ -1747,20 +1826,8 @@ const ChatBox = () => {
     const loadGroupMessages = async (group) => {
       try {
         const resp = await groupAPI.getGroupMessages(group.id);
-        const raw = resp.data || [];
-        const seen = new Set();
-        const normalized = raw.reduce((acc, m) => {
-          if (seen.has(m.id)) return acc;
-          seen.add(m.id);
-          const timestamp = m.timestamp ? new Date(m.timestamp).toISOString() : new Date().toISOString();
-          const msgCopy = { ...m };
-          // server returns sender info for convenience: map to fields expected by UI
-          msgCopy.sender_username = m.sender_username || m.sender_name || msgCopy.sender_username;
-          msgCopy.sender_name = m.sender_name || msgCopy.sender_name;
-          acc.push({ ...msgCopy, timestamp, isSent: msgCopy.sender_id === currentUserId });
-          return acc;
-        }, []);
-        setMessages(normalized);
+        historyRef.current = { key: `group-${group.id}`, ...readHistoryCursor(resp), loading: false };
+        setMessages(normalizeHistory(resp.data || [], true));
       } catch (err) {
         console.error('Lỗi tải messages (group):', err);
       }
@@ -2829,7 +2896,7 @@ const ChatBox = () => {
             </div>
 
             {/* Messages Area */}
-            <div className="messages-area">
+            <div className="messages-area" ref={messagesAreaRef} onScroll={handleMessagesScroll}>
               {/* Only show messages that belong to the currently selected conversation.
                   - If a group is selected: show messages with matching `group_id`.
                   - If a 1:1 user is selected: show messages without `group_id` where the
@@ -2857,22 +2924,15 @@ const ChatBox = () => {
                 }
 
                 return visibleMessages.map((msg, idx) => {
-                  // Merge reactions from state into message object
+                  // History pages carry { emoji: count }; live deltas in state win, zero counts are hidden
+                  const counts = { ...(msg.reactions || {}), ...(reactions[msg.id] || {}) };
+                  // my_reactions from history, overridden by my own live add/remove
+                  const mine = { ...Object.fromEntries((msg.my_reactions || []).map((e) => [e, true])), ...(myReactions[msg.id] || {}) };
                   const messageWithReactions = {
                     ...msg,
-                    reactions: reactions[msg.id] || msg.reactions || {}
+                    reactions: Object.fromEntries(Object.entries(counts).filter(([, n]) => n > 0)),
+                    myReactions: Object.keys(mine).filter((e) => mine[e])
                   };
-                  // Transform array of reactions into object format for display
-                  if (Array.isArray(messageWithReactions.reactions)) {
-                    const reactionsObj = {};
-                    messageWithReactions.reactions.forEach((r) => {
-                      if (!reactionsObj[r.reaction]) {
-                        reactionsObj[r.reaction] = [];
-                      }
-                      reactionsObj[r.reaction].push(r.user_id);
-                    });
-                    messageWithReactions.reactions = reactionsObj;
-                  }
 
                   return (
                     <MessageBubble
@@ -2887,7 +2947,12 @@ const ChatBox = () => {
                         inputRef.current?.focus();
                       }}
                       onReaction={(messageId, emoji) => {
-                        sendReaction(messageId, currentUserId, emoji);
+                        // same emoji again takes the reaction back
+                        if (messageWithReactions.myReactions.includes(emoji)) {
+                          removeReaction(messageId, currentUserId, emoji);
+                        } else {
+                          sendReaction(messageId, currentUserId, emoji);
+                        }
                       }}
                       onEmojiHover={(messageId, emoji) => {
                         // Clear any pending clear timeout
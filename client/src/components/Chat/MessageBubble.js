@@ -25,6 +25,8 @@ const formatFileSize = (bytes) => {
 /**
  * MessageBubble - Hiển thị một tin nhắn (sent hoặc received)
  * Props: { message, isSent, onReply, onReaction }
+ * message.myReactions: emojis the current user added; clicking one of those
+ * chips calls onReaction again, which the parent treats as "remove".
  */
 const MessageBubble = ({ message, isSent, isGroup, onReply, onReaction, onEmojiHover, onRetry }) => {
   const [showActions, setShowActions] = useState(false);
@@ -267,11 +269,25 @@ const MessageBubble = ({ message, isSent, isGroup, onReply, onReaction, onEmojiH
       {/* Show reactions if any */}
       {message.reactions && Object.keys(message.reactions).length > 0 && (
         <div style={{ marginTop: '4px', fontSize: '14px' }}>
-          {Object.entries(message.reactions).map(([emoji, users]) => (
-            <span key={emoji} style={{ marginRight: '4px' }}>
-              {emoji}
-            </span>
-          ))}
+          {Object.entries(message.reactions).map(([emoji, count]) => {
+            const mine = (message.myReactions || []).includes(emoji);
+            return (
+              <span
+                key={emoji}
+                onClick={() => onReaction && onReaction(message.id, emoji)}
+                title={mine ? 'Bỏ cảm xúc' : 'Thả cảm xúc'}
+                style={{
+                  marginRight: '4px',
+                  cursor: onReaction ? 'pointer' : 'default',
+                  padding: '0 4px',
+                  borderRadius: '8px',
+                  background: mine ? 'rgba(102, 126, 234, 0.18)' : 'transparent',
+                }}
+              >
+                {emoji}{count > 1 ? ` ${count}` : ''}
+              </span>
+            );
+          })}
         </div>
       )}
 
@@ -237,9 +237,10 @@ export const userAPI = {
 
 // Message APIs
 export const messageAPI = {
-  getMessages: (senderId, receiverId) =>
+  // Newest page by default; pass { before_id } / { after_id } to page (see X-Has-More header)
+  getMessages: (senderId, receiverId, page = {}) =>
     api.get('/messages', {
-      params: { sender_id: senderId, receiver_id: receiverId },
+      params: { sender_id: senderId, receiver_id: receiverId, ...page },
     }),
   
   sendMessage: (senderId, receiverId, content) =>
@@ -249,6 +250,10 @@ export const messageAPI = {
     api.post('/messages/upload', formData),
   
   getConversations: () => api.get('/messages/conversations'),
+
+  // Ranked full-text search; options: { peer_id } or { group_id }, limit, offset (see X-Next-Offset)
+  searchMessages: (q, options = {}) =>
+    api.get('/messages/search', { params: { q, ...options } }),
 };
 
 // Group APIs
@@ -275,7 +280,7 @@ export const groupAPI = {
     }
   },
   removeMemberFromGroup: (groupId, userId) => api.delete(`/groups/${groupId}/members/${userId}`),
-  getGroupMessages: (groupId) => api.get(`/groups/${groupId}/messages`),
+  getGroupMessages: (groupId, page = {}) => api.get(`/groups/${groupId}/messages`, { params: page }),
 };
 
 export default api;
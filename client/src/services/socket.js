@@ -161,6 +161,17 @@ export const sendReaction = (messageId, userId, reaction) => {
   });
 };
 
+// Bỏ reaction đã gửi
+export const removeReaction = (messageId, userId, reaction) => {
+  const sock = getSocket();
+  if (isDev) console.debug('[REMOVE_REACTION] message_id:', messageId, 'reaction:', reaction);
+  sock.emit('remove_reaction', {
+    message_id: messageId,
+    user_id: userId,
+    reaction,
+  });
+};
+
 // Gửi sticker (Giphy, EmojiOne, Twemoji, custom pack)
 export const sendSticker = (senderId, receiverId, stickerId, stickerUrl, opts = {}) => {
   const sock = getSocket();
@@ -0,0 +1,28 @@
+"""Add composite indexes for message history pagination
+
+Revision ID: a3c9e1f27b10
+Revises: 4e76c8a94ee2
+Create Date: 2026-10-18 09:05:12.418233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e1f27b10'
+down_revision = '4e76c8a94ee2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # if_not_exists: databases bootstrapped with db.create_all() already have them
+    op.create_index('ix_message_sender_receiver_id', 'message', ['sender_id', 'receiver_id', 'id'], unique=False, if_not_exists=True)
+    op.create_index('ix_message_group_id_id', 'message', ['group_id', 'id'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_index('ix_message_group_id_id')
+        batch_op.drop_index('ix_message_sender_receiver_id')
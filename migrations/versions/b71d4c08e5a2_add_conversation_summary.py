@@ -0,0 +1,81 @@
+"""Add conversation_summary table and backfill it from message
+
+Revision ID: b71d4c08e5a2
+Revises: a3c9e1f27b10
+Create Date: 2026-10-18 10:12:40.903117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71d4c08e5a2'
+down_revision = 'a3c9e1f27b10'
+branch_labels = None
+depends_on = None
+
+
+PREVIEW_SQL = """
+    CASE WHEN message_type = 'sticker' THEN '[Sticker]'
+         WHEN file_url IS NOT NULL THEN '[File] '
+         ELSE content END
+"""
+
+
+def upgrade():
+    # Derived data: a table left behind by db.create_all() is rebuilt from scratch
+    if sa.inspect(op.get_bind()).has_table('conversation_summary'):
+        op.drop_table('conversation_summary')
+    op.create_table('conversation_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('preview', sa.Text(), nullable=True),
+        sa.Column('last_ts', sa.DateTime(), nullable=True),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'kind', 'target_id', name='uq_conversation_summary_target')
+    )
+    with op.batch_alter_table('conversation_summary', schema=None) as batch_op:
+        batch_op.create_index('ix_conversation_summary_user_last_ts', ['user_id', 'last_ts'], unique=False)
+
+    # Backfill: latest 1:1 message per (owner, peer) ...
+    op.execute(f"""
+        INSERT INTO conversation_summary (user_id, kind, target_id, last_message_id, preview, last_ts, unread_count)
+        SELECT owner_id, 'user', peer_id, id, preview, ts, 0 FROM (
+            SELECT owner_id, peer_id, id, preview, ts,
+                   ROW_NUMBER() OVER (PARTITION BY owner_id, peer_id ORDER BY id DESC) AS rn
+            FROM (
+                SELECT sender_id AS owner_id, receiver_id AS peer_id, id, {PREVIEW_SQL} AS preview, timestamp AS ts
+                FROM message WHERE group_id IS NULL
+                UNION ALL
+                SELECT receiver_id, sender_id, id, {PREVIEW_SQL}, timestamp
+                FROM message WHERE group_id IS NULL AND receiver_id != sender_id
+            ) AS direct
+        ) AS ranked WHERE rn = 1
+    """)
+    # ... and the latest group message for every member of the group
+    op.execute(f"""
+        INSERT INTO conversation_summary (user_id, kind, target_id, last_message_id, preview, last_ts, unread_count)
+        SELECT gm.user_id, 'group', last.group_id, last.id, last.preview, last.ts, 0
+        FROM group_member AS gm
+        JOIN (
+            SELECT group_id, id, preview, ts FROM (
+                SELECT group_id, id, {PREVIEW_SQL} AS preview, timestamp AS ts,
+                       ROW_NUMBER() OVER (PARTITION BY group_id ORDER BY id DESC) AS rn
+                FROM message WHERE group_id IS NOT NULL
+            ) AS ranked WHERE rn = 1
+        ) AS last ON last.group_id = gm.group_id
+        GROUP BY gm.user_id, last.group_id, last.id, last.preview, last.ts
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('conversation_summary', schema=None) as batch_op:
+        batch_op.drop_index('ix_conversation_summary_user_last_ts')
+
+    op.drop_table('conversation_summary')
@@ -0,0 +1,48 @@
+"""Indexes for hot queries and unique pairs on friend / group_member / block
+
+Revision ID: c5f7a9d3e214
+Revises: d2a4c6e8f013
+Create Date: 2026-10-18 12:52:31.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f7a9d3e214'
+down_revision = 'd2a4c6e8f013'
+branch_labels = None
+depends_on = None
+
+
+# (table, columns) that must be unique; duplicates are removed (oldest row kept) first
+UNIQUE_PAIRS = [
+    ('uq_friend_user_friend', 'friend', ['user_id', 'friend_id']),
+    ('uq_group_member_group_user', 'group_member', ['group_id', 'user_id']),
+    ('uq_block_user_target', 'block', ['user_id', 'target_id']),
+]
+
+INDEXES = [
+    ('ix_message_receiver_id_id', 'message', ['receiver_id', 'id']),
+    ('ix_message_timestamp', 'message', ['timestamp']),
+    ('ix_friend_user_status', 'friend', ['user_id', 'status']),
+    ('ix_friend_friend_status', 'friend', ['friend_id', 'status']),
+    ('ix_group_member_user_id', 'group_member', ['user_id']),
+    ('ix_block_target_id', 'block', ['target_id']),
+    ('ix_message_reaction_message_id', 'message_reaction', ['message_id']),
+]
+
+
+def upgrade():
+    for name, table, columns in UNIQUE_PAIRS:
+        cols = ', '.join(columns)
+        op.execute(f'DELETE FROM "{table}" WHERE id NOT IN (SELECT MIN(id) FROM "{table}" GROUP BY {cols})')
+        op.create_index(name, table, columns, unique=True, if_not_exists=True)
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES + UNIQUE_PAIRS):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,29 @@
+"""Add message.file_url (replaces the ALTER TABLE run by app.py on every boot)
+
+Revision ID: d2a4c6e8f013
+Revises: b71d4c08e5a2
+Create Date: 2026-10-18 12:40:07.215934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a4c6e8f013'
+down_revision = 'b71d4c08e5a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # most databases already got the column from the old startup ALTER / migrate_add_file_url.py
+    columns = [c['name'] for c in sa.inspect(op.get_bind()).get_columns('message')]
+    if 'file_url' not in columns:
+        with op.batch_alter_table('message', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('file_url', sa.String(length=500), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_column('file_url')
@@ -0,0 +1,45 @@
+"""Full-text message search index kept in sync by triggers
+
+Revision ID: e1c7d5b9a3f6
+Revises: e8b3f1a6c452
+Create Date: 2026-10-18 17:20:44.905126
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1c7d5b9a3f6'
+down_revision = 'e8b3f1a6c452'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from services import message_search
+    bind = op.get_bind()
+    # db.create_all() may have installed it already; the backfill starts from scratch
+    message_search.install(bind)
+    if bind.dialect.name == 'postgresql':
+        op.execute('TRUNCATE message_search')
+        op.execute("""
+            INSERT INTO message_search (message_id, document)
+            SELECT id, to_tsvector('simple', unaccent(content)) FROM message
+        """)
+    else:
+        op.execute("INSERT INTO message_fts (message_fts) VALUES ('delete-all')")
+        op.execute("""
+            INSERT INTO message_fts (rowid, content)
+            SELECT id, replace(replace(content, 'đ', 'd'), 'Đ', 'D') FROM message
+        """)
+
+
+def downgrade():
+    from services import message_search
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS message_search_sync ON message')
+    else:
+        for name in ('message_fts_insert', 'message_fts_delete', 'message_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
+    message_search.uninstall(bind)
@@ -0,0 +1,49 @@
+"""Unique (message, user, emoji) reactions and the message_reaction_count aggregate
+
+Revision ID: e8b3f1a6c452
+Revises: c5f7a9d3e214
+Create Date: 2026-10-18 16:05:12.318420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3f1a6c452'
+down_revision = 'c5f7a9d3e214'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # reactions of recalled (deleted) messages, then duplicates (oldest row kept)
+    op.execute('DELETE FROM message_reaction WHERE message_id NOT IN (SELECT id FROM message)')
+    op.execute('DELETE FROM message_reaction WHERE id NOT IN '
+               '(SELECT MIN(id) FROM message_reaction GROUP BY message_id, user_id, reaction_type)')
+    op.create_index('uq_message_reaction_message_user_type', 'message_reaction',
+                    ['message_id', 'user_id', 'reaction_type'], unique=True, if_not_exists=True)
+    # covered by the leading column of the unique index
+    op.drop_index('ix_message_reaction_message_id', table_name='message_reaction', if_exists=True)
+
+    # Derived data: a table left behind by db.create_all() is rebuilt from scratch
+    if sa.inspect(op.get_bind()).has_table('message_reaction_count'):
+        op.drop_table('message_reaction_count')
+    op.create_table('message_reaction_count',
+        sa.Column('message_id', sa.Integer(), nullable=False),
+        sa.Column('reaction_type', sa.String(length=50), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['message_id'], ['message.id'], ),
+        sa.PrimaryKeyConstraint('message_id', 'reaction_type')
+    )
+    op.execute("""
+        INSERT INTO message_reaction_count (message_id, reaction_type, count)
+        SELECT message_id, reaction_type, COUNT(*) FROM message_reaction
+        GROUP BY message_id, reaction_type
+    """)
+
+
+def downgrade():
+    op.drop_table('message_reaction_count')
+    op.create_index('ix_message_reaction_message_id', 'message_reaction', ['message_id'], unique=False)
+    op.drop_index('uq_message_reaction_message_user_type', table_name='message_reaction')
@@ -0,0 +1,60 @@
+"""Normalized user search columns with prefix and trigram indexes
+
+Revision ID: f4a2b8c6d1e3
+Revises: e1c7d5b9a3f6
+Create Date: 2026-10-18 18:42:09.117236
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a2b8c6d1e3'
+down_revision = 'e1c7d5b9a3f6'
+branch_labels = None
+depends_on = None
+
+BATCH = 5000
+
+
+def upgrade():
+    from services import user_search
+    from utils.search_text import fold
+    bind = op.get_bind()
+    existing = {c['name'] for c in sa.inspect(bind).get_columns('user')}
+    if 'search_username' not in existing:
+        op.add_column('user', sa.Column('search_username', sa.String(length=80), nullable=True))
+    if 'search_name' not in existing:
+        op.add_column('user', sa.Column('search_name', sa.String(length=120), nullable=True))
+    op.create_index('ix_user_search_username', 'user', ['search_username'], unique=False, if_not_exists=True)
+    op.create_index('ix_user_search_name', 'user', ['search_name'], unique=False, if_not_exists=True)
+
+    # fold() has no SQL equivalent: backfill from Python, in keyset batches
+    update = sa.text('UPDATE "user" SET search_username = :u, search_name = :n WHERE id = :id')
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text('SELECT id, username, display_name FROM "user" WHERE id > :last '
+                                    'ORDER BY id LIMIT :batch'), {'last': last_id, 'batch': BATCH}).all()
+        if not rows:
+            break
+        bind.execute(update, [{'id': i, 'u': fold(u), 'n': fold(d or u)} for i, u, d in rows])
+        last_id = rows[-1][0]
+
+    user_search.install(bind)
+    if bind.dialect.name != 'postgresql':
+        op.execute("INSERT INTO user_search_fts (user_search_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    from services import user_search
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        for name in ('user_search_fts_insert', 'user_search_fts_delete', 'user_search_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
+    user_search.uninstall(bind)
+    op.drop_index('ix_user_search_name', table_name='user')
+    op.drop_index('ix_user_search_username', table_name='user')
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('search_name')
+        batch_op.drop_column('search_username')
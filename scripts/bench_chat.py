@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Load-generation benchmark for the chat backend.
+
+Starts a local backend (server/app.py by default) on a free port with a
+throw-away SQLite database, registers N users, connects one python-socketio
+client per user and runs a mixed workload:
+  - 1:1 messages to a random peer
+  - group messages in one group containing every user
+  - reactions on acknowledged messages
+  - typing start/stop events
+
+Reports p50/p95/p99 of
+  - ACK latency:      send_message -> message_sent_ack on the sender
+  - delivery latency: send_message -> receive_message on each recipient
+and message throughput. --json writes the results to a file so runs can be
+compared commit by commit.
+
+Examples:
+  python3 scripts/bench_chat.py --users 20 --messages 50
+  python3 scripts/bench_chat.py --users 50 --group-messages 10 --json bench.json
+  python3 scripts/bench_chat.py --url http://localhost:5000 --users 10   # existing server
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT, 'server')
+PASSWORD = 'bench-P@ss1'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (values need not be sorted)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+def summarize(values):
+    ms = [v * 1000 for v in values]
+    return {
+        'count': len(ms),
+        'p50_ms': percentile(ms, 50),
+        'p95_ms': percentile(ms, 95),
+        'p99_ms': percentile(ms, 99),
+        'max_ms': max(ms) if ms else None,
+    }
+
+
+class LocalServer:
+    """Run a backend entry point in a subprocess against a temporary SQLite DB."""
+
+    def __init__(self, entry='app.py', port=None, extra_env=None, database_url=None):
+        self.entry = entry
+        self.database_url = database_url
+        self.port = port or free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.tmpdir = tempfile.mkdtemp(prefix='chat-bench-')
+        self.log_path = os.path.join(self.tmpdir, 'server.log')
+        self.extra_env = extra_env or {}
+        self.proc = None
+
+    def start(self, timeout=60):
+        env = dict(os.environ)
+        env.update({
+            'BACKEND_PORT': str(self.port),
+            'BACKEND_HOST': '127.0.0.1',
+            'DATABASE_URL': self.database_url or f"sqlite:///{os.path.join(self.tmpdir, 'bench.db')}",
+            'EXCHANGE_LOG_FILE': os.path.join(self.tmpdir, 'exchange.log.jsonl'),
+            'EXCHANGE_LOG_ECHO': 'false',
+            'ENABLE_NGROK': 'false',
+            'LOG_LEVEL': 'WARNING',
+            # the benchmark floods on purpose
+            'RATE_LIMIT_ENABLED': 'false',
+            'PYTHONUNBUFFERED': '1',
+        })
+        env.update(self.extra_env)
+        self._log = open(self.log_path, 'w')
+        self.proc = subprocess.Popen([sys.executable, self.entry], cwd=SERVER_DIR, env=env,
+                                     stdout=self._log, stderr=subprocess.STDOUT)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f'server exited with {self.proc.returncode}, see {self.log_path}')
+            try:
+                requests.get(f'{self.url}/register', timeout=1)
+                return self
+            except requests.RequestException:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f'server did not start within {timeout}s, see {self.log_path}')
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        if getattr(self, '_log', None):
+            self._log.close()
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent_at = {}          # client_message_id -> send time
+        self.ack_latency = []
+        self.delivery_latency = []
+        self.acked_ids = []        # server message ids (for reactions)
+        self.errors = 0
+        self.deliveries = 0
+        self.expected_deliveries = 0
+        self.reactions_received = 0
+        self.typing_received = 0
+        self.first_send = None
+        self.last_event = None
+
+    def sent(self, cmid, recipients):
+        now = time.perf_counter()
+        with self.lock:
+            self.sent_at[cmid] = now
+            self.expected_deliveries += recipients
+            if self.first_send is None:
+                self.first_send = now
+
+    def acked(self, data):
+        now = time.perf_counter()
+        with self.lock:
+            start = self.sent_at.get(data.get('client_message_id'))
+            if data.get('status') != 'sent' or start is None:
+                self.errors += 1
+                return
+            self.ack_latency.append(now - start)
+            self.acked_ids.append(data.get('message_id'))
+            self.last_event = now
+
+    def delivered(self, cmid):
+        now = time.perf_counter()
+        with self.lock:
+            start = self.sent_at.get(cmid)
+            if start is None:
+                return
+            self.delivery_latency.append(now - start)
+            self.deliveries += 1
+            self.last_event = now
+
+    def done(self):
+        with self.lock:
+            return (len(self.ack_latency) + self.errors >= len(self.sent_at)
+                    and self.deliveries >= self.expected_deliveries)
+
+
+class BenchUser:
+    def __init__(self, user_id, token, metrics):
+        self.user_id = user_id
+        self.token = token
+        self.metrics = metrics
+        self.joined = threading.Event()
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on('user_joined', self._on_joined)
+        self.sio.on('message_sent_ack', metrics.acked)
+        self.sio.on('receive_message', self._on_message)
+        self.sio.on('message_reaction', self._on_reaction)
+        self.sio.on('user_typing', self._on_typing)
+
+    def _on_joined(self, data):
+        if str(data.get('user_id')) == str(self.user_id):
+            self.joined.set()
+
+    def _on_message(self, data):
+        # content is "bench <client_message_id>"; skip our own echo in group rooms
+        if str(data.get('sender_id')) == str(self.user_id):
+            return
+        content = data.get('content') or ''
+        if content.startswith('bench '):
+            self.metrics.delivered(content[6:])
+
+    def _on_reaction(self, data):
+        with self.metrics.lock:
+            self.metrics.reactions_received += 1
+
+    def _on_typing(self, data):
+        with self.metrics.lock:
+            self.metrics.typing_received += 1
+
+    def connect(self, url, transport):
+        self.sio.connect(url, transports=[transport], wait_timeout=10)
+        self.sio.emit('join', {'user_id': self.user_id})
+        if not self.joined.wait(10):
+            raise RuntimeError(f'user {self.user_id} did not receive user_joined')
+
+
+def register_users(url, n, run_id):
+    users = []
+    http = requests.Session()
+    for i in range(n):
+        resp = http.post(f'{url}/register', json={'username': f'bench_{run_id}_{i}', 'password': PASSWORD}, timeout=30)
+        resp.raise_for_status()
+        body = resp.json()
+        users.append((body['user_id'], body['token']))
+    return users
+
+
+def create_group(url, users):
+    owner_token = users[0][1]
+    resp = requests.post(f'{url}/groups', json={'name': 'bench', 'member_ids': [uid for uid, _ in users[1:]]},
+                         headers={'Authorization': f'Bearer {owner_token}'}, timeout=30)
+    resp.raise_for_status()
+    return resp.json()['id']
+
+
+def user_workload(user, peers, group_id, group_size, args, metrics, rng):
+    for i in range(args.messages):
+        peer = rng.choice(peers)
+        cmid = f'{user.user_id}-d{i}'
+        if args.typing:
+            user.sio.emit('typing', {'sender_id': user.user_id, 'receiver_id': peer, 'is_typing': True})
+        metrics.sent(cmid, 1)
+        user.sio.emit('send_message', {'sender_id': user.user_id, 'receiver_id': peer,
+                                       'content': f'bench {cmid}', 'client_message_id': cmid})
+        if args.typing:
+            user.sio.emit('typing', {'sender_id': user.user_id, 'receiver_id': peer, 'is_typing': False})
+        if args.interval:
+            time.sleep(args.interval)
+    for i in range(args.group_messages):
+        cmid = f'{user.user_id}-g{i}'
+        metrics.sent(cmid, group_size - 1)
+        user.sio.emit('send_message', {'sender_id': user.user_id, 'group_id': group_id,
+                                       'content': f'bench {cmid}', 'client_message_id': cmid})
+        if args.interval:
+            time.sleep(args.interval)
+
+
+def run(args):
+    server = None
+    url = args.url
+    if not url:
+        server = LocalServer(entry=args.entry, database_url=args.database_url).start()
+        url = server.url
+        print(f'[bench] server {args.entry} on {url} (logs: {server.log_path})')
+    rng = random.Random(args.seed)
+    metrics = Metrics()
+    clients = []
+    try:
+        users = register_users(url, args.users, int(time.time()))
+        group_id = create_group(url, users) if args.group_messages else None
+        t0 = time.perf_counter()
+        for uid, token in users:
+            client = BenchUser(uid, token, metrics)
+            client.connect(url, args.transport)
+            clients.append(client)
+        connect_seconds = time.perf_counter() - t0
+        print(f'[bench] {len(clients)} users connected and joined in {connect_seconds:.2f}s')
+
+        ids = [uid for uid, _ in users]
+        threads = []
+        for client in clients:
+            peers = [u for u in ids if u != client.user_id] or ids
+            t = threading.Thread(target=user_workload, args=(client, peers, group_id, len(ids), args, metrics,
+                                                             random.Random(rng.random())))
+            threads.append(t)
+            t.start()
+        for t in threads:
+            t.join()
+
+        deadline = time.time() + args.timeout
+        while not metrics.done() and time.time() < deadline:
+            time.sleep(0.05)
+
+        # reactions on a sample of acknowledged messages
+        reaction_sent = 0
+        with metrics.lock:
+            acked = [m for m in metrics.acked_ids if m]
+        for message_id in rng.sample(acked, min(args.reactions, len(acked))):
+            client = rng.choice(clients)
+            client.sio.emit('add_reaction', {'message_id': message_id, 'user_id': client.user_id, 'reaction': '👍'})
+            reaction_sent += 1
+        time.sleep(min(2.0, args.timeout))
+
+        elapsed = (metrics.last_event or time.perf_counter()) - (metrics.first_send or t0)
+        result = {
+            'entry': args.entry if not args.url else args.url,
+            'transport': args.transport,
+            'users': args.users,
+            'messages_sent': len(metrics.sent_at),
+            'acked': len(metrics.ack_latency),
+            'errors': metrics.errors,
+            'deliveries': metrics.deliveries,
+            'expected_deliveries': metrics.expected_deliveries,
+            'reactions_sent': reaction_sent,
+            'reaction_events': metrics.reactions_received,
+            'typing_events': metrics.typing_received,
+            'connect_seconds': round(connect_seconds, 3),
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_msgs_per_s': round(len(metrics.ack_latency) / elapsed, 1) if elapsed > 0 else None,
+            'ack_latency': summarize(metrics.ack_latency),
+            'delivery_latency': summarize(metrics.delivery_latency),
+        }
+        return result
+    finally:
+        for client in clients:
+            try:
+                client.sio.disconnect()
+            except Exception:
+                pass
+        if server:
+            server.stop()
+
+
+def print_report(result):
+    print(f"\nusers={result['users']} transport={result['transport']} target={result['entry']}")
+    print(f"messages: sent={result['messages_sent']} acked={result['acked']} errors={result['errors']} "
+          f"delivered={result['deliveries']}/{result['expected_deliveries']}")
+    print(f"reactions: sent={result['reactions_sent']} events={result['reaction_events']}  typing events={result['typing_events']}")
+    print(f"throughput: {result['throughput_msgs_per_s']} msg/s over {result['elapsed_seconds']}s")
+    for name in ('ack_latency', 'delivery_latency'):
+        s = result[name]
+        fmt = lambda v: '-' if v is None else f'{v:.1f}'
+        print(f"{name:17s} n={s['count']:<6d} p50={fmt(s['p50_ms'])}ms p95={fmt(s['p95_ms'])}ms "
+              f"p99={fmt(s['p99_ms'])}ms max={fmt(s['max_ms'])}ms")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--users', type=int, default=10, help='simulated users (one socket each)')
+    p.add_argument('--messages', type=int, default=20, help='1:1 messages per user')
+    p.add_argument('--group-messages', type=int, default=5, help='group messages per user (0 = no group)')
+    p.add_argument('--reactions', type=int, default=20, help='reactions on acknowledged messages')
+    p.add_argument('--no-typing', dest='typing', action='store_false', help='do not send typing events')
+    p.add_argument('--interval', type=float, default=0.0, help='pause between sends of one user (seconds)')
+    p.add_argument('--transport', choices=['websocket', 'polling'], default='websocket')
+    p.add_argument('--entry', default='app.py', help='server entry point inside server/ to launch')
+    p.add_argument('--database-url', help='DATABASE_URL for the launched server (default: temporary SQLite file)')
+    p.add_argument('--url', help='benchmark an already running server instead of launching one')
+    p.add_argument('--timeout', type=float, default=60.0, help='seconds to wait for outstanding ACKs/deliveries')
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--json', help='write results to this file')
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(result, fh, indent=2)
+        print(f'[bench] results written to {args.json}')
+    return 0 if result['errors'] == 0 and result['deliveries'] >= result['expected_deliveries'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark for GET /users/search on a large synthetic user table.
+
+Builds a throw-away SQLite database (same storage profile as the server)
+with N users named like Vietnamese people ("Nguyễn Thị Mai 123"), then
+times, per query, the old `ILIKE '%q%'` scan over username / display_name
+against services.user_search.search (prefix range scans + trigram fallback),
+anonymously and as a signed-in viewer with FRIENDS friends of FOF friends each
+(the path that merges the viewer's friends-of-friends into the results).
+
+Reports p50/p95 per query kind in milliseconds; --json writes the results
+so runs can be compared commit by commit.
+
+Examples:
+  python3 scripts/bench_user_search.py                    # 1,000,000 users
+  python3 scripts/bench_user_search.py --users 100000 --repeat 50
+  python3 scripts/bench_user_search.py --db /tmp/users.db --keep   # reuse the table next run
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'server'))
+
+FAMILY = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ', 'Hồ', 'Ngô', 'Dương', 'Lý']
+MIDDLE = ['Văn', 'Thị', 'Minh', 'Hữu', 'Đức', 'Thanh', 'Ngọc', 'Quốc', 'Gia', 'Xuân']
+GIVEN = ['An', 'Anh', 'Bình', 'Châu', 'Dũng', 'Giang', 'Hà', 'Hải', 'Hương', 'Khoa', 'Lan', 'Linh', 'Long', 'Mai',
+         'Minh', 'Nam', 'Nga', 'Ngọc', 'Phúc', 'Quân', 'Sơn', 'Tâm', 'Thảo', 'Trang', 'Trung', 'Tuấn', 'Vy', 'Yến']
+
+# (kind, query): what users type in the add-friend box
+QUERIES = [
+    ('exact username', 'user123456'),
+    ('prefix, accents typed', 'Nguyễn Thị Ma'),
+    ('prefix, no accents', 'tran van tu'),
+    ('prefix, very common', 'ng'),
+    ('infix', 'huong 4'),
+    ('no match', 'zzzq'),
+]
+
+
+def build_app(path):
+    from flask import Flask
+    from config.database import db, init_db
+    # every model, so the User relationships resolve
+    import models.block_model  # noqa: F401
+    import models.contact_model  # noqa: F401
+    import models.friend_model  # noqa: F401
+    import models.group_model  # noqa: F401
+    import models.message_model  # noqa: F401
+    import models.message_reaction_model  # noqa: F401
+    import models.user_model  # noqa: F401
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}', SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    init_db(app)
+    return app, db
+
+
+def populate(db, n, first_index=0, batch=20000):
+    """Insert n users numbered from first_index (the rows already in a reused --db)."""
+    from models.user_model import User
+    from utils.search_text import fold
+    rnd = random.Random(42)
+    table = User.__table__
+    start = time.perf_counter()
+    end = first_index + n
+    for first in range(first_index, end, batch):
+        rows = []
+        for i in range(first, min(end, first + batch)):
+            name = f'{rnd.choice(FAMILY)} {rnd.choice(MIDDLE)} {rnd.choice(GIVEN)} {i}'
+            username = f'user{i}'
+            rows.append({'username': username, 'password_hash': 'x', 'display_name': name, 'status': 'offline',
+                         'search_username': fold(username), 'search_name': fold(name)})
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+    return time.perf_counter() - start
+
+
+def befriend(db, viewer_id, friends, fof, n_users):
+    """Give viewer_id `friends` friends with `fof` friends each (skipped if already done)."""
+    from models.friend_model import Friend
+    if db.session.query(Friend.id).filter_by(user_id=viewer_id).first():
+        return
+    rnd = random.Random(7)
+    ids = range(1, n_users + 1)
+    mine = [i for i in rnd.sample(ids, min(n_users, friends + 1)) if i != viewer_id][:friends]
+    rows = [{'user_id': viewer_id, 'friend_id': f, 'status': 'accepted'} for f in mine]
+    for f in mine:
+        rows += [{'user_id': f, 'friend_id': c, 'status': 'accepted'} for c in rnd.sample(ids, fof) if c != f]
+    db.session.execute(Friend.__table__.insert(), rows)
+    db.session.commit()
+
+
+def legacy_search(q):
+    from models.user_model import User
+    like = f'%{q}%'
+    return User.query.filter(User.username.ilike(like) | User.display_name.ilike(like)).limit(50).all()
+
+
+def indexed_search(q, viewer_id=None):
+    from services import user_search
+    return user_search.search(q, viewer_id=viewer_id)
+
+
+def timed(func, q, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hits = func(q)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {'p50_ms': round(statistics.median(samples), 3),
+            'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+            'hits': len(hits)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--viewer', type=int, default=1, help='user id searching as a signed-in user')
+    parser.add_argument('--friends', type=int, default=100, help="the viewer's friends")
+    parser.add_argument('--fof', type=int, default=50, help='friends of each of those friends')
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    parser.add_argument('--keep', action='store_true', help='do not delete the database file')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix='bench-users-'), 'users.db')
+    app, db = build_app(path)
+    results = {'users': args.users, 'queries': {}}
+    with app.app_context():
+        db.create_all()
+        existing = db.session.execute(db.text('SELECT COUNT(*) FROM user')).scalar()
+        if existing < args.users:
+            elapsed = populate(db, args.users - existing, first_index=existing)
+            print(f'inserted {args.users - existing} users in {elapsed:.1f}s ({path})')
+        befriend(db, args.viewer, args.friends, args.fof, args.users)
+        results.update(viewer=args.viewer, friends=args.friends, fof=args.fof)
+        db.session.execute(db.text('ANALYZE'))
+        print(f'{"query":<24}{"legacy p50":>12}{"p95":>10}{"indexed p50":>13}{"p95":>10}'
+              f'{"viewer p50":>12}{"p95":>10}{"hits":>7}')
+        as_viewer = lambda q: indexed_search(q, args.viewer)  # noqa: E731
+        for kind, q in QUERIES:
+            legacy = timed(legacy_search, q, max(1, args.repeat // 4))
+            indexed = timed(indexed_search, q, args.repeat)
+            viewer = timed(as_viewer, q, args.repeat)
+            results['queries'][kind] = {'q': q, 'legacy': legacy, 'indexed': indexed, 'viewer': viewer}
+            print(f'{kind:<24}{legacy["p50_ms"]:>12.2f}{legacy["p95_ms"]:>10.2f}'
+                  f'{indexed["p50_ms"]:>13.2f}{indexed["p95_ms"]:>10.2f}'
+                  f'{viewer["p50_ms"]:>12.2f}{viewer["p95_ms"]:>10.2f}{indexed["hits"]:>7}')
+            db.session.remove()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if not args.keep and not args.db:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
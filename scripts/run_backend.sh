@@ -1,10 +1,11 @@
 #!/usr/bin/env bash
 # Robust backend starter: ensures a virtualenv exists, installs requirements, then runs the server.
+# BACKEND_MODE=production runs wsgi.py (gevent worker, MAX_CONNECTIONS cap) instead of the dev server.
 
 set -euo pipefail
 
-# Project root (script lives at project root)
-ROOT_DIR="$(cd "$(dirname "$0")" && pwd)"
+# Project root (script lives in scripts/)
+ROOT_DIR="$(cd "$(dirname "$0")/.." && pwd)"
 SERVER_DIR="$ROOT_DIR/server"
 VENV_DIR="$ROOT_DIR/.venv"
 
@@ -87,5 +88,16 @@ else
 fi
 echo ""
 
-echo "▶️  Starting Flask app using $PY_BIN (PORT=$BACKEND_PORT)"
-BACKEND_HOST=${BACKEND_HOST:-0.0.0.0} BACKEND_PORT=$BACKEND_PORT ENABLE_NGROK=${ENABLE_NGROK:-false} "$PY_BIN" app.py
+# Demo users are no longer created on boot; SEED_DEMO=true seeds alice/bob/carol into an empty DB
+if [ "${SEED_DEMO:-false}" == "true" ]; then
+	"$PY_BIN" -m flask --app app seed-demo
+fi
+
+ENTRY=app.py
+if [ "${BACKEND_MODE:-dev}" == "production" ]; then
+	ENTRY=wsgi.py
+	echo "🏭 Production mode: gevent worker, max ${MAX_CONNECTIONS:-1000} connections, ${DB_THREADPOOL_SIZE:-16} DB threads"
+fi
+
+echo "▶️  Starting Flask app ($ENTRY) using $PY_BIN (PORT=$BACKEND_PORT)"
+BACKEND_HOST=${BACKEND_HOST:-0.0.0.0} BACKEND_PORT=$BACKEND_PORT ENABLE_NGROK=${ENABLE_NGROK:-false} "$PY_BIN" "$ENTRY"
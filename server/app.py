@@ -1,4 +1,4 @@
-from flask import Flask, request, make_response, send_from_directory, g
+from flask import Flask, request, make_response, send_from_directory, g, jsonify
 from flask_socketio import SocketIO
 import sys, os, time
 
@@ -8,158 +8,61 @@ import sys, os, time
 sys.path.insert(0, os.path.dirname(__file__))
 
 from config.settings import Config
-from config.database import db, migrate
-from services.network_setup import start_ngrok
+from config.database import db, migrate, init_db, ensure_schema
 import logging
 from datetime import datetime
 from utils.logging_helpers import LoggingDedupFilter
-
-# Initialize Flask app
-# Serve client build (if present) as static files so the same public URL can serve frontend + API
-CLIENT_BUILD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'client', 'build'))
-if os.path.isdir(CLIENT_BUILD_DIR):
-    app = Flask(__name__, static_folder=CLIENT_BUILD_DIR, static_url_path='')
-else:
-    app = Flask(__name__)
-app.config.from_object(Config)
-
-# Initialize extensions
-socketio = SocketIO(app, cors_allowed_origins="*")
-
-# --- Logging Middleware ---
-from utils.logging_exchange import log_http_exchange, gen_request_id
-
-# Đặt middleware sau khi app đã được khởi tạo
-@app.before_request
-def start_request_logging():
-    g.request_id = gen_request_id()
-    g.time_start = datetime.utcnow().isoformat()
-    g.time_start_epoch = time.time()
-
-@app.after_request
-def after_request_logging(response):
-    user_id = None
-    # Lấy user_id nếu có (từ token hoặc session)
-    try:
-        from services.auth_service import decode_token
-        auth = request.headers.get('Authorization', '')
-        if auth.startswith('Bearer '):
-            token = auth.split(' ', 1)[1]
-            payload = decode_token(token)
-            if payload:
-                user_id = payload.get('user_id')
-    except Exception:
-        user_id = None
-    log_http_exchange(
-        event_name=f"HTTP {request.method} {request.path}",
-        user_id=user_id,
-        status=response.status_code,
-        extra={'response_length': response.content_length}
-    )
-    return response
-from flask import Flask, request, make_response, send_from_directory, g
-from flask_socketio import SocketIO
-import sys, os, time
-
-# Ensure the server package directory is on sys.path so imports like
-# `from config.settings import Config` (where config lives in server/config)
-# resolve when importing `server.app` from the project root.
-sys.path.insert(0, os.path.dirname(__file__))
-
-from config.settings import Config
-from config.database import db, migrate
-from services.network_setup import start_ngrok
-import logging
-from datetime import datetime
-from utils.logging_helpers import LoggingDedupFilter
-
-# --- Logging Middleware ---
 from utils.logging_exchange import log_http_exchange, gen_request_id
+from services.auth_service import decode_token
 
-# Đặt middleware sau khi app đã được khởi tạo
-@app.before_request
-def start_request_logging():
-    g.request_id = gen_request_id()
-    g.time_start = datetime.utcnow().isoformat()
-    g.time_start_epoch = time.time()
-
-@app.after_request
-def after_request_logging(response):
-    user_id = None
-    # Lấy user_id nếu có (từ token hoặc session)
-    try:
-        from services.auth_service import decode_token
-        auth = request.headers.get('Authorization', '')
-        if auth.startswith('Bearer '):
-            token = auth.split(' ', 1)[1]
-            payload = decode_token(token)
-            if payload:
-                user_id = payload.get('user_id')
-    except Exception:
-        user_id = None
-    log_http_exchange(
-        event_name=f"HTTP {request.method} {request.path}",
-        user_id=user_id,
-        status=response.status_code,
-        extra={'response_length': response.content_length}
-    )
-    return response
-
-# Initialize Flask app
 # Serve client build (if present) as static files so the same public URL can serve frontend + API
 CLIENT_BUILD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'client', 'build'))
-if os.path.isdir(CLIENT_BUILD_DIR):
-    app = Flask(__name__, static_folder=CLIENT_BUILD_DIR, static_url_path='')
-else:
-    app = Flask(__name__)
-app.config.from_object(Config)
-
-# Initialize extensions
-socketio = SocketIO(app, cors_allowed_origins="*")
+# migrations live at the project root (../migrations) whatever the working directory
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'migrations')
 
 # Simple CORS handling for development: allow React dev server + ngrok + localhost origins
 # We avoid adding a new dependency so this works out-of-the-box.
 # Include both localhost and any ngrok/public URL for flexibility
 ALLOWED_ORIGINS = {
-    "http://localhost:3000", 
+    "http://localhost:3000",
     "http://127.0.0.1:3000",
     "http://localhost:5000",
     "http://127.0.0.1:5000",
 }
-# For ngrok URLs, we'll check in the handler and allow them (see add_cors_headers below)
+
+logger = logging.getLogger(__name__)
+
+# Socket.IO is bound to the app in create_app(); handlers import it from here
+socketio = SocketIO()
+
+
+def configure_logging():
+    # Logging setup: concise format with timestamp, level, module, message
+    log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    logging.basicConfig(level=log_level, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    # Add deduplication filter to reduce repeated identical messages (default 5s)
+    try:
+        dedup_seconds = int(os.environ.get('LOG_DEDUP_SECONDS', '5'))
+    except Exception:
+        dedup_seconds = 5
+    root_logger = logging.getLogger()
+    if not any(isinstance(f, LoggingDedupFilter) for f in root_logger.filters):
+        root_logger.addFilter(LoggingDedupFilter(window_seconds=dedup_seconds))
+
+    # Reduce noisy logs from pyngrok unless explicitly debugging
+    logging.getLogger('pyngrok').setLevel(logging.ERROR)
+    # By default suppress Werkzeug access logs to keep terminal readable.
+    # Set LOG_SHOW_ACCESS=true to re-enable access logs.
+    if os.environ.get('LOG_SHOW_ACCESS', 'false').lower() != 'true':
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        logging.getLogger('engineio').setLevel(logging.WARNING)
+        logging.getLogger('socketio').setLevel(logging.WARNING)
+
+    # Reduce noisy SQLAlchemy engine logging (shows full SQL statements otherwise)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
 
 
-@app.after_request
-def add_cors_headers(response):
-    # For development convenience allow the React dev server origin.
-    # If you want to tighten this, set specific origins using ALLOWED_ORIGINS above.
-    origin = request.headers.get("Origin")
-    if origin in ALLOWED_ORIGINS:
-        response.headers["Access-Control-Allow-Origin"] = origin
-    else:
-        # fallback to permissive during local development
-        response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Credentials"] = "true"
-    response.headers["Access-Control-Allow-Methods"] = "GET,POST,PUT,DELETE,OPTIONS,PATCH"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization"
-    return response
-
-
-@app.before_request
-def handle_preflight():
-    # Respond to preflight OPTIONS requests with CORS headers immediately.
-    if request.method == 'OPTIONS':
-        resp = make_response()
-        origin = request.headers.get('Origin')
-        if origin in ALLOWED_ORIGINS:
-            resp.headers['Access-Control-Allow-Origin'] = origin
-        else:
-            resp.headers['Access-Control-Allow-Origin'] = '*'
-        resp.headers['Access-Control-Allow-Credentials'] = 'true'
-        resp.headers['Access-Control-Allow-Methods'] = 'GET,POST,PUT,DELETE,OPTIONS,PATCH'
-        resp.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization'
-        return resp
-    
 # WSGI middleware fallback to ensure CORS headers are present on all responses
 class _CORSMiddleware:
     def __init__(self, wsgi_app):
@@ -186,158 +89,255 @@ class _CORSMiddleware:
         return self.wsgi_app(environ, _start_response)
 
 
-app.wsgi_app = _CORSMiddleware(app.wsgi_app)
-db.init_app(app)
-migrate.init_app(app, db)
-
-
-# Register blueprints
-from routes.auth.register import auth_register_bp
-from routes.auth.login import auth_login_bp
-from routes.auth.logout import auth_logout_bp
-from routes.auth.forgot_password import auth_forgot_bp
-from routes.auth.refresh import auth_refresh_bp
-from routes.users import users_bp
-from routes.messages import messages_bp
-from routes.friends import friends_bp
-from routes.groups import groups_bp
-from routes.uploads import uploads_bp
-from routes.stickers import stickers_bp
-from routes.auth.me import auth_me_bp
-from routes.admin import admin_bp
-
-app.register_blueprint(auth_register_bp)
-app.register_blueprint(auth_login_bp)
-app.register_blueprint(auth_logout_bp)
-app.register_blueprint(auth_forgot_bp)
-app.register_blueprint(auth_refresh_bp)
-app.register_blueprint(users_bp)
-app.register_blueprint(messages_bp)
-app.register_blueprint(friends_bp)
-app.register_blueprint(groups_bp)
-app.register_blueprint(uploads_bp)
-app.register_blueprint(stickers_bp)
-app.register_blueprint(auth_me_bp)
-app.register_blueprint(admin_bp)
-
-# Ensure DB tables exist for development convenience (creates missing tables).
-with app.app_context():
-    # Import models to ensure SQLAlchemy metadata is populated before create_all
-    try:
-        from models.user_model import User
-        from models.friend_model import Friend
-        from models.group_model import Group, GroupMember
-        from models.message_model import Message
-        from models.sticker_model import Sticker
-        from models.contact_model import Contact
-    except Exception:
-        # If imports fail, log and continue; create_all may still create available tables
-        app.logger.debug('Model import failed during create_all prep')
-    try:
-        db.create_all()
-        # Add file_url column if it doesn't exist (for existing databases)
-        from sqlalchemy import inspect
-        inspector = inspect(db.engine)
-        columns = [col['name'] for col in inspector.get_columns('message')]
-        if 'file_url' not in columns:
+def register_request_hooks(app):
+    # --- Logging Middleware ---
+    @app.before_request
+    def start_request_logging():
+        g.request_id = gen_request_id()
+        g.time_start = datetime.utcnow().isoformat()
+        g.time_start_epoch = time.time()
+
+    @app.after_request
+    def after_request_logging(response):
+        user_id = None
+        # Lấy user_id nếu có (từ token hoặc session); decode_token is memoized per
+        # request in flask.g, so this reuses the route's decode
+        try:
+            auth = request.headers.get('Authorization', '')
+            if auth.startswith('Bearer '):
+                token = auth.split(' ', 1)[1]
+                payload = decode_token(token)
+                if payload:
+                    user_id = payload.get('user_id')
+        except Exception:
+            user_id = None
+        log_http_exchange(
+            event_name=f"HTTP {request.method} {request.path}",
+            user_id=user_id,
+            status=response.status_code,
+            extra={'response_length': response.content_length}
+        )
+        return response
+
+    @app.after_request
+    def add_cors_headers(response):
+        # For development convenience allow the React dev server origin.
+        # If you want to tighten this, set specific origins using ALLOWED_ORIGINS above.
+        origin = request.headers.get("Origin")
+        if origin in ALLOWED_ORIGINS:
+            response.headers["Access-Control-Allow-Origin"] = origin
+        else:
+            # fallback to permissive during local development
+            response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        response.headers["Access-Control-Allow-Methods"] = "GET,POST,PUT,DELETE,OPTIONS,PATCH"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization"
+        # Let browsers read the history pagination cursor headers
+        response.headers["Access-Control-Expose-Headers"] = "X-Has-More,X-Next-Before-Id,X-Next-After-Id"
+        return response
+
+    @app.before_request
+    def handle_preflight():
+        # Respond to preflight OPTIONS requests with CORS headers immediately.
+        if request.method == 'OPTIONS':
+            resp = make_response()
+            origin = request.headers.get('Origin')
+            if origin in ALLOWED_ORIGINS:
+                resp.headers['Access-Control-Allow-Origin'] = origin
+            else:
+                resp.headers['Access-Control-Allow-Origin'] = '*'
+            resp.headers['Access-Control-Allow-Credentials'] = 'true'
+            resp.headers['Access-Control-Allow-Methods'] = 'GET,POST,PUT,DELETE,OPTIONS,PATCH'
+            resp.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization'
+            return resp
+
+    # Global concise exception handler - returns a short JSON error and logs a compact message.
+    @app.errorhandler(Exception)
+    def handle_unhandled_exception(e):
+        try:
+            # Include basic request info for debugging instead of full traceback
+            req_path = getattr(request, 'path', '')
+            req_method = getattr(request, 'method', '')
+            # Log exception with a short message and the exception type
+            logger.exception('Unhandled exception: %s %s -> %s', req_method, req_path, str(e))
+            # Return concise error message to client
+            msg = str(e)
+            # If it's an SQLAlchemy OperationalError, shorten message to avoid giant trace
+            if 'OperationalError' in str(type(e)) and hasattr(e, 'orig'):
+                msg = getattr(e.orig, 'args', [str(e)])[-1]
+        except Exception:
+            # Fallback minimal response if logging fails
+            msg = 'Internal server error'
+        # Return JSON with short message and 500 status (or use e.code if present)
+        status_code = getattr(e, 'code', 500)
+        return jsonify({'error': str(msg)}), status_code
+
+
+def register_blueprints(app):
+    # Imported here rather than at module level: importing app.py stays cheap for
+    # tooling (flask CLI, scripts) and heavy optional deps are only pulled in lazily
+    from routes.auth.register import auth_register_bp
+    from routes.auth.login import auth_login_bp
+    from routes.auth.logout import auth_logout_bp
+    from routes.auth.forgot_password import auth_forgot_bp
+    from routes.auth.refresh import auth_refresh_bp
+    from routes.users import users_bp
+    from routes.messages import messages_bp
+    from routes.friends import friends_bp
+    from routes.groups import groups_bp
+    from routes.uploads import uploads_bp
+    from routes.stickers import stickers_bp
+    from routes.auth.me import auth_me_bp
+    from routes.admin import admin_bp
+
+    app.register_blueprint(auth_register_bp)
+    app.register_blueprint(auth_login_bp)
+    app.register_blueprint(auth_logout_bp)
+    app.register_blueprint(auth_forgot_bp)
+    app.register_blueprint(auth_refresh_bp)
+    app.register_blueprint(users_bp)
+    app.register_blueprint(messages_bp)
+    app.register_blueprint(friends_bp)
+    app.register_blueprint(groups_bp)
+    app.register_blueprint(uploads_bp)
+    app.register_blueprint(stickers_bp)
+    app.register_blueprint(auth_me_bp)
+    app.register_blueprint(admin_bp)
+
+    # If a client build exists, serve it at the root so the ngrok/public URL shows the React app.
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve_client(path):
+        """Serve files from client/build if present, otherwise return 404 for unknown routes.
+
+        This keeps API and socket routes working (they are registered earlier). Any path that
+        doesn't match an API route will fall through to this handler and return the React
+        app's index.html so client-side routing works over the public ngrok URL.
+        """
+        if not os.path.isdir(CLIENT_BUILD_DIR):
+            # No static build available; let Flask handle 404s normally
+            return make_response(('Not Found', 404))
+
+        # Serve static assets if they exist; otherwise serve index.html for client-side routing
+        requested = path or 'index.html'
+        full_path = os.path.join(CLIENT_BUILD_DIR, requested)
+        if os.path.exists(full_path) and os.path.isfile(full_path):
+            return send_from_directory(CLIENT_BUILD_DIR, requested)
+        return send_from_directory(CLIENT_BUILD_DIR, 'index.html')
+
+
+def prepare_database(app, purged_offline_users=()):
+    """Schema check at boot; demo data is seeded by `flask seed-demo`, not here."""
+    with app.app_context():
+        # Import models to ensure SQLAlchemy metadata is populated before create_all / migrations
+        try:
+            from models.user_model import User
+            from models.friend_model import Friend
+            from models.group_model import Group, GroupMember
+            from models.message_model import Message
+            from models.sticker_model import Sticker
+            from models.contact_model import Contact
+            from models.conversation_summary_model import ConversationSummary
+            from models.block_model import Block
+            from models.message_reaction_model import MessageReaction
+            from models.contact_sync_model import ContactSync
+        except Exception:
+            # If imports fail, log and continue; create_all may still create available tables
+            app.logger.debug('Model import failed during create_all prep')
+        # Alembic migration chain (../migrations): a database already at head costs one
+        # alembic_version read; empty databases are created from the models and stamped
+        try:
+            schema_state = ensure_schema(app)
+            if schema_state != 'current':
+                app.logger.info('Database schema %s to the latest migration', schema_state)
+        except Exception as e:
+            app.logger.warning(f"Could not bring the database schema up to date: {e}")
+
+        # Multi-node restart: users whose only connections lived on this node are offline now
+        if purged_offline_users:
             try:
-                with db.engine.connect() as conn:
-                    conn.execute(db.text('ALTER TABLE message ADD COLUMN file_url VARCHAR(500)'))
-                    conn.commit()
-                app.logger.info('Added file_url column to message table')
+                from models.user_model import User
+                from services import group_presence
+                User.query.filter(User.id.in_(purged_offline_users)).update({'status': 'offline'}, synchronize_session=False)
+                for uid in purged_offline_users:
+                    group_presence.user_transition(uid, -1)
+                db.session.commit()
             except Exception as e:
-                app.logger.debug(f'Could not add file_url column: {e}')
-    except Exception as e:
-        app.logger.warning(f"Could not create tables automatically: {e}")
-    # If DB is empty, create a few demo users for development convenience
-    try:
-        from models.user_model import User
-        if User.query.count() == 0:
-            from services.auth_service import register_user
-            register_user('alice', 'password', display_name='Alice Nguyễn')
-            register_user('bob', 'password', display_name='Bob Trần')
-            register_user('carol', 'password', display_name='Carol Lê')
-            app.logger.info('Created demo users: alice, bob, carol')
-    except Exception:
-        # ignore seeding errors in production
-        pass
-
-# Register socket events
-from sockets.chat_events import register_chat_events
-from sockets.signaling_events import register_signaling_events
-register_chat_events(socketio)
-register_signaling_events(socketio)
-
-
-# If a client build exists, serve it at the root so the ngrok/public URL shows the React app.
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve_client(path):
-    """Serve files from client/build if present, otherwise return 404 for unknown routes.
-
-    This keeps API and socket routes working (they are registered earlier). Any path that
-    doesn't match an API route will fall through to this handler and return the React
-    app's index.html so client-side routing works over the public ngrok URL.
-    """
-    if not os.path.isdir(CLIENT_BUILD_DIR):
-        # No static build available; let Flask handle 404s normally
-        return make_response(('Not Found', 404))
-
-    # Serve static assets if they exist; otherwise serve index.html for client-side routing
-    requested = path or 'index.html'
-    full_path = os.path.join(CLIENT_BUILD_DIR, requested)
-    if os.path.exists(full_path) and os.path.isfile(full_path):
-        return send_from_directory(CLIENT_BUILD_DIR, requested)
-    return send_from_directory(CLIENT_BUILD_DIR, 'index.html')
-
-# Logging setup: concise format with timestamp, level, module, message
-LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
-logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
-logger = logging.getLogger(__name__)
-
-# Add deduplication filter to reduce repeated identical messages (default 5s)
-try:
-    dedup_seconds = int(os.environ.get('LOG_DEDUP_SECONDS', '5'))
-except Exception:
-    dedup_seconds = 5
-root_logger = logging.getLogger()
-root_logger.addFilter(LoggingDedupFilter(window_seconds=dedup_seconds))
-
-# Reduce noisy logs from pyngrok unless explicitly debugging
-logging.getLogger('pyngrok').setLevel(logging.ERROR)
-# By default suppress Werkzeug access logs to keep terminal readable.
-# Set LOG_SHOW_ACCESS=true to re-enable access logs.
-if os.environ.get('LOG_SHOW_ACCESS', 'false').lower() != 'true':
-    logging.getLogger('werkzeug').setLevel(logging.WARNING)
-    logging.getLogger('engineio').setLevel(logging.WARNING)
-    logging.getLogger('socketio').setLevel(logging.WARNING)
-
-# Reduce noisy SQLAlchemy engine logging (shows full SQL statements otherwise)
-logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
-
-# Global concise exception handler - returns a short JSON error and logs a compact message.
-from flask import jsonify
-import traceback as _traceback
-
-@app.errorhandler(Exception)
-def handle_unhandled_exception(e):
-    try:
-        # Include basic request info for debugging instead of full traceback
-        req_path = getattr(request, 'path', '')
-        req_method = getattr(request, 'method', '')
-        # Log exception with a short message and the exception type
-        logger.exception('Unhandled exception: %s %s -> %s', req_method, req_path, str(e))
-        # Return concise error message to client
-        msg = str(e)
-        # If it's an SQLAlchemy OperationalError, shorten message to avoid giant trace
-        if 'OperationalError' in str(type(e)) and hasattr(e, 'orig'):
-            msg = getattr(e.orig, 'args', [str(e)])[-1]
-    except Exception:
-        # Fallback minimal response if logging fails
-        msg = 'Internal server error'
-    # Return JSON with short message and 500 status (or use e.code if present)
-    status_code = getattr(e, 'code', 500)
-    return jsonify({'error': str(msg)}), status_code
+                db.session.rollback()
+                app.logger.warning(f"Could not release presence left by previous run: {e}")
+
+        # Group.status is only written when a counter crosses the threshold: drop 'online'
+        # flags that no live counter backs any more (e.g. after a single-node restart)
+        try:
+            from services import group_presence
+            group_presence.reconcile()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning(f"Could not reconcile group status: {e}")
+
+
+def create_app(config_object=Config, **overrides):
+    """Build the Flask app and bind the module-level `socketio` to it."""
+    configure_logging()
+    if os.path.isdir(CLIENT_BUILD_DIR):
+        app = Flask(__name__, static_folder=CLIENT_BUILD_DIR, static_url_path='')
+    else:
+        app = Flask(__name__)
+    app.config.from_object(config_object)
+    app.config.update(overrides)
+
+    # In multi-node mode emits are published on the Redis message queue so rooms joined on
+    # other workers receive them; presence moves to Redis as well.
+    socketio.init_app(app, cors_allowed_origins="*", message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'),
+                      async_mode=app.config.get('SOCKETIO_ASYNC_MODE'))
+    # Production worker (wsgi.py, gevent): run blocking handler bodies and REST requests in a thread pool
+    from services import offload
+    if offload.install(socketio, pool_size=app.config.get('DB_THREADPOOL_SIZE', 16)):
+        app.wsgi_app = offload.OffloadMiddleware(app.wsgi_app)
+    purged_offline_users = []
+    if app.config.get('MULTI_NODE'):
+        from services import redis_client
+        from services.presence import registry as presence_registry
+        redis_url = app.config['REDIS_URL']
+        purged_offline_users = presence_registry.use_redis(lambda: redis_client.get_client(redis_url), app.config['NODE_ID'])
+
+    proxy_hops = app.config.get('TRUSTED_PROXY_HOPS') or 0
+    if proxy_hops:
+        # request.remote_addr / scheme / host of the client, not of the proxy (rate limit buckets)
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops, x_host=proxy_hops)
+    app.wsgi_app = _CORSMiddleware(app.wsgi_app)
+    # storage profile: SQLite WAL + pragmas / pool sizing, or PostgreSQL (config/database.py)
+    init_db(app)
+    migrate.init_app(app, db, directory=MIGRATIONS_DIR)
+
+    register_request_hooks(app)
+    register_blueprints(app)
+    prepare_database(app, purged_offline_users)
+
+    # Register socket events
+    from sockets.chat_events import register_chat_events
+    from sockets.signaling_events import register_signaling_events
+    register_chat_events(socketio)
+    register_signaling_events(socketio)
+
+    # Optional write-behind message persistence (MESSAGE_WRITE_BEHIND=true): replays the journal, then starts batching
+    from services import message_writer
+    message_writer.init_app(app, socketio)
+    # Emits the expiring "stopped typing" for coalesced typing indicators
+    from services import typing_indicator
+    typing_indicator.init_app(app, socketio)
+    # Coalesced profile updates (PROFILE_FANOUT_DELAY_MS)
+    from services import profile_fanout
+    profile_fanout.init_app(app, socketio)
+
+    from commands import register_commands
+    register_commands(app)
+    return app
+
+
+app = create_app()
 
 if __name__ == "__main__":
     try:
@@ -346,6 +346,7 @@ if __name__ == "__main__":
 
         # Only attempt to start ngrok if explicitly enabled via env var.
         if os.environ.get('ENABLE_NGROK', 'false').lower() == 'true':
+            from services.network_setup import start_ngrok
             public_url = start_ngrok(app, port=port)
             # Log a concise ngrok info line instead of large ASCII banner
             logger.info("NGROK public URL: %s", public_url)
@@ -366,4 +367,4 @@ if __name__ == "__main__":
     host = os.environ.get('BACKEND_HOST', '0.0.0.0')
     # Newer Flask-SocketIO versions raise an error when running with the
     # Werkzeug dev server. For local development we allow it explicitly.
-    socketio.run(app, host=host, port=port, debug=False, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    socketio.run(app, host=host, port=port, debug=False, allow_unsafe_werkzeug=True)
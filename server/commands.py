@@ -0,0 +1,31 @@
+"""Flask CLI commands (run from server/: `flask --app app <command>`)."""
+import click
+
+DEMO_USERS = [
+    ('alice', 'Alice Nguyễn'),
+    ('bob', 'Bob Trần'),
+    ('carol', 'Carol Lê'),
+]
+
+
+def seed_demo_users(password='password'):
+    """Create the demo accounts when the user table is empty. Returns the usernames created."""
+    from models.user_model import User
+    from services.auth_service import register_user
+    if User.query.first() is not None:
+        return []
+    for username, display_name in DEMO_USERS:
+        register_user(username, password, display_name=display_name)
+    return [username for username, _ in DEMO_USERS]
+
+
+def register_commands(app):
+    @app.cli.command('seed-demo')
+    @click.option('--password', default='password', show_default=True, help='password for every demo user')
+    def seed_demo(password):
+        """Create demo users alice, bob and carol in an empty database."""
+        created = seed_demo_users(password)
+        if created:
+            click.echo(f"Created demo users: {', '.join(created)}")
+        else:
+            click.echo('Users already exist; nothing seeded.')
@@ -1,5 +1,144 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
 
 db = SQLAlchemy()
-migrate = Migrate()
\ No newline at end of file
+migrate = Migrate()
+
+# Storage profiles (STORAGE_PROFILE). 'auto' picks 'postgres' for a postgresql://
+# DATABASE_URL and 'sqlite-wal' otherwise.
+#   sqlite      rollback journal, synchronous=FULL (the old default behaviour)
+#   sqlite-wal  WAL journal + synchronous=NORMAL: readers never block the writer and a
+#               commit no longer fsyncs the main DB file (a power loss can drop the last
+#               commits, a process crash cannot)
+#   postgres    server database; only pool sizing / pre-ping apply
+STORAGE_PROFILES = ('sqlite', 'sqlite-wal', 'postgres')
+
+
+def resolve_profile(config):
+    profile = (config.get('STORAGE_PROFILE') or 'auto').lower()
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if profile == 'auto':
+        profile = 'postgres' if uri.startswith(('postgres://', 'postgresql')) else 'sqlite-wal'
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f'STORAGE_PROFILE must be one of {STORAGE_PROFILES} or auto, got {profile!r}')
+    return profile
+
+
+def sqlite_pragmas(profile, config):
+    """PRAGMA statements run on every new SQLite connection for `profile`."""
+    busy_timeout = int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    if profile == 'sqlite':
+        return [
+            'PRAGMA journal_mode=DELETE',
+            'PRAGMA synchronous=FULL',
+            f'PRAGMA busy_timeout={busy_timeout}',
+        ]
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA busy_timeout={busy_timeout}',
+        f"PRAGMA mmap_size={int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+        # negative = size in KiB rather than pages
+        f"PRAGMA cache_size={int(config.get('SQLITE_CACHE_SIZE', -64 * 1024))}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def engine_options(profile, config):
+    """SQLALCHEMY_ENGINE_OPTIONS for `profile` (explicit options in config win)."""
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    options = {}
+    in_memory = uri in ('sqlite://', 'sqlite:///:memory:')
+    if not in_memory:
+        # in-memory SQLite uses a single-connection pool, sizing does not apply
+        options.update(
+            pool_size=int(config.get('DB_POOL_SIZE', 10)),
+            max_overflow=int(config.get('DB_MAX_OVERFLOW', 20)),
+            pool_timeout=int(config.get('DB_POOL_TIMEOUT', 30)),
+        )
+    if profile == 'postgres':
+        options.update(pool_pre_ping=True, pool_recycle=int(config.get('DB_POOL_RECYCLE', 1800)))
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def _install_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def init_db(app):
+    """db.init_app() with the configured storage profile applied.
+
+    Pool sizing goes into SQLALCHEMY_ENGINE_OPTIONS before the engine is built;
+    SQLite pragmas are set on each new DB-API connection via the engine's
+    connect event.
+    """
+    profile = resolve_profile(app.config)
+    app.config['STORAGE_PROFILE'] = profile
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(profile, app.config)
+    db.init_app(app)
+    if profile != 'postgres':
+        with app.app_context():
+            _install_pragmas(db.engine, sqlite_pragmas(profile, app.config))
+    return profile
+
+
+# Revision a database bootstrapped with db.create_all() (no alembic_version row) matches
+LEGACY_BASE_REVISION = '4e76c8a94ee2'
+
+
+def _migrations_dir(app):
+    return app.extensions['migrate'].directory
+
+
+def head_revision(app):
+    from alembic.config import Config as AlembicConfig
+    from alembic.script import ScriptDirectory
+    cfg = AlembicConfig()
+    cfg.set_main_option('script_location', _migrations_dir(app))
+    return ScriptDirectory.from_config(cfg).get_current_head()
+
+
+def current_revision():
+    """Revision stamped in alembic_version, or None (no table / empty)."""
+    from sqlalchemy.exc import DBAPIError
+    try:
+        with db.engine.connect() as conn:
+            return conn.execute(db.text('SELECT version_num FROM alembic_version')).scalar()
+    except DBAPIError:
+        return None
+
+
+def ensure_schema(app):
+    """Bring the database to the migration head at startup.
+
+    Returns 'current' (one alembic_version read, no other introspection),
+    'created' (empty database: create_all + stamp head) or 'upgraded'.
+    Call inside an app context, after migrate.init_app().
+    """
+    import flask_migrate
+    from sqlalchemy import inspect
+    head = head_revision(app)
+    current = current_revision()
+    if current == head:
+        return 'current'
+    directory = _migrations_dir(app)
+    if current is None:
+        if not inspect(db.engine).has_table('user'):
+            db.create_all()
+            flask_migrate.stamp(directory, head)
+            return 'created'
+        # pre-Alembic database built by db.create_all()
+        flask_migrate.stamp(directory, LEGACY_BASE_REVISION)
+    flask_migrate.upgrade(directory)
+    # tables for models that have no migration of their own yet
+    db.create_all()
+    return 'upgraded'
@@ -1,16 +1,85 @@
 import os
+import socket
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'supersecretkey')
     # Use absolute path to storage folder to avoid relative path issues
     DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'storage', 'chatapp.db')
-    SQLALCHEMY_DATABASE_URI = f'sqlite:///{DB_PATH}'
+    # DATABASE_URL overrides the bundled SQLite file (used by benchmarks / deployments)
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f'sqlite:///{DB_PATH}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Storage profile (config/database.py): auto | sqlite | sqlite-wal | postgres
+    STORAGE_PROFILE = os.environ.get('STORAGE_PROFILE', 'auto')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', str(-64 * 1024)))  # negative = KiB
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '20'))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    # Multi-node mode (opt-in): Socket.IO emits go through a Redis message queue and
+    # presence / token blacklist are shared in Redis so several workers can run side by side
+    MULTI_NODE = os.environ.get('MULTI_NODE', 'false').lower() == 'true'
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or (REDIS_URL if MULTI_NODE else None)
+    # Where logged-out token ids are kept: 'auto' (Redis in multi-node mode, else memory),
+    # 'redis' (also single node, so revocations survive a restart) or 'memory'
+    TOKEN_REVOCATION_STORE = os.environ.get('TOKEN_REVOCATION_STORE', 'auto')
+    # Socket.IO async mode: 'threading' for the dev server (python app.py); wsgi.py switches to 'gevent'
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+    # Production worker: max concurrent connections and size of the thread pool for blocking DB work
+    MAX_CONNECTIONS = int(os.environ.get('MAX_CONNECTIONS', '1000'))
+    DB_THREADPOOL_SIZE = int(os.environ.get('DB_THREADPOOL_SIZE', '16'))
+    # Write-behind message persistence (opt-in): send_message is acked as soon as the message
+    # has an id and is journaled; rows are committed in batches of N messages or every M ms.
+    # Durability: 'fsync' (journal fsynced before ack), 'flush' (journal written to the OS
+    # before ack, survives a process crash) or 'none' (memory only, a crash loses the batch).
+    # Single node only: ignored (synchronous writes) when MULTI_NODE is on.
+    MESSAGE_WRITE_BEHIND = os.environ.get('MESSAGE_WRITE_BEHIND', 'false').lower() == 'true'
+    WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '64'))
+    WRITE_BEHIND_FLUSH_MS = int(os.environ.get('WRITE_BEHIND_FLUSH_MS', '20'))
+    WRITE_BEHIND_DURABILITY = os.environ.get('WRITE_BEHIND_DURABILITY', 'flush')
+    WRITE_BEHIND_JOURNAL_DIR = os.environ.get('WRITE_BEHIND_JOURNAL_DIR') or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), 'storage', 'journal')
+    # Stable per-worker id (survives restarts) so a node can purge presence entries it left behind
+    NODE_ID = os.environ.get('NODE_ID') or f"{socket.gethostname()}:{os.environ.get('BACKEND_PORT', '5000')}"
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwtsecretkey')
     OTP_EXPIRE_SECONDS = 300
     RATE_LIMIT = 5
     RATE_LIMIT_WINDOW = 60
+    # Seconds without a new `typing` event before the receiver is told the sender stopped
+    TYPING_TIMEOUT = float(os.environ.get('TYPING_TIMEOUT', '5'))
+    # Profile edits made within this window are sent to friends/groups as one contact_updated
+    PROFILE_FANOUT_DELAY_MS = int(os.environ.get('PROFILE_FANOUT_DELAY_MS', '250'))
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    # Token buckets (services/rate_limit.py): name -> (burst capacity, seconds to refill it).
+    # Socket events use their event name, HTTP routes the name given to @rate_limited.
+    RATE_LIMIT_POLICIES = {
+        'send_message': (20, 10),
+        'send_sticker': (10, 10),
+        'send_file_message': (10, 10),
+        'add_reaction': (30, 10),
+        'edit_message': (10, 10),
+        'recall_message': (10, 10),
+        'typing': (10, 5),
+        'command': (20, 10),
+        'join': (10, 10),
+        'login': (10, 60),
+        'register': (5, 60),
+        # OTP sends per (contact, client IP); verify + reset guesses per contact
+        'otp_send': (3, 300),
+        'otp_verify': (10, 300),
+        'search_messages': (20, 10),
+    }
+    # Per-user overrides, e.g. {42: {'send_message': (200, 10)}} for a bot account
+    RATE_LIMIT_USER_POLICIES = {}
+    # 'auto' (Redis in multi-node mode, else process memory), 'redis' or 'memory'
+    RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'auto')
+    # Reverse proxies in front of the app (the ngrok tunnel counts as one): the client IP used by
+    # rate limits is then read from X-Forwarded-For. Leave at 0 when clients connect directly,
+    # otherwise anyone can pick their own bucket by sending the header.
+    TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS') or
+                             (1 if os.environ.get('ENABLE_NGROK', 'false').lower() == 'true' else 0))
     # Optional delivery configuration
     SMTP_HOST = os.environ.get('SMTP_HOST', '')
     SMTP_PORT = int(os.environ.get('SMTP_PORT', 587) or 587)
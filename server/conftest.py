@@ -0,0 +1,89 @@
+"""Shared pytest fixtures: an in-memory SQLite app with the chat blueprints
+and Socket.IO handlers registered (no network, no storage/chatapp.db)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask
+from flask_socketio import SocketIO
+
+from config.database import db
+from models.user_model import User
+from models.friend_model import Friend
+from models.group_model import Group, GroupMember
+from models.message_model import Message
+from models.message_reaction_model import MessageReaction
+from models.block_model import Block
+from models.contact_model import Contact
+from models.contact_sync_model import ContactSync
+from models.conversation_summary_model import ConversationSummary
+
+
+@pytest.fixture
+def app():
+    from routes.messages import messages_bp
+    from routes.groups import groups_bp
+    from services import access_cache, auth_service, friend_suggestions, profile_fanout, rate_limit, typing_indicator
+    access_cache.clear()
+    friend_suggestions.clear()
+    auth_service.clear_caches()
+    rate_limit.limiter.clear()
+    typing_indicator.coalescer.clear()
+    profile_fanout.fanout.clear()
+
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        JWT_SECRET_KEY='test-secret',
+        TESTING=True,
+    )
+    db.init_app(app)
+    app.register_blueprint(messages_bp)
+    app.register_blueprint(groups_bp)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def socketio(app):
+    from sockets.chat_events import register_chat_events
+    from services.presence import registry
+    registry.clear()
+    sio = SocketIO(app, async_mode='threading')
+    register_chat_events(sio)
+    return sio
+
+
+def make_user(name):
+    u = User(username=name, password_hash='x', display_name=name.title())
+    db.session.add(u)
+    db.session.commit()
+    return u
+
+
+class QueryCounter:
+    """Count SQL statements sent to the engine inside a `with` block."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, *args, **kwargs):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
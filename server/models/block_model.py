@@ -3,6 +3,11 @@ from datetime import datetime
 
 
 class Block(db.Model):
+    __table_args__ = (
+        db.Index('uq_block_user_target', 'user_id', 'target_id', unique=True),
+        db.Index('ix_block_target_id', 'target_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     target_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -0,0 +1,34 @@
+from config.database import db
+from datetime import datetime
+
+
+class ConversationSummary(db.Model):
+    """Materialized inbox row: one per (user, 1:1 peer or group).
+
+    Maintained by services.conversation_summary in the same transaction as
+    the message insert/edit/recall so /messages/conversations is one indexed read.
+    """
+    __tablename__ = 'conversation_summary'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'kind', 'target_id', name='uq_conversation_summary_target'),
+        db.Index('ix_conversation_summary_user_last_ts', 'user_id', 'last_ts'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(16), nullable=False)  # 'user' or 'group'
+    target_id = db.Column(db.Integer, nullable=False)  # peer user id or group id
+    last_message_id = db.Column(db.Integer, nullable=True)
+    preview = db.Column(db.Text, nullable=True)
+    last_ts = db.Column(db.DateTime, default=datetime.utcnow)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'type': self.kind,
+            'id': self.target_id,
+            'last_message': self.preview,
+            'last_message_id': self.last_message_id,
+            'last_ts': self.last_ts.isoformat() if self.last_ts else None,
+            'unread_count': self.unread_count or 0,
+        }
@@ -3,6 +3,12 @@ from datetime import datetime
 
 
 class Friend(db.Model):
+    __table_args__ = (
+        db.Index('uq_friend_user_friend', 'user_id', 'friend_id', unique=True),
+        db.Index('ix_friend_user_status', 'user_id', 'status'),
+        db.Index('ix_friend_friend_status', 'friend_id', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     friend_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
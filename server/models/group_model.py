@@ -28,6 +28,11 @@ class Group(db.Model):
 
 
 class GroupMember(db.Model):
+    __table_args__ = (
+        db.Index('uq_group_member_group_user', 'group_id', 'user_id', unique=True),
+        db.Index('ix_group_member_user_id', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
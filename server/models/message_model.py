@@ -1,7 +1,16 @@
 from config.database import db
 from datetime import datetime
+from sqlalchemy import event
 
 class Message(db.Model):
+    # Composite indexes backing keyset pagination of conversation history
+    __table_args__ = (
+        db.Index('ix_message_sender_receiver_id', 'sender_id', 'receiver_id', 'id'),
+        db.Index('ix_message_group_id_id', 'group_id', 'id'),
+        db.Index('ix_message_receiver_id_id', 'receiver_id', 'id'),
+        db.Index('ix_message_timestamp', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -20,3 +29,16 @@ class Message(db.Model):
     def __repr__(self):
         return f'<Message {self.id}>'
 
+
+
+@event.listens_for(Message.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    # Full-text index + sync triggers live outside the ORM (see services.message_search)
+    from services import message_search
+    message_search.install(connection)
+
+
+@event.listens_for(Message.__table__, 'after_drop')
+def _drop_search_index(target, connection, **kw):
+    from services import message_search
+    message_search.uninstall(connection)
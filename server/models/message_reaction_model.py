@@ -4,6 +4,10 @@ from datetime import datetime
 
 class MessageReaction(db.Model):
     __tablename__ = 'message_reaction'
+    __table_args__ = (
+        # one row per (message, user, emoji); its leading column also serves lookups by message
+        db.Index('uq_message_reaction_message_user_type', 'message_id', 'user_id', 'reaction_type', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     message_id = db.Column(db.Integer, db.ForeignKey('message.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -12,3 +16,17 @@ class MessageReaction(db.Model):
 
     def __repr__(self):
         return f'<MessageReaction {self.id} msg={self.message_id} user={self.user_id} reaction={self.reaction_type}>'
+
+
+class MessageReactionCount(db.Model):
+    """Per-message reaction totals: one row per (message, emoji).
+
+    Maintained by services.reactions in the same transaction as the
+    message_reaction insert/delete, so clients get counts without loading
+    every reaction row.
+    """
+    __tablename__ = 'message_reaction_count'
+
+    message_id = db.Column(db.Integer, db.ForeignKey('message.id'), primary_key=True)
+    reaction_type = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -1,7 +1,16 @@
 from config.database import db
 from datetime import datetime
+from sqlalchemy import event
+
+from utils.search_text import fold
 
 class User(db.Model):
+    # Prefix search runs as a range scan on the folded columns (services/user_search.py)
+    __table_args__ = (
+        db.Index('ix_user_search_username', 'search_username'),
+        db.Index('ix_user_search_name', 'search_name'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
@@ -12,6 +21,9 @@ class User(db.Model):
     phone_number = db.Column(db.String(32))
     status = db.Column(db.String(32), default='offline')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # fold()ed username / display name (lowercase, no diacritics), kept in sync below
+    search_username = db.Column(db.String(80))
+    search_name = db.Column(db.String(120))
 
     # Relationships
     # Friends (outgoing)
@@ -52,3 +64,23 @@ class User(db.Model):
             'phone_number': self.phone_number,
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
+
+
+@event.listens_for(User, 'before_insert')
+@event.listens_for(User, 'before_update')
+def _fill_search_columns(mapper, connection, target):
+    target.search_username = fold(target.username)
+    target.search_name = fold(target.display_name or target.username)
+
+
+@event.listens_for(User.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    # Infix (trigram) index lives outside the ORM (see services.user_search)
+    from services import user_search
+    user_search.install(connection)
+
+
+@event.listens_for(User.__table__, 'after_drop')
+def _drop_search_index(target, connection, **kw):
+    from services import user_search
+    user_search.uninstall(connection)
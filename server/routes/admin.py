@@ -9,6 +9,7 @@ Routes:
   PATCH /admin/users/<id>              - Update user
   DELETE /admin/users/<id>             - Delete user
   GET  /admin/db/stats                 - DB statistics
+  GET  /admin/realtime/stats           - Socket.IO counters (typing emits per room, rate limits, caches)
 """
 import os
 from flask import Blueprint, jsonify, request, current_app
@@ -20,6 +21,7 @@ from models.friend_model import Friend
 from models.block_model import Block
 from models.message_reaction_model import MessageReaction
 from models.sticker_model import Sticker
+from services import access_cache, friend_suggestions, reactions
 from datetime import datetime
 import hashlib
 
@@ -162,9 +164,12 @@ def delete_user(user_id):
     username = user.username
     
     try:
-        # Cascade delete handles most relations
+        # Cascade delete handles most relations; reaction counters are derived data
+        reactions.forget_user(user_id)
         db.session.delete(user)
         db.session.commit()
+        access_cache.clear()
+        friend_suggestions.clear()
         current_app.logger.info(f'[ADMIN] User deleted: {username} (id={user_id})')
         return jsonify({'ok': True, 'message': f'User {username} deleted'})
     except Exception as e:
@@ -192,6 +197,25 @@ def db_stats():
         return jsonify({'error': str(e)}), 500
 
 
+@admin_bp.route('/realtime/stats', methods=['GET'])
+def realtime_stats():
+    """In-process counters of the realtime layer (this node only)."""
+    from services import profile_fanout, typing_indicator
+    from services.presence import registry as presence
+    from services.rate_limit import limiter
+    from services.message_writer import writer as message_writer
+    return jsonify({
+        'typing': typing_indicator.coalescer.stats(),
+        'profile_fanout': profile_fanout.fanout.stats(),
+        'rate_limited': limiter.stats(),
+        'presence': presence.stats(),
+        'access_cache': access_cache.stats(),
+        'friend_suggestions': friend_suggestions.stats(),
+        'message_writer': message_writer.stats(),
+        'timestamp': datetime.utcnow().isoformat(),
+    })
+
+
 @admin_bp.route('/db/clear-all', methods=['POST'])
 def clear_all_data():
     """
@@ -205,6 +229,8 @@ def clear_all_data():
         # Drop and recreate all tables
         db.drop_all()
         db.create_all()
+        access_cache.clear()
+        friend_suggestions.clear()
         current_app.logger.warn('[ADMIN] ALL DATA CLEARED by admin request')
         return jsonify({'ok': True, 'message': 'All data cleared and tables recreated'})
     except Exception as e:
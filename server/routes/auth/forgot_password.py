@@ -1,10 +1,25 @@
 from flask import Blueprint, request, jsonify
 from services.otp_service import send_otp, reset_password
+from services.rate_limit import rate_limited
 
 auth_forgot_bp = Blueprint('auth_forgot', __name__, url_prefix='/forgot-password')
 
 
+def _contact():
+    # guessing OTPs is limited per target account, whoever the caller is
+    data = request.get_json(silent=True) or {}
+    return data.get('contact') or data.get('username')
+
+
+def _send_key():
+    # sends are limited per (target, client IP): a stranger spamming someone's reset
+    # only drains their own bucket, never the victim's sends or verify budget
+    contact = _contact()
+    return f'{contact}@{request.remote_addr}' if contact else None
+
+
 @auth_forgot_bp.route('', methods=['POST'])
+@rate_limited('otp_send', key=_send_key)
 def forgot_password():
     data = request.get_json() or {}
     contact = data.get('contact') or data.get('username')
@@ -16,6 +31,7 @@ def forgot_password():
 
 
 @auth_forgot_bp.route('/reset', methods=['POST'])
+@rate_limited('otp_verify', key=_contact)
 def reset():
     data = request.get_json() or {}
     contact = data.get('contact') or data.get('username')
@@ -28,6 +44,7 @@ def reset():
 
 
 @auth_forgot_bp.route('/verify', methods=['POST'])
+@rate_limited('otp_verify', key=_contact)
 def verify_otp():
     """Verify OTP code endpoint: expects { contact, otp }"""
     data = request.get_json() or {}
@@ -2,10 +2,18 @@ from flask import Blueprint, request, jsonify
 from services.auth_service import login_user, decode_token
 from models.user_model import User
 from flask import current_app
+from services.rate_limit import rate_limited
 
 auth_login_bp = Blueprint('auth_login', __name__, url_prefix='/login')
 
+def _login_key():
+    # per (username, client IP): failed attempts from one address cannot lock the account
+    # out for everyone else, and one address cannot spray guesses over a single account
+    username = (request.get_json(silent=True) or {}).get('username')
+    return f'{username}@{request.remote_addr}' if username else None
+
 @auth_login_bp.route('', methods=['POST'])
+@rate_limited('login', key=_login_key)
 def login():
     data = request.get_json()
     print(f"[LOGIN] username={data.get('username')}")
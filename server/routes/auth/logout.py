@@ -5,8 +5,8 @@ auth_logout_bp = Blueprint('auth_logout', __name__, url_prefix='/logout')
 
 @auth_logout_bp.route('', methods=['POST'])
 def logout():
-    token = request.headers.get('Authorization')
-    if not token:
+    auth = request.headers.get('Authorization', '')
+    if not auth.startswith('Bearer '):
         return jsonify({'error': 'Missing token'}), 400
-    result = logout_user(token)
+    result = logout_user(auth.split(' ', 1)[1])
     return jsonify(result), (200 if result.get('success') else 400)
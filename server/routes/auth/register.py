@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify, current_app
 from services.auth_service import register_user, create_token_for_user
 from models.user_model import User
+from services.rate_limit import rate_limited
 
 auth_register_bp = Blueprint('auth_register', __name__, url_prefix='/register')
 
 
 @auth_register_bp.route('', methods=['POST'])
+@rate_limited('register')
 def register():
     data = request.get_json() or {}
     print(f"[REGISTER] username={data.get('username')}")
@@ -3,6 +3,8 @@ from services.auth_service import decode_token
 from models.user_model import User
 from models.friend_model import Friend
 from models.block_model import Block
+from services import friend_suggestions
+from services.presence import registry as presence
 from config.database import db
 
 friends_bp = Blueprint('friends', __name__, url_prefix='/friends')
@@ -110,6 +112,7 @@ def add_friend(other_id):
     rel = Friend(user_id=uid, friend_id=other_id, status='pending')
     db.session.add(rel)
     db.session.commit()
+    friend_suggestions.invalidate(uid, other_id)
     return jsonify({'success': True, 'message': 'Friend request sent'})
 
 
@@ -124,6 +127,8 @@ def accept_friend(other_id):
         return jsonify({'error': 'No friend request found'}), 404
     rel.status = 'accepted'
     db.session.commit()
+    presence.invalidate_friends(uid, other_id)
+    friend_suggestions.invalidate_edge(uid, other_id)
     return jsonify({'success': True})
 
 
@@ -145,6 +150,8 @@ def remove_friend(other_id):
     try:
         db.session.delete(rel)
         db.session.commit()
+        presence.invalidate_friends(uid, other_id)
+        friend_suggestions.invalidate_edge(uid, other_id)
         return jsonify({'success': True, 'message': 'Friend removed'})
     except Exception as e:
         db.session.rollback()
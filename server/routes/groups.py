@@ -3,6 +3,9 @@ from services.auth_service import decode_token
 from config.database import db
 from models.group_model import Group, GroupMember
 from models.user_model import User
+from services import group_presence
+from services import group_rooms
+from services import access_cache
 socketio = None  # sẽ được import ở cuối file để tránh vòng lặp
 
 groups_bp = Blueprint('groups', __name__, url_prefix='/groups')
@@ -18,6 +21,27 @@ def current_user_from_request(req):
     return None
 
 
+def _sync_members(group_id, user_ids, sign):
+    """After a membership change is committed (sign=+1 added, -1 removed): move the
+    members' sockets in/out of the group room and update the group's online
+    counter, announcing a status flip if any."""
+    access_cache.invalidate_group(group_id)
+    try:
+        if sign > 0:
+            group_rooms.add_members(group_id, user_ids)
+        else:
+            group_rooms.remove_members(group_id, user_ids)
+        flips = group_presence.members_changed(group_id, user_ids, sign)
+        if flips:
+            db.session.commit()
+            socketio = group_rooms.current_socketio()
+            if socketio is not None:
+                group_presence.emit_updates(socketio, flips)
+    except Exception as e:
+        db.session.rollback()
+        print(f"[GROUPS] Failed to sync rooms/presence for group {group_id}: {e}")
+
+
 @groups_bp.route('', methods=['GET'])
 def list_my_groups():
     uid = current_user_from_request(request)
@@ -131,6 +155,7 @@ def create_group():
         # Return full group info including members list
         members_list = GroupMember.query.filter_by(group_id=group.id).all()
         member_ids_result = [m.user_id for m in members_list]
+        _sync_members(group.id, member_ids_result, +1)
         return jsonify({
             'id': group.id,
             'name': group.name,
@@ -161,6 +186,7 @@ def join_group(group_id):
     member = GroupMember(group_id=group_id, user_id=uid)
     db.session.add(member)
     db.session.commit()
+    _sync_members(group_id, [uid], +1)
     return jsonify({'success': True})
 
 
@@ -182,8 +208,12 @@ def get_group_members(group_id):
 
 @groups_bp.route('/<int:group_id>/messages', methods=['GET'])
 def get_group_messages(group_id):
-    """Return messages for a group (ordered asc). Requires membership."""
-    from models.message_model import Message
+    """Return one page of group messages (ordered asc). Requires membership.
+
+    Supports the same before_id / after_id / limit cursor params and
+    pagination headers as GET /messages.
+    """
+    from services.message_history import parse_page_args, fetch_group_page, load_senders, load_reactions, load_my_reactions, add_page_headers
     uid = current_user_from_request(request)
     if not uid:
         return jsonify({'error': 'Unauthorized'}), 401
@@ -195,15 +225,23 @@ def get_group_messages(group_id):
     if not member:
         return jsonify({'error': 'Not a member of this group'}), 403
 
-    msgs = Message.query.filter_by(group_id=group_id).order_by(Message.timestamp.asc()).all()
+    try:
+        before_id, after_id, limit = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    msgs, has_more = fetch_group_page(group_id, before_id=before_id, after_id=after_id, limit=limit)
+    senders = load_senders(msgs)
+    counts = load_reactions(msgs)
+    mine = load_my_reactions(msgs, uid)
+    if before_id is None and after_id is None:
+        from services.conversation_summary import mark_read
+        if mark_read(uid, 'group', group_id):
+            db.session.commit()
     result = []
     for m in msgs:
         try:
-            sender = None
-            try:
-                sender = User.query.get(m.sender_id)
-            except Exception:
-                sender = None
+            sender = senders.get(m.sender_id)
             result.append({
                 'id': m.id,
                 'sender_id': m.sender_id,
@@ -217,10 +255,12 @@ def get_group_messages(group_id):
                 'sticker_url': m.sticker_url,
                 'timestamp': m.timestamp.isoformat(),
                 'group_id': m.group_id,
+                'reactions': counts.get(m.id, {}),
+                'my_reactions': mine.get(m.id, []),
             })
         except Exception:
             continue
-    return jsonify(result)
+    return add_page_headers(jsonify(result), msgs, has_more)
 
 
 @groups_bp.route('/<int:group_id>/members', methods=['POST'])
@@ -293,10 +333,12 @@ def add_members_to_group(group_id):
                 db.session.rollback()
                 continue
 
+        _sync_members(group_id, added_ids, +1)
+
         # Notify newly added users (if any) so their clients can refresh group lists
         try:
             group_info = {'group_id': group.id, 'group_name': group.name}
-            from server.app import socketio
+            socketio = group_rooms.current_socketio()
             for mid in added_ids:
                 try:
                     socketio.emit('group_created_notify', {**group_info, 'members': [mid]}, room=f'user-{mid}')
@@ -347,4 +389,5 @@ def remove_member_from_group(group_id, user_id):
     
     db.session.delete(target_member)
     db.session.commit()
+    _sync_members(group_id, [user_id], -1)
     return jsonify({'success': True, 'message': 'Member removed'})
@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
 from models.message_model import Message
 from config.database import db
-from sqlalchemy import or_
+from services.message_history import parse_page_args, fetch_direct_page, load_senders, load_reactions, load_my_reactions, add_page_headers
+from services import conversation_summary, message_search
+from services.rate_limit import rate_limited
+from services.message_writer import writer as message_writer
+from sqlalchemy import and_
 import os
 from werkzeug.utils import secure_filename
 import time
@@ -12,14 +16,31 @@ logger = logging.getLogger(__name__)
 messages_bp = Blueprint('messages', __name__, url_prefix='/messages')
 
 
+def _viewer_id():
+    """user_id from the Bearer token, or None."""
+    from services.auth_service import decode_token
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        payload = decode_token(auth.split(' ', 1)[1])
+        if payload:
+            return payload.get('user_id')
+    return None
+
+
 @messages_bp.route('', methods=['GET'])
 def get_messages():
-    """Return messages between two users (both directions).
+    """Return one page of messages between two users (both directions).
 
     Query params:
       - sender_id: required
       - receiver_id: required
-      - limit: optional int to cap number of messages (most recent)
+      - before_id: optional, return messages older than this id
+      - after_id: optional, return messages newer than this id
+      - limit: optional page size (default 100, max 200)
+
+    Without a cursor the newest page is returned. The body is a list in
+    ascending order; X-Has-More / X-Next-Before-Id / X-Next-After-Id headers
+    carry the cursor for the next page.
     """
     sender_id = request.args.get('sender_id')
     receiver_id = request.args.get('receiver_id')
@@ -35,20 +56,21 @@ def get_messages():
         logger.warning("[MESSAGES] sender_id and receiver_id must be integers")
         return jsonify({'error': 'sender_id and receiver_id must be integers'}), 400
 
-    limit = request.args.get('limit', type=int)
+    try:
+        before_id, after_id, limit = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    # messages where (sender=a and receiver=b) OR (sender=b and receiver=a)
-    query = Message.query.filter(
-        or_(
-            (Message.sender_id == a) & (Message.receiver_id == b),
-            (Message.sender_id == b) & (Message.receiver_id == a),
-        )
-    ).order_by(Message.timestamp.asc())
+    msgs, has_more = fetch_direct_page(a, b, before_id=before_id, after_id=after_id, limit=limit)
+    senders = load_senders(msgs)
+    counts = load_reactions(msgs)
+    viewer_id = _viewer_id()
+    mine = load_my_reactions(msgs, viewer_id)
 
-    if limit:
-        msgs = query.limit(limit).all()
-    else:
-        msgs = query.all()
+    # Opening the newest page marks the conversation read for the authenticated viewer
+    if before_id is None and after_id is None and viewer_id == a:
+        if conversation_summary.mark_read(a, 'user', b):
+            db.session.commit()
 
     response_data = [
         {
@@ -56,28 +78,80 @@ def get_messages():
             'sender_id': m.sender_id,
             'receiver_id': m.receiver_id,
             # include sender avatar so clients can render avatars next to messages
-            'sender_avatar_url': (lambda sid: ( (lambda u: u.avatar_url if u else None)(__import__('models.user_model', fromlist=['User']).User.query.get(sid)) ))(m.sender_id),
+            'sender_avatar_url': senders[m.sender_id].avatar_url if m.sender_id in senders else None,
             'content': m.content,
             'file_url': m.file_url,
             'message_type': m.message_type,
             'sticker_id': m.sticker_id,
             'sticker_url': m.sticker_url,
-            'timestamp': m.timestamp.isoformat()
+            'timestamp': m.timestamp.isoformat(),
+            # {emoji: count}; live changes arrive as message_reaction deltas
+            'reactions': counts.get(m.id, {}),
+            # emojis the authenticated viewer added (empty for anonymous callers)
+            'my_reactions': mine.get(m.id, []),
         } for m in msgs
     ]
-    logger.info("[MESSAGES] count=%s", len(response_data))
-    return jsonify(response_data)
+    logger.info("[MESSAGES] count=%s has_more=%s", len(response_data), has_more)
+    return add_page_headers(jsonify(response_data), msgs, has_more)
+
+
+@messages_bp.route('/search', methods=['GET'])
+@rate_limited('search_messages')
+def search_messages():
+    """Full-text search over the caller's conversations, best match first.
+
+    Query params:
+      - q: required, words to look for (accent-insensitive, the last word
+        also matches as a prefix)
+      - peer_id / group_id: optional, search a single conversation
+      - limit: optional page size (default 20, max 100)
+      - offset: optional, number of results to skip
+
+    Requires Authorization: Bearer <token>. X-Has-More / X-Next-Offset
+    headers carry the next page.
+    """
+    uid = _viewer_id()
+    if not uid:
+        return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        q, limit, offset, peer_id, group_id = message_search.parse_search_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    message_writer.ensure_persisted()
+    msgs, has_more = message_search.search(uid, q, limit=limit, offset=offset, peer_id=peer_id, group_id=group_id)
+    senders = load_senders(msgs)
+    response = jsonify([
+        {
+            'id': m.id,
+            'sender_id': m.sender_id,
+            'receiver_id': m.receiver_id,
+            'group_id': m.group_id,
+            'sender_name': (senders[m.sender_id].display_name or senders[m.sender_id].username) if m.sender_id in senders else None,
+            'sender_avatar_url': senders[m.sender_id].avatar_url if m.sender_id in senders else None,
+            'content': m.content,
+            'message_type': m.message_type,
+            'timestamp': m.timestamp.isoformat(),
+        } for m in msgs
+    ])
+    response.headers['X-Has-More'] = 'true' if has_more else 'false'
+    if has_more:
+        response.headers['X-Next-Offset'] = str(offset + len(msgs))
+    return response
 
 
 @messages_bp.route('/conversations', methods=['GET'])
 def get_conversations():
     """Return conversation summaries for current user: last message per conversation (user or group).
 
+    Served from the materialized conversation_summary table (one indexed
+    read joined with the peer user / group), newest conversation first.
     Requires Authorization: Bearer <token>
     """
     from services.auth_service import decode_token
     from models.user_model import User
     from models.group_model import Group
+    from models.conversation_summary_model import ConversationSummary
 
     auth = request.headers.get('Authorization', '')
     uid = None
@@ -90,52 +164,28 @@ def get_conversations():
     if not uid:
         return jsonify({'error': 'Unauthorized'}), 401
 
-    # Gather messages involving user
-    msgs = Message.query.filter(
-        or_(Message.sender_id == uid, Message.receiver_id == uid)
-    ).order_by(Message.timestamp.desc()).all()
+    # summaries of write-behind messages land with their batch
+    message_writer.ensure_persisted()
+    rows = db.session.query(ConversationSummary, User, Group).outerjoin(
+        User, and_(ConversationSummary.kind == 'user', User.id == ConversationSummary.target_id)
+    ).outerjoin(
+        Group, and_(ConversationSummary.kind == 'group', Group.id == ConversationSummary.target_id)
+    ).filter(
+        ConversationSummary.user_id == uid,
+        ConversationSummary.last_message_id.isnot(None),
+    ).order_by(ConversationSummary.last_ts.desc()).all()
 
-    conv_map = {}
-    for m in msgs:
-        if m.group_id:
-            key = ('group', m.group_id)
-        else:
-            # determine the other participant
-            other = m.receiver_id if m.sender_id == uid else m.sender_id
-            key = ('user', other)
-
-        if key not in conv_map:
-            # Show a friendly preview depending on message type
-            if m.message_type == 'sticker':
-                preview = '[Sticker]'
-            elif m.file_url:
-                preview = '[File] '
-            else:
-                preview = m.content
-
-            conv_map[key] = {
-                'type': key[0],
-                'id': key[1],
-                'last_message': preview,
-                'last_ts': m.timestamp.isoformat(),
-            }
-
-    # Enrich with display names
     result = []
-    for k, v in conv_map.items():
-        if v['type'] == 'user':
-            u = User.query.get(v['id'])
+    for summary, u, g in rows:
+        v = summary.to_dict()
+        if summary.kind == 'user':
             v['display_name'] = (u.display_name or u.username) if u else None
             v['username'] = u.username if u else None
             # expose avatar for conversation list
             v['avatar_url'] = u.avatar_url if u else None
         else:
-            g = Group.query.get(v['id'])
-            v['group_name'] = g.name if g else f'Group {v["id"]}'
+            v['group_name'] = g.name if g else f'Group {summary.target_id}'
         result.append(v)
-
-    # sort by last_ts desc
-    result.sort(key=lambda x: x.get('last_ts') or '', reverse=True)
     return jsonify(result)
 
 
@@ -178,6 +228,8 @@ def upload_file():
         )
         
         db.session.add(msg)
+        db.session.flush()
+        conversation_summary.record_message(msg)
         db.session.commit()
         logger.info("[UPLOAD] Message created: %s", msg.id)
         
@@ -1,8 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app, send_from_directory
 from werkzeug.utils import secure_filename
 import os
-import boto3
-from botocore.exceptions import ClientError
 from services.auth_service import decode_token
 
 uploads_bp = Blueprint('uploads', __name__, url_prefix='/uploads')
@@ -31,6 +29,8 @@ def get_s3_client():
             current_app.logger.info('S3 credentials not configured; skipping S3 client creation')
             return None
 
+        # boto3 is slow to import; only load it once S3 is actually configured
+        import boto3
         return boto3.client(
             's3',
             aws_access_key_id=access_key,
@@ -88,6 +88,7 @@ def generate_presigned_url():
     s3_client = get_s3_client()
     if not s3_client:
         return jsonify({'error': 'S3 not configured'}), 500
+    from botocore.exceptions import ClientError
 
     try:
         # Generate presigned POST URL for upload
@@ -249,44 +250,9 @@ def upload_avatar():
                 db.session.add(user)
                 db.session.commit()
                 try:
-                    # Notify friends and the user's own rooms about profile update
-                    from app import socketio
-                    from models.friend_model import Friend
-
-                    outgoing = Friend.query.filter_by(user_id=user.id, status='accepted').all() or []
-                    incoming = Friend.query.filter_by(friend_id=user.id, status='accepted').all() or []
-                    friend_ids = set()
-                    for f in outgoing:
-                        friend_ids.add(f.friend_id)
-                    for f in incoming:
-                        friend_ids.add(f.user_id)
-
-                    payload = {
-                        'event': 'PROFILE_UPDATED',
-                        'data': {
-                            'id': user.id,
-                            'username': user.username,
-                            'display_name': user.display_name if getattr(user, 'display_name', None) else user.username,
-                            'avatar_url': user.avatar_url,
-                            'status': user.status,
-                        }
-                    }
-
-                    # Emit to the user's own room and to each friend's room
-                    try:
-                        socketio.emit('contact_updated', payload, room=f'user-{user.id}')
-                    except Exception:
-                        pass
-                    for fid in friend_ids:
-                        try:
-                            socketio.emit('contact_updated', payload, room=f'user-{fid}')
-                        except Exception:
-                            pass
-                    # Fallback broadcast to all connected clients
-                    try:
-                        socketio.emit('contact_updated', payload)
-                    except Exception:
-                        pass
+                    # Notify the user's own tabs, friends and groups (coalesced, no broadcast)
+                    from services import profile_fanout
+                    profile_fanout.fanout.publish(user)
                 except Exception:
                     # best-effort only
                     current_app.logger.debug('[UPLOADS] realtime notify failed')
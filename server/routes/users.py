@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request, current_app
 from models.user_model import User
 from config.database import db
 from services.auth_service import decode_token
+from services import friend_suggestions, group_rooms, profile_fanout, user_search
 from sqlalchemy import or_
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
@@ -78,71 +79,13 @@ def update_me():
                 current_app.logger.info(f"[USERS] User {user.id} profile updated. avatar_url={user.avatar_url}")
             except Exception:
                 pass
-            # Emit realtime update to friends so they see new avatar/profile immediately
+            # Realtime update to the rooms that show this profile (own tabs,
+            # friends, groups); coalesced with other edits made right after this one
             try:
-                # import here to avoid circular imports at module import time
-                from app import socketio
-                from models.friend_model import Friend
-                # collect friend ids in both directions
-                outgoing = Friend.query.filter_by(user_id=user.id, status='accepted').all() or []
-                incoming = Friend.query.filter_by(friend_id=user.id, status='accepted').all() or []
-                friend_ids = set()
-                for f in outgoing:
-                    friend_ids.add(f.friend_id)
-                for f in incoming:
-                    friend_ids.add(f.user_id)
-
-                payload = {
-                    'event': 'PROFILE_UPDATED',
-                    'data': {
-                        'id': user.id,
-                        'username': user.username,
-                        'display_name': user.display_name if getattr(user, 'display_name', None) else user.username,
-                        'avatar_url': user.avatar_url,
-                        'status': user.status,
-                    }
-                }
-
-                # Emit to the user's own room (useful for multi-tab) and to each friend's room
-                # Diagnostic: log current user_sockets mapping so we can tell which users are connected
-                try:
-                    from sockets import chat_events as _chat_events
-                    current_map = getattr(_chat_events, 'user_sockets', {}) or {}
-                    try:
-                        current_app.logger.info(f"[USERS][DIAG] current user_sockets keys={list(current_map.keys())}")
-                        # show a compact mapping of user_id -> sid for debugging
-                        for k, v in list(current_map.items())[:50]:
-                            current_app.logger.debug(f"[USERS][DIAG] mapping {k} -> {v}")
-                    except Exception:
-                        current_app.logger.debug('[USERS][DIAG] failed logging user_sockets mapping')
-                except Exception:
-                    # best-effort only
-                    try:
-                        current_app.logger.debug('[USERS][DIAG] chat_events not importable')
-                    except Exception:
-                        pass
-                try:
-                    current_app.logger.info(f"[USERS] Emitting PROFILE_UPDATED for user {user.id} to user-{user.id} and {len(friend_ids)} friends")
-                    socketio.emit('contact_updated', payload, room=f'user-{user.id}')
-                except Exception as e:
-                    current_app.logger.exception(f"[USERS] Failed emitting to own room: {e}")
-
-                for fid in friend_ids:
-                    try:
-                        current_app.logger.debug(f"[USERS] Emitting PROFILE_UPDATED for user {user.id} to friend room user-{fid}")
-                        socketio.emit('contact_updated', payload, room=f'user-{fid}')
-                    except Exception as e:
-                        current_app.logger.exception(f"[USERS] Failed emitting to friend {fid}: {e}")
-                # As a fallback, also broadcast the update to all connected clients.
-                # This ensures clients that for some reason didn't join rooms still receive profile updates.
-                try:
-                    current_app.logger.info(f"[USERS] Broadcasting PROFILE_UPDATED for user {user.id} to all connected clients as fallback")
-                    socketio.emit('contact_updated', payload)
-                except Exception as e:
-                    current_app.logger.exception(f"[USERS] Failed broadcasting PROFILE_UPDATED: {e}")
+                profile_fanout.fanout.publish(user)
             except Exception:
                 # Do not fail the request if emitting realtime updates fails
-                pass
+                current_app.logger.exception(f"[USERS] Failed to publish PROFILE_UPDATED for user {user.id}")
         except Exception as e:
             # log and return error to client so frontend can show more info
             current_err = str(e)
@@ -262,21 +205,29 @@ def get_user_by_id(user_id):
 
 @users_bp.route('/search', methods=['GET'])
 def search_users():
-    """Search users by username. Query param: q (partial match)."""
+    """Search users by username or display name. Query param: q.
+
+    Accent- and case-insensitive ("nguyen" finds "Nguyễn"): exact matches
+    first, then prefix, then infix matches; within each, users sharing
+    friends with the authenticated caller come first (`mutuals`). See
+    services/user_search.py.
+    """
     q = request.args.get('q', '').strip()
     if not q:
         return jsonify([])
-    # Simple case-insensitive partial match
-    like = f"%{q}%"
-    # Match username or display_name
-    results = User.query.filter(
-        (User.username.ilike(like)) | (getattr(User, 'display_name', User.username).ilike(like))
-    ).limit(50).all()
-    return jsonify([{'id': u.id, 'username': u.username, 'display_name': (u.display_name or u.username), 'avatar_url': u.avatar_url, 'status': u.status} for u in results])
+    auth = request.headers.get('Authorization', '')
+    caller_id = None
+    if auth.startswith('Bearer '):
+        payload = decode_token(auth.split(' ', 1)[1])
+        if payload:
+            caller_id = payload.get('user_id')
+    results = user_search.search(q, viewer_id=caller_id)
+    return jsonify([{'id': u.id, 'username': u.username, 'display_name': (u.display_name or u.username), 'avatar_url': u.avatar_url, 'status': u.status, 'mutuals': mutuals} for u, mutuals in results])
 
 @users_bp.route('/admin/rebroadcast_profiles', methods=['POST'])
 def rebroadcast_profiles():
-    """Developer helper: re-emit PROFILE_UPDATED for all users.
+    """Developer helper: re-send every user's profile to all connected clients,
+    as PROFILES_UPDATED batches (services/profile_fanout.rebroadcast_all).
 
     This endpoint is intentionally limited to localhost or when an
     ADMIN_SECRET header matches the environment variable ADMIN_SECRET.
@@ -293,26 +244,12 @@ def rebroadcast_profiles():
         return jsonify({'error': 'Forbidden'}), 403
 
     try:
-        from app import socketio
-        users = User.query.all()
-        for u in users:
-            payload = {
-                'event': 'PROFILE_UPDATED',
-                'data': {
-                    'id': u.id,
-                    'username': u.username,
-                    'display_name': u.display_name if getattr(u, 'display_name', None) else u.username,
-                    'avatar_url': u.avatar_url,
-                    'status': u.status,
-                }
-            }
-            try:
-                current_app.logger.info(f"[ADMIN] broadcasting PROFILE_UPDATED for user {u.id}")
-                # broadcast to all connected clients
-                socketio.emit('contact_updated', payload)
-            except Exception as e:
-                current_app.logger.exception(f"[ADMIN] failed to emit for user {u.id}: {e}")
-        return jsonify({'ok': True, 'count': len(users)})
+        socketio = group_rooms.current_socketio()
+        if socketio is None:
+            return jsonify({'error': 'Socket.IO not initialised'}), 503
+        count, emits = profile_fanout.rebroadcast_all(socketio)
+        current_app.logger.info(f"[ADMIN] rebroadcast {count} profiles in {emits} PROFILES_UPDATED emits")
+        return jsonify({'ok': True, 'count': count, 'emits': emits})
     except Exception as e:
         try:
             current_app.logger.exception(f"[ADMIN] rebroadcast failed: {e}")
@@ -323,8 +260,10 @@ def rebroadcast_profiles():
 
 @users_bp.route('/suggestions', methods=['GET'])
 def user_suggestions():
-    """Return friend suggestions for current user: users who are not already friends and not the current user.
-    Optional `limit` query param.
+    """Return friend suggestions for current user: friends of friends ranked by
+    mutual friend count (`mutuals`), then the newest unrelated users.
+    Optional `limit` (default 10, max 50) and `offset` query params; pages
+    are served from a cache (services/friend_suggestions.py).
     """
     auth = request.headers.get('Authorization', '')
     uid = None
@@ -335,20 +274,14 @@ def user_suggestions():
             uid = payload.get('user_id')
 
     # If not logged in, return popular users (first N)
-    limit = int(request.args.get('limit', '10'))
+    try:
+        limit = max(1, min(int(request.args.get('limit', '10')), 50))
+        offset = max(0, int(request.args.get('offset', '0')))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
     if not uid:
         users = User.query.limit(limit).all()
         return jsonify([{'id': u.id, 'username': u.username, 'avatar_url': u.avatar_url, 'status': u.status} for u in users])
 
-    # Get IDs of users to exclude: self and existing friends
-    # We'll import Friend here to avoid circular imports at top-level
-    from models.friend_model import Friend
-    rels = Friend.query.filter((Friend.user_id == uid) | (Friend.friend_id == uid)).all()
-    exclude_ids = {uid}
-    for r in rels:
-        exclude_ids.add(r.user_id)
-        exclude_ids.add(r.friend_id)
-
-    # Find users not in exclude_ids
-    suggestions = User.query.filter(~User.id.in_(list(exclude_ids))).limit(limit).all()
-    return jsonify([{'id': u.id, 'username': u.username, 'avatar_url': u.avatar_url, 'status': u.status} for u in suggestions])
+    suggestions = friend_suggestions.page(uid, limit=limit, offset=offset)
+    return jsonify([{'id': u.id, 'username': u.username, 'display_name': (u.display_name or u.username), 'avatar_url': u.avatar_url, 'status': u.status, 'mutuals': mutuals} for u, mutuals in suggestions])
@@ -0,0 +1,91 @@
+"""Cached block and group-membership lookups for the message send path.
+
+Sending a 1:1 message used to run two Block queries and a group message a
+Group lookup plus a GroupMember query before the insert. These answers change
+rarely and every write that changes them goes through a known place, so they
+are kept in TTL/LRU caches and invalidated explicitly:
+
+  - AddBlock / RemoveBlock (socket commands)       -> invalidate_block(a, b)
+  - routes/groups create/join/add/remove members   -> invalidate_group(group_id)
+  - admin user delete / clear-all                  -> clear()
+
+The TTL (ACCESS_CACHE_TTL, seconds) only bounds staleness for writes made
+by another process (e.g. another node in multi-node mode).
+"""
+import os
+
+from sqlalchemy import and_, or_
+
+from config.database import db
+from models.block_model import Block
+from models.group_model import Group, GroupMember
+from utils.ttl_cache import TTLCache
+
+CACHE_TTL = float(os.environ.get('ACCESS_CACHE_TTL', '300'))
+CACHE_SIZE = int(os.environ.get('ACCESS_CACHE_SIZE', '50000'))
+
+# (lo, hi) -> (lo blocked hi, hi blocked lo)
+_blocks = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+# group_id -> (owner_id, frozenset(member ids)) or None if the group does not exist
+_groups = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+
+def _pair(a, b):
+    a, b = int(a), int(b)
+    return (a, b) if a <= b else (b, a)
+
+
+def _load_blocks(lo, hi):
+    rows = db.session.query(Block.user_id, Block.target_id).filter(or_(
+        and_(Block.user_id == lo, Block.target_id == hi),
+        and_(Block.user_id == hi, Block.target_id == lo),
+    )).all()
+    pairs = {tuple(r) for r in rows}
+    return ((lo, hi) in pairs, (hi, lo) in pairs)
+
+
+def block_status(sender_id, receiver_id):
+    """Return (blocked_by_receiver, blocked_by_sender) for a 1:1 send."""
+    if sender_id is None or receiver_id is None:
+        return False, False
+    lo, hi = _pair(sender_id, receiver_id)
+    lo_blocks_hi, hi_blocks_lo = _blocks.get_or_load((lo, hi), lambda: _load_blocks(lo, hi))
+    if int(sender_id) == lo:
+        return hi_blocks_lo, lo_blocks_hi
+    return lo_blocks_hi, hi_blocks_lo
+
+
+def _load_group(group_id):
+    group = db.session.query(Group.owner_id).filter(Group.id == group_id).first()
+    if group is None:
+        return None
+    members = db.session.query(GroupMember.user_id).filter(GroupMember.group_id == group_id).all()
+    return group.owner_id, frozenset(uid for (uid,) in members)
+
+
+def group_info(group_id):
+    """Return (owner_id, member ids) for a group, or None if it does not exist."""
+    group_id = int(group_id)
+    return _groups.get_or_load(group_id, lambda: _load_group(group_id))
+
+
+def is_group_member(group_id, user_id):
+    info = group_info(group_id)
+    return info is not None and int(user_id) in info[1]
+
+
+def invalidate_block(a, b):
+    _blocks.pop(_pair(a, b))
+
+
+def invalidate_group(group_id):
+    _groups.pop(int(group_id))
+
+
+def clear():
+    _blocks.clear()
+    _groups.clear()
+
+
+def stats():
+    return {'blocks': _blocks.stats(), 'groups': _groups.stats()}
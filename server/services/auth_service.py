@@ -2,10 +2,25 @@ from models.user_model import User
 from config.database import db
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
+import os
+import time
+import uuid
+import hashlib
 import datetime
-from flask import current_app
+from flask import current_app, g, has_app_context
+from services.token_revocation import MemoryRevocationStore, RedisRevocationStore
+from utils.ttl_cache import TTLCache
 
-blacklist = set()
+# Verified claims, keyed by sha256(token). An entry lives until the token's `exp`,
+# so repeated requests with the same bearer token skip the HS256 verify; the
+# revocation check still runs on every decode (once per request, see decode_token).
+CLAIMS_CACHE_SIZE = int(os.environ.get('JWT_CLAIMS_CACHE_SIZE', '10000'))
+_claims_cache = TTLCache(maxsize=CLAIMS_CACHE_SIZE, ttl=24 * 3600)
+
+# Logged-out token ids. In-process by default; in multi-node mode (or with
+# TOKEN_REVOCATION_STORE=redis) they are stored in Redis, one key per token
+# expiring with the token, so every worker rejects them and restarts keep them.
+revoked = MemoryRevocationStore()
 
 def register_user(username, password, display_name=None):
     if User.query.filter_by(username=username).first():
@@ -20,34 +35,94 @@ def login_user(username, password):
     user = User.query.filter_by(username=username).first()
     if not user or not check_password_hash(user.password_hash, password):
         return {'success': False, 'error': 'Invalid credentials'}
-    payload = {
-        'user_id': user.id,
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-    }
-    token = jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
-    return {'success': True, 'token': token}
+    return {'success': True, 'token': create_token_for_user(user)}
 
 def create_token_for_user(user, hours=24):
     """Create a JWT token for a given User model instance."""
     payload = {
         'user_id': user.id,
+        'jti': uuid.uuid4().hex,
         'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=hours)
     }
     token = jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
     return token
 
-def decode_token(token):
+def _token_hash(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def _token_id(payload, token):
+    # tokens issued before `jti` was added are revoked by their hash
+    return payload.get('jti') or _token_hash(token)
+
+def _request_claims():
+    """Per-request {token: claims or None} memo on flask.g (None outside a context)."""
+    if not has_app_context():
+        return None
+    memo = g.get('_jwt_claims')
+    if memo is None:
+        memo = g._jwt_claims = {}
+    return memo
+
+def _verified_claims(token):
+    key = _token_hash(token)
+    payload = _claims_cache.get(key)
+    if payload is not None:
+        if payload.get('exp') is None or payload['exp'] > time.time():
+            return payload
+        _claims_cache.pop(key)
     try:
         payload = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        if is_token_blacklisted(token):
-            return None
-        return payload
     except Exception:
         return None
+    exp = payload.get('exp')
+    ttl = (exp - time.time()) if exp else None
+    if ttl is None or ttl > 0:
+        _claims_cache.set(key, payload, ttl=ttl)
+    return payload
+
+def decode_token(token):
+    """Verified claims of `token`, or None if invalid, expired or revoked.
+
+    The result is memoized for the current request in flask.g, so the route and
+    the after_request logger share one decode.
+    """
+    if not token:
+        return None
+    memo = _request_claims()
+    if memo is not None and token in memo:
+        return memo[token]
+    payload = _verified_claims(token)
+    try:
+        if payload is not None and is_token_revoked(payload, token):
+            payload = None
+    except Exception:
+        payload = None
+    if memo is not None:
+        memo[token] = payload
+    return payload
+
+def _revocation_store():
+    backend = (current_app.config.get('TOKEN_REVOCATION_STORE') or 'auto').lower()
+    if backend == 'redis' or (backend == 'auto' and current_app.config.get('MULTI_NODE')):
+        from services import redis_client
+        return RedisRevocationStore(redis_client.get_client())
+    return revoked
 
 def logout_user(token):
-    blacklist.add(token)
+    payload = _verified_claims(token)
+    # an invalid or expired token is already rejected, nothing to record
+    if payload is not None:
+        exp = payload.get('exp') or time.time() + 24 * 3600
+        _revocation_store().revoke(_token_id(payload, token), exp)
+    _claims_cache.pop(_token_hash(token))
+    memo = _request_claims()
+    if memo is not None:
+        memo.pop(token, None)
     return {'success': True, 'message': 'Logged out'}
 
-def is_token_blacklisted(token):
-    return token in blacklist
+def is_token_revoked(payload, token):
+    return _revocation_store().is_revoked(_token_id(payload, token))
+
+def clear_caches():
+    _claims_cache.clear()
+    revoked.clear()
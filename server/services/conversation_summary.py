@@ -0,0 +1,157 @@
+"""Keep the conversation_summary table in sync with message writes.
+
+Every function here only stages changes on db.session; the caller commits
+together with the message insert/edit/delete so the inbox never drifts from
+the message table.
+"""
+from sqlalchemy import func
+
+from config.database import db
+from models.conversation_summary_model import ConversationSummary
+from models.group_model import GroupMember
+from models.message_model import Message
+
+
+def preview_for(msg):
+    """Friendly one-line preview depending on message type."""
+    if msg.message_type == 'sticker':
+        return '[Sticker]'
+    if msg.file_url:
+        return '[File] '
+    return msg.content
+
+
+def _targets_for(msg):
+    """Return [(owner_user_id, kind, target_id), ...] that show this message."""
+    if msg.group_id:
+        member_ids = [row.user_id for row in
+                      db.session.query(GroupMember.user_id).filter_by(group_id=msg.group_id).all()]
+        return [(uid, 'group', msg.group_id) for uid in member_ids]
+    sender_id, receiver_id = int(msg.sender_id), int(msg.receiver_id)
+    targets = [(sender_id, 'user', receiver_id)]
+    if receiver_id != sender_id:
+        targets.append((receiver_id, 'user', sender_id))
+    return targets
+
+
+def record_message(msg):
+    """Upsert summary rows for a new message (msg must be flushed so it has an id)."""
+    targets = _targets_for(msg)
+    if not targets:
+        return
+    kind, target_id = targets[0][1], targets[0][2]
+    owner_ids = [t[0] for t in targets]
+    if kind == 'group':
+        existing = ConversationSummary.query.filter(
+            ConversationSummary.kind == 'group',
+            ConversationSummary.target_id == target_id,
+        ).all()
+    else:
+        existing = ConversationSummary.query.filter(
+            ConversationSummary.kind == 'user',
+            ConversationSummary.user_id.in_(owner_ids),
+            ConversationSummary.target_id.in_([t[2] for t in targets]),
+        ).all()
+    by_key = {(s.user_id, s.kind, s.target_id): s for s in existing}
+
+    preview = preview_for(msg)
+    sender_id = int(msg.sender_id)
+    for owner_id, k, tid in targets:
+        row = by_key.get((owner_id, k, tid))
+        if row is None:
+            row = ConversationSummary(user_id=owner_id, kind=k, target_id=tid, unread_count=0)
+            db.session.add(row)
+        row.last_message_id = msg.id
+        row.preview = preview
+        row.last_ts = msg.timestamp
+        if owner_id != sender_id:
+            row.unread_count = (row.unread_count or 0) + 1
+
+
+def record_edit(msg):
+    """Refresh the preview of rows whose last message was edited."""
+    ConversationSummary.query.filter_by(last_message_id=msg.id).update(
+        {'preview': preview_for(msg), 'last_ts': msg.timestamp},
+        synchronize_session=False,
+    )
+
+
+def _unread_from_others(msg, owner_ids):
+    """{owner_id: messages from others at or after msg} in msg's conversation."""
+    if msg.group_id:
+        by_sender = dict(
+            db.session.query(Message.sender_id, func.count())
+            .filter(Message.group_id == msg.group_id, Message.id >= msg.id)
+            .group_by(Message.sender_id).all())
+        total = sum(by_sender.values())
+        return {uid: total - by_sender.get(uid, 0) for uid in owner_ids}
+    # only the receiver's row counts msg as unread: one range scan of sender -> receiver
+    newer = Message.query.filter(Message.sender_id == msg.sender_id, Message.receiver_id == msg.receiver_id,
+                                 Message.group_id.is_(None), Message.id >= msg.id).count()
+    return {uid: newer for uid in owner_ids}
+
+
+def record_recall(msg):
+    """Repoint rows whose last message is being deleted to the previous message
+    and drop the message from the unread counters that still include it.
+
+    unread_count counts the messages from others since the owner last opened
+    the conversation, so msg is still unread for an owner when no more than
+    unread_count messages from others are at or after it.
+
+    Call before deleting `msg` (its id/conversation are still needed).
+    """
+    sender_id = int(msg.sender_id)
+    if msg.group_id:
+        rows = ConversationSummary.query.filter_by(kind='group', target_id=msg.group_id).all()
+    else:
+        pair = {(sender_id, int(msg.receiver_id)), (int(msg.receiver_id), sender_id)}
+        rows = ConversationSummary.query.filter(
+            ConversationSummary.kind == 'user',
+            ConversationSummary.user_id.in_([p[0] for p in pair]),
+            ConversationSummary.target_id.in_([p[1] for p in pair]),
+        ).all()
+        rows = [row for row in rows if (row.user_id, row.target_id) in pair]
+
+    unread = [row for row in rows if row.user_id != sender_id and row.unread_count]
+    if unread:
+        newer = _unread_from_others(msg, [row.user_id for row in unread])
+        for row in unread:
+            if newer[row.user_id] <= row.unread_count:
+                row.unread_count -= 1
+
+    rows = [row for row in rows if row.last_message_id == msg.id]
+    if not rows:
+        return
+    if msg.group_id:
+        prev = Message.query.filter(Message.group_id == msg.group_id, Message.id < msg.id) \
+            .order_by(Message.id.desc()).first()
+    else:
+        # one index range scan per direction, keep the newest; group messages reuse
+        # receiver_id for the group owner and must not leak into the 1:1 inbox row
+        candidates = [
+            Message.query.filter(Message.sender_id == a, Message.receiver_id == b, Message.group_id.is_(None),
+                                 Message.id < msg.id)
+            .order_by(Message.id.desc()).first()
+            for a, b in ((msg.sender_id, msg.receiver_id), (msg.receiver_id, msg.sender_id))
+        ]
+        candidates = [c for c in candidates if c is not None]
+        prev = max(candidates, key=lambda m: m.id) if candidates else None
+    for row in rows:
+        if prev is None:
+            row.last_message_id = None
+            row.preview = None
+        else:
+            row.last_message_id = prev.id
+            row.preview = preview_for(prev)
+            row.last_ts = prev.timestamp
+
+
+def mark_read(user_id, kind, target_id):
+    """Reset the unread counter of one conversation for user_id."""
+    return ConversationSummary.query.filter(
+        ConversationSummary.user_id == user_id,
+        ConversationSummary.kind == kind,
+        ConversationSummary.target_id == target_id,
+        ConversationSummary.unread_count > 0,
+    ).update({'unread_count': 0}, synchronize_session=False)
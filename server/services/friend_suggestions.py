@@ -0,0 +1,125 @@
+"""Friend-of-friend suggestions for GET /users/suggestions.
+
+Candidates are the friends of the user's friends, ranked by how many
+friends they share with the user. The accepted-friend graph is read
+through the (user_id, status) / (friend_id, status) indexes of the friend
+table: both directions of every edge leaving the user's friends go
+through one UNION ALL + GROUP BY, so the mutual count of every 2-hop
+candidate comes back from a single query, best first.
+
+The result (up to MAX_CANDIDATES ids with their mutual counts, minus
+existing relations in any status, blocks in either direction and the user
+themselves) is cached per user, and pages are sliced from it. Every write
+that changes the answer invalidates it:
+
+  - friend accept / remove (edge a-b)  -> invalidate_edge(a, b): a, b and
+    every friend of either, whose 2-hop neighbourhood went through a or b
+  - friend request sent / rejected     -> invalidate(sender, target)
+  - block / unblock                    -> invalidate(user, target)
+  - admin user delete / clear-all      -> clear()
+
+Users with no friend-of-friend candidates (new accounts) get the newest
+unrelated users as filler, with 0 mutuals. SUGGESTION_CACHE_TTL only bounds
+staleness for writes made by another node.
+"""
+import os
+
+from sqlalchemy import func, or_, select, union_all
+
+from config.database import db
+from models.block_model import Block
+from models.friend_model import Friend
+from models.user_model import User
+from services.presence import load_friend_ids
+from utils.ttl_cache import TTLCache
+
+CACHE_TTL = float(os.environ.get('SUGGESTION_CACHE_TTL', '600'))
+CACHE_SIZE = int(os.environ.get('SUGGESTION_CACHE_SIZE', '20000'))
+MAX_CANDIDATES = 200
+
+# user_id -> tuple((candidate_id, mutual friends), ...), best first
+_ranked = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+
+def _excluded(user_id):
+    """The user, everyone they have a friend row with (any status) and blocks either way."""
+    related = db.session.query(Friend.user_id, Friend.friend_id).filter(
+        or_(Friend.user_id == user_id, Friend.friend_id == user_id)).all()
+    blocks = db.session.query(Block.user_id, Block.target_id).filter(
+        or_(Block.user_id == user_id, Block.target_id == user_id)).all()
+    excluded = {user_id}
+    for a, b in related + blocks:
+        excluded.add(a)
+        excluded.add(b)
+    return excluded
+
+
+def neighbourhood(user_id):
+    """Subquery with one `candidate` row per accepted edge leaving a friend of user_id.
+
+    Grouped by candidate, the row count is the number of mutual friends.
+    """
+    mine = select(Friend.friend_id).where(Friend.user_id == user_id, Friend.status == 'accepted') \
+        .union(select(Friend.user_id).where(Friend.friend_id == user_id, Friend.status == 'accepted'))
+    return union_all(
+        select(Friend.friend_id.label('candidate'))
+        .where(Friend.status == 'accepted', Friend.user_id.in_(mine)),
+        select(Friend.user_id.label('candidate'))
+        .where(Friend.status == 'accepted', Friend.friend_id.in_(mine)),
+    ).subquery()
+
+
+def _mutual_counts(user_id, limit):
+    """[(candidate, mutual)] over the 2-hop neighbourhood of user_id, best first."""
+    hops = neighbourhood(user_id)
+    mutual = func.count().label('mutual')
+    return db.session.query(hops.c.candidate, mutual).group_by(hops.c.candidate) \
+        .order_by(mutual.desc(), hops.c.candidate).limit(limit).all()
+
+
+def _load(user_id):
+    excluded = _excluded(user_id)
+    # excluded ids can fill at most len(excluded) of the rows
+    ranked = [(c, n) for c, n in _mutual_counts(user_id, MAX_CANDIDATES + len(excluded)) if c not in excluded]
+    ranked = ranked[:MAX_CANDIDATES]
+    if len(ranked) < MAX_CANDIDATES:
+        seen = excluded | {c for c, _ in ranked}
+        newest = db.session.query(User.id).order_by(User.id.desc()) \
+            .limit(MAX_CANDIDATES - len(ranked) + len(seen)).all()
+        ranked += [(uid, 0) for (uid,) in newest if uid not in seen][:MAX_CANDIDATES - len(ranked)]
+    return tuple(ranked)
+
+
+def ranked(user_id):
+    """Cached [(candidate_id, mutual friends)] for user_id, best first."""
+    user_id = int(user_id)
+    return _ranked.get_or_load(user_id, lambda: _load(user_id))
+
+
+def page(user_id, limit=10, offset=0):
+    """[(User, mutual friends)] for one page of suggestions; one IN query when cached."""
+    window = ranked(user_id)[offset:offset + limit]
+    if not window:
+        return []
+    users = {u.id: u for u in User.query.filter(User.id.in_([c for c, _ in window])).all()}
+    return [(users[c], n) for c, n in window if c in users]
+
+
+def invalidate(*user_ids):
+    for uid in user_ids:
+        if uid is not None:
+            _ranked.pop(int(uid))
+
+
+def invalidate_edge(a, b):
+    """A friendship a-b was accepted or removed (call after the commit)."""
+    affected = {int(a), int(b)} | load_friend_ids(a) | load_friend_ids(b)
+    invalidate(*affected)
+
+
+def clear():
+    _ranked.clear()
+
+
+def stats():
+    return _ranked.stats()
@@ -0,0 +1,75 @@
+"""Group online status driven by per-group online counters.
+
+A group is 'online' when at least ONLINE_THRESHOLD of its members are
+connected. Instead of reloading every member of every group on each join or
+disconnect, the presence registry keeps a counter per group that moves by
++1/-1 when a member comes online / goes offline (or joins / leaves the group
+while online). Only groups whose counter crosses the threshold are written
+(at most one UPDATE per status value) and announced once in the group room.
+
+Since only crossings are written, Group.status left over from a previous
+run (in-memory counters start at 0, a crashed node never sent its -1s) is
+brought back in line with the counters once at boot by reconcile().
+"""
+from config.database import db
+from models.group_model import Group, GroupMember
+from services import group_rooms
+from services.presence import registry as presence
+
+ONLINE_THRESHOLD = 2
+
+
+def member_group_ids(user_id):
+    return [gid for (gid,) in db.session.query(GroupMember.group_id).filter_by(user_id=int(user_id)).all()]
+
+
+def apply_delta(group_ids, delta):
+    """Move the online counters of group_ids by delta and stage Group.status flips.
+
+    Returns {group_id: new_status} for groups that crossed the threshold. The
+    caller commits.
+    """
+    counts = presence.incr_groups(group_ids, delta)
+    flips = {}
+    for gid, count in counts.items():
+        was_online = (count - delta) >= ONLINE_THRESHOLD
+        now_online = count >= ONLINE_THRESHOLD
+        if was_online != now_online:
+            flips[gid] = 'online' if now_online else 'offline'
+    for status in ('online', 'offline'):
+        ids = [gid for gid, s in flips.items() if s == status]
+        if ids:
+            Group.query.filter(Group.id.in_(ids)).update({'status': status}, synchronize_session=False)
+    return flips
+
+
+def reconcile():
+    """Make Group.status match the online counters (boot). The caller commits."""
+    online = [gid for gid, count in presence.group_online_counts().items() if count >= ONLINE_THRESHOLD]
+    stale = Group.query.filter(Group.status == 'online')
+    if online:
+        stale = stale.filter(Group.id.notin_(online))
+        Group.query.filter(Group.id.in_(online), Group.status != 'online') \
+            .update({'status': 'online'}, synchronize_session=False)
+    stale.update({'status': 'offline'}, synchronize_session=False)
+
+
+def user_transition(user_id, delta, group_ids=None):
+    """User came online (+1) or went offline (-1): update every group they belong to."""
+    if group_ids is None:
+        group_ids = member_group_ids(user_id)
+    return apply_delta(group_ids, delta)
+
+
+def members_changed(group_id, user_ids, sign):
+    """Membership change (sign=+1 added, -1 removed); only online users move the counter."""
+    online = sum(1 for uid in user_ids if presence.is_online(uid))
+    if not online:
+        return {}
+    return apply_delta([int(group_id)], sign * online)
+
+
+def emit_updates(socketio, flips):
+    """Announce status flips: one emit per flipped group into its group room."""
+    for gid, status in flips.items():
+        group_rooms.emit_to_group(socketio, 'group_updated', {'group_id': gid, 'status': status}, gid)
@@ -0,0 +1,53 @@
+"""Socket.IO rooms per group.
+
+Every connected socket of a group member sits in the room `group-<id>`, so a
+group message, reaction or status change is serialized and emitted once
+instead of once per member into `user-<id>` rooms. Sockets enter their rooms
+on `join`; routes/groups keeps the rooms in sync when members are added or
+removed (this works across nodes when a message queue is configured).
+"""
+from flask import current_app
+
+from services.presence import registry as presence
+
+NAMESPACE = '/'
+
+
+def room_name(group_id):
+    return f'group-{group_id}'
+
+
+def current_socketio():
+    """The SocketIO instance bound to the running app (None if sockets are not set up)."""
+    return current_app.extensions.get('socketio')
+
+
+def enter_groups(socketio, sid, group_ids):
+    """Put one socket into the rooms of all its groups (called from the join handler)."""
+    for gid in group_ids:
+        socketio.server.enter_room(sid, room_name(gid), namespace=NAMESPACE)
+
+
+def add_members(group_id, user_ids, socketio=None):
+    """Add every connected socket of user_ids to the group room."""
+    socketio = socketio or current_socketio()
+    if socketio is None:
+        return
+    room = room_name(group_id)
+    for uid in user_ids:
+        for sid in presence.sids_for(uid):
+            socketio.server.enter_room(sid, room, namespace=NAMESPACE)
+
+
+def remove_members(group_id, user_ids, socketio=None):
+    socketio = socketio or current_socketio()
+    if socketio is None:
+        return
+    room = room_name(group_id)
+    for uid in user_ids:
+        for sid in presence.sids_for(uid):
+            socketio.server.leave_room(sid, room, namespace=NAMESPACE)
+
+
+def emit_to_group(socketio, event, payload, group_id):
+    socketio.emit(event, payload, room=room_name(group_id))
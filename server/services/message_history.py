@@ -0,0 +1,121 @@
+"""Keyset (cursor) pagination for message history endpoints.
+
+Pages are selected by message id instead of OFFSET or loading the whole
+conversation, so every page is a bounded range scan on the composite
+indexes (sender_id, receiver_id, id) and (group_id, id):
+
+  - no cursor:        newest `limit` messages
+  - before_id=<id>:   the `limit` messages immediately older than <id>
+  - after_id=<id>:    the `limit` messages immediately newer than <id>
+
+Each page is returned in ascending id order so clients can render it as-is.
+"""
+from models.message_model import Message
+from models.user_model import User
+from services import reactions
+from services.message_writer import writer as message_writer
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 200
+
+
+def parse_page_args(args):
+    """Read before_id / after_id / limit from request args.
+
+    Raises ValueError with a client-facing message on bad input.
+    """
+    try:
+        before_id = int(args['before_id']) if args.get('before_id') else None
+        after_id = int(args['after_id']) if args.get('after_id') else None
+        limit = int(args['limit']) if args.get('limit') else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise ValueError('before_id, after_id and limit must be integers')
+    if before_id is not None and after_id is not None:
+        raise ValueError('Use either before_id or after_id, not both')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return before_id, after_id, limit
+
+
+def _page(query, before_id, after_id, limit):
+    """Apply the cursor to a single indexed query and fetch limit + 1 rows."""
+    if after_id is not None:
+        query = query.filter(Message.id > after_id).order_by(Message.id.asc())
+    else:
+        if before_id is not None:
+            query = query.filter(Message.id < before_id)
+        query = query.order_by(Message.id.desc())
+    return query.limit(limit + 1).all()
+
+
+def _finish(rows, after_id, limit):
+    """Trim the extra probe row and return (ascending page, has_more)."""
+    forward = after_id is not None
+    rows.sort(key=lambda m: m.id, reverse=not forward)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not forward:
+        rows.reverse()
+    return rows, has_more
+
+
+def fetch_direct_page(a, b, before_id=None, after_id=None, limit=DEFAULT_PAGE_SIZE):
+    """Page of messages between users a and b (both directions).
+
+    The two directions are fetched as two index range scans and merged in
+    Python; an OR across both pairs would force SQLite to sort every match.
+    """
+    message_writer.ensure_persisted()
+    # group messages store the group owner as receiver_id: keep them out of the 1:1 history
+    direct = Message.group_id.is_(None)
+    rows = _page(Message.query.filter(Message.sender_id == a, Message.receiver_id == b, direct),
+                 before_id, after_id, limit)
+    if a != b:
+        rows += _page(Message.query.filter(Message.sender_id == b, Message.receiver_id == a, direct),
+                      before_id, after_id, limit)
+    return _finish(rows, after_id, limit)
+
+
+def fetch_group_page(group_id, before_id=None, after_id=None, limit=DEFAULT_PAGE_SIZE):
+    """Page of messages for a group."""
+    message_writer.ensure_persisted()
+    rows = _page(Message.query.filter(Message.group_id == group_id), before_id, after_id, limit)
+    return _finish(rows, after_id, limit)
+
+
+def load_senders(msgs):
+    """Resolve sender profiles for a page with a single IN query.
+
+    Returns {user_id: User}; replaces one User.query.get() per message.
+    """
+    sender_ids = {m.sender_id for m in msgs}
+    if not sender_ids:
+        return {}
+    return {u.id: u for u in User.query.filter(User.id.in_(sender_ids)).all()}
+
+
+def load_reactions(msgs):
+    """Reaction summaries for a page: {message_id: {emoji: count}}.
+
+    Read from the message_reaction_count aggregate with one IN query, so a
+    page full of reactions costs the same as a page without any.
+    """
+    return reactions.counts_for([m.id for m in msgs])
+
+
+def load_my_reactions(msgs, viewer_id):
+    """{message_id: [emoji]} the viewer reacted with, so clients can offer to take them back."""
+    return reactions.mine_for([m.id for m in msgs], viewer_id)
+
+
+def add_page_headers(response, msgs, has_more):
+    """Expose the cursor to clients without changing the JSON list body.
+
+    X-Next-Before-Id is the cursor for the next older page, X-Next-After-Id
+    the cursor for polling newer messages; X-Has-More tells whether another
+    page exists in the direction that was requested.
+    """
+    response.headers['X-Has-More'] = 'true' if has_more else 'false'
+    if msgs:
+        response.headers['X-Next-Before-Id'] = str(msgs[0].id)
+        response.headers['X-Next-After-Id'] = str(msgs[-1].id)
+    return response
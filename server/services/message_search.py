@@ -0,0 +1,150 @@
+"""Full-text message search (GET /messages/search).
+
+SQLite: `message_fts` is a contentless FTS5 table keyed by message id and
+tokenized with unicode61 remove_diacritics, so "tieng viet" finds
+"Tiếng Việt". unicode61 keeps đ as its own letter, so the triggers fold
+đ/Đ to d before indexing. PostgreSQL: `message_search` holds one
+to_tsvector('simple', unaccent(content)) per message behind a GIN index.
+
+In both cases triggers on `message` keep the index in sync (insert, edit of
+content, recall = delete); nothing in Python writes to it. install() runs on
+the message table's after_create, so db.create_all() (fresh databases, test
+fixtures) builds the index too; the e1c7d5b9a3f6 migration adds it to
+existing databases and backfills it.
+
+Queries are folded the same way in Python, split into words and matched as
+an AND of words, the last one as a prefix (search-as-you-type). Results are
+ranked (bm25 / ts_rank, newest first on ties), paginated with limit/offset
+and limited to conversations the caller belongs to: their direct messages
+and the groups they are a member of.
+"""
+import re
+
+from sqlalchemy import column, func, literal_column, or_, select, table, text
+
+from config.database import db
+from models.group_model import GroupMember
+from models.message_model import Message
+from utils.search_text import fold
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_TERMS = 8
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+        content, content='', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS message_fts_insert AFTER INSERT ON message BEGIN
+        INSERT INTO message_fts (rowid, content)
+        VALUES (new.id, replace(replace(new.content, 'đ', 'd'), 'Đ', 'D'));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS message_fts_delete AFTER DELETE ON message BEGIN
+        INSERT INTO message_fts (message_fts, rowid, content)
+        VALUES ('delete', old.id, replace(replace(old.content, 'đ', 'd'), 'Đ', 'D'));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS message_fts_update AFTER UPDATE OF content ON message BEGIN
+        INSERT INTO message_fts (message_fts, rowid, content)
+        VALUES ('delete', old.id, replace(replace(old.content, 'đ', 'd'), 'Đ', 'D'));
+        INSERT INTO message_fts (rowid, content)
+        VALUES (new.id, replace(replace(new.content, 'đ', 'd'), 'Đ', 'D'));
+    END""",
+]
+
+POSTGRES_DDL = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    """CREATE TABLE IF NOT EXISTS message_search (
+        message_id INTEGER PRIMARY KEY REFERENCES message (id) ON DELETE CASCADE,
+        document TSVECTOR NOT NULL)""",
+    'CREATE INDEX IF NOT EXISTS ix_message_search_document ON message_search USING GIN (document)',
+    """CREATE OR REPLACE FUNCTION message_search_sync() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO message_search (message_id, document)
+        VALUES (NEW.id, to_tsvector('simple', unaccent(NEW.content)))
+        ON CONFLICT (message_id) DO UPDATE SET document = EXCLUDED.document;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    'DROP TRIGGER IF EXISTS message_search_sync ON message',
+    """CREATE TRIGGER message_search_sync AFTER INSERT OR UPDATE OF content ON message
+        FOR EACH ROW EXECUTE FUNCTION message_search_sync()""",
+]
+
+_fts = table('message_fts', column('rowid'))
+_pg = table('message_search', column('message_id'), column('document'))
+
+
+def install(connection):
+    """Create the search index and its triggers on connection (idempotent)."""
+    ddl = POSTGRES_DDL if connection.dialect.name == 'postgresql' else SQLITE_DDL
+    for statement in ddl:
+        connection.execute(text(statement))
+
+
+def uninstall(connection):
+    """Drop the search index (its triggers go with the message table)."""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('DROP TABLE IF EXISTS message_search'))
+        connection.execute(text('DROP FUNCTION IF EXISTS message_search_sync()'))
+    else:
+        connection.execute(text('DROP TABLE IF EXISTS message_fts'))
+
+
+def terms(q):
+    """Search words of a query string, folded; at most MAX_TERMS."""
+    return re.findall(r'\w+', fold(q or ''))[:MAX_TERMS]
+
+
+def parse_search_args(args):
+    """Read q / limit / offset / peer_id / group_id from request args.
+
+    Raises ValueError with a client-facing message on bad input.
+    """
+    q = (args.get('q') or '').strip()
+    if not terms(q):
+        raise ValueError('q must contain at least one word')
+    try:
+        limit = int(args['limit']) if args.get('limit') else DEFAULT_PAGE_SIZE
+        offset = int(args['offset']) if args.get('offset') else 0
+        peer_id = int(args['peer_id']) if args.get('peer_id') else None
+        group_id = int(args['group_id']) if args.get('group_id') else None
+    except ValueError:
+        raise ValueError('limit, offset, peer_id and group_id must be integers')
+    if peer_id is not None and group_id is not None:
+        raise ValueError('Use either peer_id or group_id, not both')
+    return q, max(1, min(limit, MAX_PAGE_SIZE)), max(0, offset), peer_id, group_id
+
+
+def _scope(query, user_id, peer_id, group_id):
+    """Only conversations user_id takes part in (optionally a single one)."""
+    my_groups = select(GroupMember.group_id).where(GroupMember.user_id == user_id)
+    if group_id is not None:
+        return query.filter(Message.group_id == group_id, Message.group_id.in_(my_groups))
+    direct = Message.group_id.is_(None)
+    if peer_id is not None:
+        return query.filter(direct, or_(
+            (Message.sender_id == user_id) & (Message.receiver_id == peer_id),
+            (Message.sender_id == peer_id) & (Message.receiver_id == user_id),
+        ))
+    return query.filter(or_(
+        direct & or_(Message.sender_id == user_id, Message.receiver_id == user_id),
+        Message.group_id.in_(my_groups),
+    ))
+
+
+def search(user_id, q, limit=DEFAULT_PAGE_SIZE, offset=0, peer_id=None, group_id=None):
+    """Ranked page of user_id's messages matching q. Returns (messages, has_more)."""
+    words = terms(q)
+    if not words:
+        return [], False
+    if db.engine.dialect.name == 'postgresql':
+        tsquery = func.to_tsquery('simple', ' & '.join(words[:-1] + [words[-1] + ':*']))
+        query = db.session.query(Message).join(_pg, _pg.c.message_id == Message.id) \
+            .filter(_pg.c.document.op('@@')(tsquery)) \
+            .order_by(func.ts_rank(_pg.c.document, tsquery).desc(), Message.id.desc())
+    else:
+        # every word quoted, so FTS5 operators typed by users are plain text
+        match = ' '.join(f'"{w}"' for w in words) + '*'
+        query = db.session.query(Message).join(_fts, _fts.c.rowid == Message.id) \
+            .filter(literal_column('message_fts').op('MATCH')(match)) \
+            .order_by(func.bm25(literal_column('message_fts')), Message.id.desc())
+    rows = _scope(query, user_id, peer_id, group_id).offset(offset).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
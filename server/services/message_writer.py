@@ -0,0 +1,442 @@
+"""Write-behind persistence for chat messages (opt-in, MESSAGE_WRITE_BEHIND=true).
+
+With the default synchronous path every send_message pays one SQLite commit
+(and fsync) before the sender gets its ack. In write-behind mode:
+
+  1. the message gets its id from an in-process counter seeded with
+     max(message.id);
+  2. it is appended to a local journal according to WRITE_BEHIND_DURABILITY
+     and acked right away;
+  3. a background task commits pending messages (and their conversation
+     summaries) in one transaction per WRITE_BEHIND_BATCH_SIZE messages, as soon
+     as that many are waiting or the oldest has waited WRITE_BEHIND_FLUSH_MS;
+  4. on startup recover() re-inserts journaled messages that never reached the
+     database, so an acked message survives a crash of the process.
+
+Journal segments are deleted once every message in them is committed. A row
+the database refuses (IntegrityError / DataError, e.g. the sender was deleted
+meanwhile) is dropped on its own; any other failure (database locked, lost
+connection, serialization failure) puts the batch back in front of the queue,
+keeps its journal records and retries with exponential backoff, so an acked
+message is never lost to a transient error.
+
+Write-behind is single-node only and init_app() refuses it with MULTI_NODE:
+each node would commit its own batches on its own timer, so a node could
+commit id N+1 before another commits id N and an after_id / last-id reader
+would step over N for good. ensure_persisted() only sees this node's queue.
+Readers that need a message that may still be pending (history pages,
+edit/recall/reaction on a fresh id) call ensure_persisted() first; it forces a
+flush only when something is actually pending.
+
+Every insert into `message` goes through the allocator while the writer is
+enabled (before_insert hook), so synchronous inserts (stickers, uploads) never
+collide with ids handed out ahead of their commit.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, func
+from sqlalchemy.exc import DataError, IntegrityError
+
+from config.database import db
+from models.message_model import Message
+from services import conversation_summary, offload
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_LEVELS = ('fsync', 'flush', 'none')
+# columns copied from the transient Message into the journal / batch insert
+COLUMNS = ('id', 'sender_id', 'receiver_id', 'group_id', 'content', 'file_url',
+           'message_type', 'sticker_id', 'sticker_url', 'timestamp')
+# per-row failures: retrying cannot help, the row is dropped (and counted)
+ROW_ERRORS = (IntegrityError, DataError, TypeError, ValueError)
+MAX_RETRY_DELAY = 5.0  # seconds between attempts after repeated transient failures
+
+
+class _Retry(Exception):
+    """A batch failed for a reason that may go away; `records` were not committed."""
+
+    def __init__(self, records, written, cause):
+        super().__init__(str(cause))
+        self.records = records
+        self.written = written
+        self.cause = cause
+
+
+class IdAllocator:
+    """Monotonic ids for a single process, starting after `last_id`."""
+
+    def __init__(self, last_id=0):
+        self._next = int(last_id or 0) + 1
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            value = self._next
+            self._next += 1
+            return value
+
+
+class Journal:
+    """Append-only JSON-lines journal split into segments.
+
+    append() returns the segment number the record landed in; release() is
+    called with those numbers once the records are committed, and closed
+    segments with nothing outstanding are deleted.
+    """
+
+    def __init__(self, directory, durability='flush', segment_bytes=4 * 1024 * 1024):
+        self.directory = directory
+        self.durability = durability
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._outstanding = {}  # segment -> records not yet committed
+        existing = self.segments()
+        self._segment = (self._number(existing[-1]) + 1) if existing else 1
+        self._fh = None
+
+    @staticmethod
+    def _number(path):
+        return int(os.path.basename(path).split('-')[1].split('.')[0])
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f'segment-{segment:08d}.jsonl')
+
+    def segments(self):
+        names = [n for n in os.listdir(self.directory) if n.startswith('segment-') and n.endswith('.jsonl')]
+        return [os.path.join(self.directory, n) for n in sorted(names)]
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=_json_default) + '\n'
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self._path(self._segment), 'a', encoding='utf-8')
+            elif self._fh.tell() >= self.segment_bytes:
+                self._fh.close()
+                self._segment += 1
+                self._fh = open(self._path(self._segment), 'a', encoding='utf-8')
+            self._fh.write(line)
+            self._fh.flush()
+            if self.durability == 'fsync':
+                os.fsync(self._fh.fileno())
+            self._outstanding[self._segment] = self._outstanding.get(self._segment, 0) + 1
+            return self._segment
+
+    def release(self, segments):
+        with self._lock:
+            for seg in segments:
+                self._outstanding[seg] -= 1
+            for seg in [s for s, n in self._outstanding.items() if n <= 0 and s != self._segment]:
+                del self._outstanding[seg]
+                try:
+                    os.remove(self._path(seg))
+                except OSError:
+                    logger.warning('Could not remove journal segment %s', seg)
+
+    def read_all(self):
+        """All records of every segment on disk (a torn last line is skipped)."""
+        records = []
+        for path in self.segments():
+            with open(path, encoding='utf-8') as fh:
+                for line in fh:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        logger.warning('Skipping torn journal line in %s', path)
+        return records
+
+    def truncate(self):
+        """Drop every segment (after recovery has committed their records)."""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            for path in self.segments():
+                os.remove(path)
+            self._outstanding.clear()
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'not JSON serializable: {type(value)!r}')
+
+
+def _row(record):
+    row = {k: record.get(k) for k in COLUMNS if record.get(k) is not None}
+    if isinstance(row.get('timestamp'), str):
+        row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+    return row
+
+
+class MessageWriter:
+    def __init__(self):
+        self.enabled = False
+        self.batch_size = 64
+        self.flush_ms = 20
+        self.durability = 'flush'
+        self.journal = None
+        self.allocator = None
+        self._pending = []  # [(record, journal segment or None)]
+        self._pending_ids = set()  # pending + being committed
+        self._oldest = None
+        self._failures = 0  # consecutive transient flush failures
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = False
+        self._listening = False
+        self.committed = 0
+        self.batches = 0
+        self.dropped = 0
+        self.retries = 0
+
+    def configure(self, batch_size=64, flush_ms=20, durability='flush', journal_dir=None):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f'WRITE_BEHIND_DURABILITY must be one of {DURABILITY_LEVELS}, got {durability!r}')
+        self.batch_size = max(1, int(batch_size))
+        self.flush_ms = max(1, int(flush_ms))
+        self.durability = durability
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = Journal(journal_dir, durability) if durability != 'none' else None
+
+    def enable(self, allocator=None):
+        """Start allocating ids (call inside an app context)."""
+        if allocator is None:
+            allocator = IdAllocator(db.session.query(func.max(Message.id)).scalar())
+        self.allocator = allocator
+        if not self._listening:
+            event.listen(Message, 'before_insert', _assign_id)
+            self._listening = True
+        self.enabled = True
+        self._stopped = False
+
+    def disable(self):
+        """Stop the loop and forget anything pending (its journal stays on disk for recover())."""
+        self.enabled = False
+        self._stopped = True
+        with self._lock:
+            self._pending = []
+            self._pending_ids.clear()
+        if self.journal is not None:
+            self.journal.close()
+
+    def next_id(self):
+        return self.allocator.next()
+
+    def submit(self, msg):
+        """Give a transient Message its id and timestamp and queue it for the next batch.
+
+        Returns once the message is durable according to the configured level;
+        the caller can ack it immediately afterwards.
+        """
+        if msg.id is None:
+            msg.id = self.next_id()
+        if msg.timestamp is None:
+            msg.timestamp = datetime.utcnow()
+        if msg.message_type is None:
+            msg.message_type = 'text'
+        record = {k: getattr(msg, k) for k in COLUMNS}
+        segment = self.journal.append(record) if self.journal is not None else None
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((record, segment))
+            self._pending_ids.add(record['id'])
+        return msg
+
+    def pending(self):
+        return len(self._pending)
+
+    def due(self):
+        with self._lock:
+            if not self._pending or time.monotonic() < self._retry_at:
+                return False
+            return (len(self._pending) >= self.batch_size
+                    or (time.monotonic() - self._oldest) * 1000 >= self.flush_ms)
+
+    def flush(self):
+        """Commit everything pending, batch_size messages per transaction. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                items, self._pending = self._pending, []
+                self._oldest = None
+            written = 0
+            for start in range(0, len(items), self.batch_size):
+                chunk = items[start:start + self.batch_size]
+                try:
+                    written += self._persist([record for record, _ in chunk])
+                except _Retry as e:
+                    written += e.written
+                    done = len(chunk) - len(e.records)
+                    self._release(chunk[:done])
+                    self._requeue(chunk[done:] + items[start + self.batch_size:], e.cause)
+                    break
+                self.batches += 1
+                self._release(chunk)
+            else:
+                self._failures, self._retry_at = 0, 0.0
+            self.committed += written
+            return written
+
+    def _release(self, entries):
+        """Forget committed (or dropped) entries and let their journal segments go."""
+        with self._lock:
+            self._pending_ids.difference_update(record['id'] for record, _ in entries)
+        if self.journal is not None and entries:
+            self.journal.release([seg for _, seg in entries])
+
+    def _requeue(self, entries, cause):
+        """Put uncommitted entries back in front of the queue and back off before the next try."""
+        with self._lock:
+            self._pending = entries + self._pending
+            self._oldest = time.monotonic()
+            self._failures += 1
+            delay = min(MAX_RETRY_DELAY, self.flush_ms / 1000.0 * 2 ** self._failures)
+            self._retry_at = time.monotonic() + delay
+        self.retries += 1
+        logger.warning('Write-behind flush failed (%s), %s message(s) kept, retrying in %.2fs',
+                       cause, len(entries), delay)
+
+    def _persist(self, records):
+        """Commit records in one transaction. Returns rows written; raises _Retry on transient errors."""
+        try:
+            msgs = [Message(**_row(r)) for r in records]
+            db.session.add_all(msgs)
+            db.session.flush()
+            for msg in msgs:
+                conversation_summary.record_message(msg)
+            db.session.commit()
+            return len(msgs)
+        except ROW_ERRORS:
+            db.session.rollback()
+            if len(records) == 1:
+                # acked but unstorable (e.g. the sender was deleted meanwhile)
+                self.dropped += 1
+                logger.exception('Write-behind dropped message id=%s', records[0].get('id'))
+                return 0
+            # isolate the bad row so the rest of the batch still lands
+            written = 0
+            for i, record in enumerate(records):
+                try:
+                    written += self._persist([record])
+                except _Retry as e:
+                    raise _Retry(records[i:], written, e.cause)
+            return written
+        except Exception as e:
+            db.session.rollback()
+            raise _Retry(records, 0, e)
+
+    def ensure_persisted(self, message_id=None):
+        """Flush now if `message_id` (or, without an id, anything) is still pending.
+
+        Commits the current session, so call it before staging other changes.
+        """
+        if not self.enabled or not self._pending_ids:
+            return
+        if message_id is not None:
+            try:
+                if int(message_id) not in self._pending_ids:
+                    return
+            except (TypeError, ValueError):
+                return
+        self.flush()
+
+    def recover(self):
+        """Insert journaled messages that never got committed. Returns how many were replayed."""
+        if self.journal is None:
+            return 0
+        records = self.journal.read_all()
+        if not records:
+            return 0
+        ids = [r['id'] for r in records]
+        present = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            present.update(i for (i,) in db.session.query(Message.id).filter(Message.id.in_(chunk)).all())
+        missing = [r for r in records if r['id'] not in present]
+        replayed = 0
+        try:
+            for start in range(0, len(missing), self.batch_size):
+                replayed += self._persist(missing[start:start + self.batch_size])
+        except _Retry as e:
+            # keep every segment: the next start replays what is still missing
+            logger.error('Write-behind journal replay failed after %s message(s); journal kept', replayed)
+            raise e.cause
+        self.journal.truncate()
+        if replayed:
+            logger.warning('Write-behind journal: replayed %s message(s) that were acked but not committed', replayed)
+        return replayed
+
+    def start(self, app, socketio):
+        """Run the batching loop as a Socket.IO background task."""
+        tick = min(self.flush_ms, 5) / 1000.0
+
+        def loop():
+            while not self._stopped:
+                socketio.sleep(tick)
+                if self.due():
+                    try:
+                        offload.run_blocking(self._flush_in_context, app)
+                    except Exception:
+                        logger.exception('Write-behind flush failed')
+
+        return socketio.start_background_task(loop)
+
+    def _flush_in_context(self, app):
+        with app.app_context():
+            self.flush()
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'pending': len(self._pending),
+            'committed': self.committed,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'retries': self.retries,
+            'durability': self.durability,
+        }
+
+
+def _assign_id(mapper, connection, target):
+    if writer.enabled and target.id is None:
+        target.id = writer.next_id()
+
+
+writer = MessageWriter()
+
+
+def init_app(app, socketio):
+    """Enable write-behind when MESSAGE_WRITE_BEHIND is set; recovers the journal first."""
+    if not app.config.get('MESSAGE_WRITE_BEHIND'):
+        return False
+    if app.config.get('MULTI_NODE'):
+        # batches of different nodes would commit ids out of order (see module docstring)
+        logger.error('MESSAGE_WRITE_BEHIND is not supported with MULTI_NODE; messages are written synchronously')
+        return False
+    writer.configure(
+        batch_size=app.config.get('WRITE_BEHIND_BATCH_SIZE', 64),
+        flush_ms=app.config.get('WRITE_BEHIND_FLUSH_MS', 20),
+        durability=app.config.get('WRITE_BEHIND_DURABILITY', 'flush'),
+        journal_dir=app.config.get('WRITE_BEHIND_JOURNAL_DIR'),
+    )
+    with app.app_context():
+        writer.recover()
+        writer.enable()
+    writer.start(app, socketio)
+    logger.info('Write-behind message persistence on (batch=%s, %sms, durability=%s)',
+                writer.batch_size, writer.flush_ms, writer.durability)
+    return True
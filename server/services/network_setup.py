@@ -1,4 +1,3 @@
-from pyngrok import ngrok
 import os
 import subprocess
 import logging
@@ -13,6 +12,9 @@ def start_ngrok(app, port=None):
     - Port can be passed explicitly; otherwise BACKEND_PORT or 5000 is used.
     - Uses ngrok from PATH (assumed to be installed manually or system-wide).
     """
+    # pyngrok is only needed when the tunnel is enabled; keep it out of normal startup
+    from pyngrok import ngrok
+
     # Allow explicit port or read from env
     if port is None:
         try:
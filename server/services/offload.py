@@ -0,0 +1,132 @@
+"""Run blocking Socket.IO handler bodies outside the cooperative event loop.
+
+Under the production entry point (wsgi.py, gevent worker) every connection is a
+greenlet on one hub. The chat handlers call SQLAlchemy synchronously and
+SQLite blocks in C, so a slow commit would stall every socket. install()
+wraps each handler registered with `@socketio.on` so that its body runs in
+gevent's native thread pool (DB_THREADPOOL_SIZE threads) while the calling
+greenlet simply waits:
+
+  - the Flask request/app context is copied into the worker thread, so
+    `request.sid`, `db.session` and `current_app` behave as before;
+  - `socketio.emit` called from a worker thread is handed back to the hub
+    with run_callback_threadsafe, because the engine.io transports may only
+    be touched from the hub.
+
+REST requests get the same treatment through OffloadMiddleware; only the
+/socket.io transport stays on the hub.
+
+With any other async mode (threading dev server, tests) install() is a no-op.
+"""
+import contextvars
+import functools
+import inspect
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+_in_worker = contextvars.ContextVar('offload_in_worker', default=False)
+_state = {'pool': None, 'hub': None}
+
+
+def active():
+    return _state['pool'] is not None
+
+
+def in_worker():
+    return _in_worker.get()
+
+
+def native_thread_id():
+    """Id of the OS thread (not the greenlet) running the caller."""
+    if active():
+        from gevent import monkey
+        return monkey.get_original('threading', 'get_ident')()
+    import threading
+    return threading.get_ident()
+
+
+def _run_in_worker(func, args, kwargs):
+    _in_worker.set(True)
+    return func(*args, **kwargs)
+
+
+def run_blocking(func, *args, **kwargs):
+    """Run func in the thread pool (with the caller's context) and wait cooperatively."""
+    pool = _state['pool']
+    if pool is None or in_worker():
+        return func(*args, **kwargs)
+    ctx = contextvars.copy_context()
+    return pool.apply(ctx.run, (_run_in_worker, func, args, kwargs))
+
+
+def blocking(func):
+    """Decorator form of run_blocking()."""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Flask-SocketIO probes connect handlers with handler(auth) and falls
+        # back to handler() on TypeError; fail that probe here, on the hub.
+        signature.bind(*args, **kwargs)
+        return run_blocking(func, *args, **kwargs)
+    return wrapper
+
+
+def install(socketio, pool_size=16):
+    """Offload every handler registered afterwards on `socketio` (gevent mode only)."""
+    async_mode = getattr(socketio, 'async_mode', None) or socketio.server_options.get('async_mode')
+    if async_mode != 'gevent':
+        return False
+    from gevent import get_hub
+    hub = get_hub()
+    pool = hub.threadpool
+    pool.maxsize = pool_size
+    _state.update(pool=pool, hub=hub)
+
+    original_emit = socketio.emit
+
+    @functools.wraps(original_emit)
+    def emit(*args, **kwargs):
+        if in_worker():
+            hub.loop.run_callback_threadsafe(functools.partial(original_emit, *args, **kwargs))
+            return None
+        return original_emit(*args, **kwargs)
+
+    original_on = socketio.on
+
+    @functools.wraps(original_on)
+    def on(message, namespace=None):
+        register = original_on(message, namespace)
+
+        def decorator(handler):
+            register(blocking(handler))
+            return handler
+        return decorator
+
+    socketio.emit = emit
+    socketio.on = on
+    logger.info('Socket.IO handlers offloaded to a %s-thread pool', pool_size)
+    return True
+
+
+class OffloadMiddleware:
+    """WSGI middleware running plain HTTP requests in the thread pool.
+
+    Engine.IO traffic (/socket.io) must stay on the hub and is passed through.
+    The request body is read on the hub first: wsgi.input is a gevent socket
+    and cannot be read from another thread.
+    """
+
+    def __init__(self, wsgi_app, socketio_path='/socket.io'):
+        self.wsgi_app = wsgi_app
+        self.socketio_path = socketio_path
+
+    def __call__(self, environ, start_response):
+        if not active() or environ.get('PATH_INFO', '').startswith(self.socketio_path):
+            return self.wsgi_app(environ, start_response)
+        body = environ['wsgi.input'].read()
+        environ['wsgi.input'] = io.BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        return run_blocking(self.wsgi_app, environ, start_response)
@@ -2,6 +2,8 @@ import random
 import logging
 from models.user_model import User
 from config.database import db
+from services import redis_client
+from utils.ttl_cache import TTLCache
 from werkzeug.security import generate_password_hash
 
 # Module logger
@@ -15,8 +17,38 @@ try:
 except Exception:  # pragma: no cover - best-effort import for editor/LS
     requests = None
 
-# In-memory OTP storage fallback (when Redis is not available)
-otp_storage = {}
+# In-memory OTP storage fallback (when Redis is not available). Entries expire
+# after OTP_EXPIRE_SECONDS like the Redis keys do.
+otp_storage = TTLCache(maxsize=10000, ttl=300)
+
+
+def _otp_key(contact):
+    return f'otp:{contact}'
+
+
+def _store_otp(contact, otp, ttl):
+    def to_redis(r):
+        r.setex(_otp_key(contact), ttl, otp)
+        return 'redis'
+
+    def to_memory():
+        otp_storage.set(contact, otp, ttl=ttl)
+        return 'memory'
+    return redis_client.call(to_redis, to_memory)
+
+
+def _load_otp(contact):
+    """Stored OTP for contact; the memory fallback is checked too, since the OTP
+    may have been stored there while Redis was unreachable."""
+    def from_redis(r):
+        value = r.get(_otp_key(contact))
+        return value.decode() if value else None
+    return redis_client.call(from_redis, lambda: None) or otp_storage.get(contact)
+
+
+def _delete_otp(contact):
+    otp_storage.pop(contact)
+    redis_client.call(lambda r: r.delete(_otp_key(contact)), lambda: None)
 
 def send_otp(contact, method=None):
     """
@@ -29,7 +61,6 @@ def send_otp(contact, method=None):
     and print the OTP to server logs. If SMTP or Zalo integration is configured
     it can be wired here; currently we just log the delivery method.
     """
-    import redis
     from flask import current_app
     # Determine delivery method
     is_email = False
@@ -54,18 +85,10 @@ def send_otp(contact, method=None):
 
     otp = str(random.randint(100000, 999999))
 
-    # Try to use Redis, fallback to in-memory storage
-    try:
-        r = redis.Redis.from_url(current_app.config['REDIS_URL'])
-        r.setex(f'otp:{contact}', current_app.config.get('OTP_EXPIRE_SECONDS', 300), otp)
-        # store full OTP at debug level only
-        logger.debug("OTP stored in Redis for contact=%s otp=%s", contact, otp)
-    except Exception as e:
-        otp_storage[contact] = otp
-        logger.info("Redis unavailable, using in-memory storage for contact=%s", contact)
-        # log the OTP at debug level (so production doesn't leak OTP to info logs)
-        logger.debug("OTP for %s: %s", contact, otp)
-        logger.exception("Redis connection failed for contact=%s", contact)
+    # Redis when reachable, otherwise the in-memory TTL store
+    where = _store_otp(contact, otp, current_app.config.get('OTP_EXPIRE_SECONDS', 300))
+    # log the OTP at debug level (so production doesn't leak OTP to info logs)
+    logger.debug("OTP stored in %s for contact=%s otp=%s", where, contact, otp)
 
     # Delivery: in dev we just print. Hook email/SMS/Zalo here.
     # Attempt real delivery if configuration present
@@ -116,17 +139,7 @@ def send_otp(contact, method=None):
 
 def _verify_otp(contact, otp):
     """Internal helper to verify an OTP. Returns True if valid."""
-    import redis
-    from flask import current_app
-    real_otp = None
-    try:
-        r = redis.Redis.from_url(current_app.config['REDIS_URL'])
-        real_otp = r.get(f'otp:{contact}')
-        if real_otp:
-            real_otp = real_otp.decode()
-    except Exception:
-        real_otp = otp_storage.get(contact)
-
+    real_otp = _load_otp(contact)
     return bool(real_otp and otp == real_otp)
 
 
@@ -196,19 +209,8 @@ def send_via_zalo(cfg, phone, otp):
         raise RuntimeError(f'Zalo send failed: {r.status_code} {r.text}')
 
 def reset_password(contact, otp, new_password):
-    import redis
-    from flask import current_app
-
     # Try to get OTP from Redis first, then fallback to in-memory storage
-    real_otp = None
-    try:
-        r = redis.Redis.from_url(current_app.config['REDIS_URL'])
-        real_otp = r.get(f'otp:{contact}')
-        if real_otp:
-            real_otp = real_otp.decode()
-    except Exception:
-        real_otp = otp_storage.get(contact)
-
+    real_otp = _load_otp(contact)
     if not real_otp or otp != real_otp:
         return {'success': False, 'error': 'Invalid OTP'}
 
@@ -221,11 +223,6 @@ def reset_password(contact, otp, new_password):
     db.session.commit()
 
     # Clean up OTP
-    try:
-        r = redis.Redis.from_url(current_app.config['REDIS_URL'])
-        r.delete(f'otp:{contact}')
-    except Exception:
-        if contact in otp_storage:
-            del otp_storage[contact]
+    _delete_otp(contact)
 
     return {'success': True, 'message': 'Password reset'}
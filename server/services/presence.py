@@ -0,0 +1,345 @@
+"""Presence registry for Socket.IO connections.
+
+Tracks user -> set(sid) (one entry per open tab/device) together with the
+reverse sid -> user index, so a disconnect is a dict lookup instead of a scan
+over every connected user and a second tab no longer overwrites the first.
+
+While a user is online their accepted-friend ids are cached here so join,
+disconnect, contact lists and profile fan-out do not re-query Friend in both
+directions on every event. Call invalidate_friends() whenever a friendship
+is created or removed.
+
+The stores also keep a per-group online-member counter, moved by +1/-1 on
+presence transitions (see services/group_presence.py).
+
+By default state lives in process memory. In multi-node mode (MULTI_NODE=true)
+the registry is switched to RedisPresenceStore so every worker sees the same
+connections; see use_redis().
+"""
+import json
+import threading
+
+from sqlalchemy import or_
+
+from config.database import db
+from models.friend_model import Friend
+
+
+def _uid(user_id):
+    """Normalize user ids coming from socket payloads ('5' and 5 are the same user)."""
+    return int(user_id)
+
+
+def load_friend_ids(user_id):
+    """Accepted friend ids of user_id in both directions, in a single query."""
+    user_id = _uid(user_id)
+    rows = db.session.query(Friend.user_id, Friend.friend_id).filter(
+        or_(Friend.user_id == user_id, Friend.friend_id == user_id),
+        Friend.status == 'accepted',
+    ).all()
+    return frozenset(b if a == user_id else a for a, b in rows)
+
+
+class MemoryPresenceStore:
+    """Single-process store: plain dicts guarded by a lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sids = {}      # user_id -> set(sid)
+        self._users = {}     # sid -> user_id
+        self._friends = {}   # user_id -> frozenset(friend ids), only while online
+        self._groups = {}    # group_id -> number of online members
+
+    def add(self, user_id, sid):
+        with self._lock:
+            previous = self._users.get(sid)
+            if previous is not None and previous != user_id:
+                self._discard(sid)
+            sids = self._sids.setdefault(user_id, set())
+            came_online = not sids
+            sids.add(sid)
+            self._users[sid] = user_id
+            return came_online
+
+    def remove(self, sid):
+        with self._lock:
+            user_id = self._users.get(sid)
+            if user_id is None:
+                return None, False
+            return user_id, self._discard(sid)
+
+    def _discard(self, sid):
+        user_id = self._users.pop(sid)
+        sids = self._sids.get(user_id)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._sids[user_id]
+                self._friends.pop(user_id, None)
+                return True
+        return False
+
+    def is_online(self, user_id):
+        return user_id in self._sids
+
+    def user_for(self, sid):
+        return self._users.get(sid)
+
+    def sids_for(self, user_id):
+        with self._lock:
+            return set(self._sids.get(user_id, ()))
+
+    def online_user_ids(self):
+        with self._lock:
+            return set(self._sids)
+
+    def get_friends(self, user_id):
+        return self._friends.get(user_id)
+
+    def set_friends(self, user_id, friends):
+        with self._lock:
+            if user_id in self._sids:
+                self._friends[user_id] = friends
+
+    def drop_friends(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._friends.pop(user_id, None)
+
+    def incr_groups(self, group_ids, delta):
+        counts = {}
+        with self._lock:
+            for gid in group_ids:
+                count = max(0, self._groups.get(gid, 0) + delta)
+                if count:
+                    self._groups[gid] = count
+                else:
+                    self._groups.pop(gid, None)
+                counts[gid] = count
+        return counts
+
+    def group_count(self, group_id):
+        return self._groups.get(group_id, 0)
+
+    def group_counts(self):
+        with self._lock:
+            return dict(self._groups)
+
+    def clear(self):
+        with self._lock:
+            self._sids.clear()
+            self._users.clear()
+            self._friends.clear()
+            self._groups.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'online_users': len(self._sids),
+                'connections': len(self._users),
+                'cached_friend_sets': len(self._friends),
+            }
+
+
+class RedisPresenceStore:
+    """Store shared by every worker through Redis.
+
+    Keys (prefix defaults to 'presence'):
+      <prefix>:user:<uid>     SET of sids of that user, across all nodes
+      <prefix>:sid:<sid>      user id owning the sid
+      <prefix>:node:<node>    SET of sids opened on one node, used to purge
+                              connections a crashed/restarted node left behind
+      <prefix>:friends:<uid>  JSON list of friend ids, cached while online
+      <prefix>:groups         HASH group id -> number of online members
+    """
+
+    def __init__(self, client, node_id, prefix='presence'):
+        # client may be a redis.Redis or a zero-argument factory returning one
+        # (the factory is used by the gevent worker to get a per-thread client)
+        self._client = client
+        self.node_id = node_id
+        self.prefix = prefix
+
+    @property
+    def r(self):
+        return self._client() if callable(self._client) else self._client
+
+    def _k(self, kind, ident):
+        return f'{self.prefix}:{kind}:{ident}'
+
+    def add(self, user_id, sid):
+        previous = self.user_for(sid)
+        if previous is not None and previous != user_id:
+            self.remove(sid)
+        pipe = self.r.pipeline(transaction=True)
+        pipe.sadd(self._k('user', user_id), sid)
+        pipe.scard(self._k('user', user_id))
+        pipe.set(self._k('sid', sid), user_id)
+        pipe.sadd(self._k('node', self.node_id), sid)
+        added, count, _, _ = pipe.execute()
+        return bool(added) and count == 1
+
+    def remove(self, sid):
+        user_id = self.user_for(sid)
+        if user_id is None:
+            return None, False
+        pipe = self.r.pipeline(transaction=True)
+        pipe.srem(self._k('user', user_id), sid)
+        pipe.scard(self._k('user', user_id))
+        pipe.delete(self._k('sid', sid))
+        pipe.srem(self._k('node', self.node_id), sid)
+        removed, count, _, _ = pipe.execute()
+        went_offline = bool(removed) and count == 0
+        if went_offline:
+            self.r.delete(self._k('friends', user_id))
+        return user_id, went_offline
+
+    def purge_node(self, node_id=None):
+        """Drop every sid registered by node_id (default: this node). Returns users that went offline."""
+        node_key = self._k('node', node_id or self.node_id)
+        offline = []
+        for raw in self.r.smembers(node_key):
+            sid = raw.decode() if isinstance(raw, bytes) else raw
+            user_id, went_offline = self.remove(sid)
+            if went_offline:
+                offline.append(user_id)
+        self.r.delete(node_key)
+        return offline
+
+    def is_online(self, user_id):
+        return bool(self.r.exists(self._k('user', user_id)))
+
+    def user_for(self, sid):
+        raw = self.r.get(self._k('sid', sid))
+        return int(raw) if raw is not None else None
+
+    def sids_for(self, user_id):
+        return {s.decode() if isinstance(s, bytes) else s for s in self.r.smembers(self._k('user', user_id))}
+
+    def online_user_ids(self):
+        prefix = self._k('user', '')
+        return {int((k.decode() if isinstance(k, bytes) else k)[len(prefix):])
+                for k in self.r.scan_iter(match=prefix + '*')}
+
+    def get_friends(self, user_id):
+        raw = self.r.get(self._k('friends', user_id))
+        return frozenset(json.loads(raw)) if raw is not None else None
+
+    def set_friends(self, user_id, friends):
+        if self.is_online(user_id):
+            self.r.set(self._k('friends', user_id), json.dumps(sorted(friends)))
+
+    def drop_friends(self, user_ids):
+        if user_ids:
+            self.r.delete(*[self._k('friends', u) for u in user_ids])
+
+    def incr_groups(self, group_ids, delta):
+        group_ids = list(group_ids)
+        if not group_ids:
+            return {}
+        key = f'{self.prefix}:groups'
+        pipe = self.r.pipeline(transaction=True)
+        for gid in group_ids:
+            pipe.hincrby(key, gid, delta)
+        counts = dict(zip(group_ids, pipe.execute()))
+        empty = [gid for gid, c in counts.items() if c <= 0]
+        if empty:
+            self.r.hdel(key, *empty)
+        return {gid: max(0, c) for gid, c in counts.items()}
+
+    def group_count(self, group_id):
+        return int(self.r.hget(f'{self.prefix}:groups', group_id) or 0)
+
+    def group_counts(self):
+        return {int(gid): int(c) for gid, c in self.r.hgetall(f'{self.prefix}:groups').items()}
+
+    def clear(self):
+        keys = list(self.r.scan_iter(match=f'{self.prefix}:*'))
+        if keys:
+            self.r.delete(*keys)
+
+    def stats(self):
+        return {
+            'backend': 'redis',
+            'node_id': self.node_id,
+            'online_users': len(self.online_user_ids()),
+            'node_connections': self.r.scard(self._k('node', self.node_id)),
+        }
+
+
+class PresenceRegistry:
+    def __init__(self, store=None, friend_loader=load_friend_ids):
+        self.store = store or MemoryPresenceStore()
+        self._friend_loader = friend_loader
+
+    def use_store(self, store):
+        self.store = store
+
+    def use_redis(self, client, node_id, prefix='presence'):
+        """Switch to the shared Redis store and purge sids this node left behind.
+
+        Returns the ids of users that went offline because of the purge so the
+        caller can move their group counters down.
+        """
+        store = RedisPresenceStore(client, node_id, prefix=prefix)
+        offline = store.purge_node()
+        self.store = store
+        return offline
+
+    def add(self, user_id, sid):
+        """Register sid for user_id. Returns True if the user just came online."""
+        return self.store.add(_uid(user_id), sid)
+
+    def remove(self, sid):
+        """Forget sid. Returns (user_id, went_offline); user_id is None for unknown sids."""
+        return self.store.remove(sid)
+
+    def is_online(self, user_id):
+        try:
+            return self.store.is_online(_uid(user_id))
+        except (TypeError, ValueError):
+            return False
+
+    def user_for(self, sid):
+        return self.store.user_for(sid)
+
+    def sids_for(self, user_id):
+        return self.store.sids_for(_uid(user_id))
+
+    def online_user_ids(self):
+        return self.store.online_user_ids()
+
+    def friend_ids(self, user_id):
+        """Cached friend ids for online users; offline users are loaded but not cached."""
+        user_id = _uid(user_id)
+        cached = self.store.get_friends(user_id)
+        if cached is not None:
+            return cached
+        friends = self._friend_loader(user_id)
+        self.store.set_friends(user_id, friends)
+        return friends
+
+    def invalidate_friends(self, *user_ids):
+        """Drop cached friend sets after a friendship change."""
+        self.store.drop_friends([_uid(u) for u in user_ids if u is not None])
+
+    def incr_groups(self, group_ids, delta):
+        """Move the online counter of each group by delta. Returns {group_id: new count}."""
+        return self.store.incr_groups(group_ids, delta)
+
+    def group_online_count(self, group_id):
+        return self.store.group_count(int(group_id))
+
+    def group_online_counts(self):
+        """{group_id: online members} for every group with someone online."""
+        return self.store.group_counts()
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self):
+        return self.store.stats()
+
+
+registry = PresenceRegistry()
@@ -0,0 +1,139 @@
+"""Targeted `contact_updated` fan-out for profile changes.
+
+A profile change (PATCH /users/me, avatar upload) used to be emitted to the
+user's room, to every friend's room, and then broadcast to every connected
+socket "as a fallback". It now goes only to the rooms that render the profile:
+
+  - `user-<id>` of the user (other tabs) and of each friend (an empty room
+    costs nothing, so online status is not looked up per friend);
+  - `group-<id>` of each group the user belongs to (member lists and message
+    bubbles show the avatar), so group members are reached with one emit per
+    group instead of one per member.
+
+All rooms go out in a single emit; Socket.IO delivers once per socket even
+when a socket sits in several of them.
+
+Rapid successive edits (e.g. name + avatar saved back to back) are coalesced:
+publish() keeps only the latest payload per user and the sweeper emits it
+PROFILE_FANOUT_DELAY_MS after the first edit. With a delay of 0 (tests) it is
+emitted immediately.
+
+rebroadcast_all() is the admin "resend everything" path: profiles go out as
+PROFILES_UPDATED batches of REBROADCAST_BATCH profiles, one broadcast each,
+instead of one broadcast per user.
+"""
+import logging
+import threading
+import time
+
+from config.database import db
+from models.user_model import User
+from services import group_presence
+from services import group_rooms
+from services.presence import registry as presence
+
+logger = logging.getLogger(__name__)
+
+REBROADCAST_BATCH = 500
+
+
+def profile_data(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'display_name': user.display_name if getattr(user, 'display_name', None) else user.username,
+        'avatar_url': user.avatar_url,
+        'status': user.status,
+    }
+
+
+def interested_rooms(user_id):
+    """Rooms whose sockets display user_id's profile."""
+    rooms = [f'user-{user_id}']
+    rooms += [f'user-{fid}' for fid in sorted(presence.friend_ids(user_id))]
+    rooms += [group_rooms.room_name(gid) for gid in group_presence.member_group_ids(user_id)]
+    return rooms
+
+
+class ProfileFanout:
+    def __init__(self, delay=0.0, clock=time.monotonic):
+        self.delay = delay
+        self._clock = clock
+        self._pending = {}  # user_id -> (due, payload, rooms)
+        self._lock = threading.Lock()
+        self.published = 0
+        self.emitted = 0
+
+    def publish(self, user, socketio=None):
+        """Queue a PROFILE_UPDATED for user (a User row, already committed)."""
+        socketio = socketio or group_rooms.current_socketio()
+        if socketio is None:
+            return
+        payload = {'event': 'PROFILE_UPDATED', 'data': profile_data(user)}
+        rooms = interested_rooms(user.id)
+        with self._lock:
+            self.published += 1
+            previous = self._pending.get(user.id)
+            due = previous[0] if previous else self._clock() + self.delay
+            self._pending[user.id] = (due, payload, rooms)
+        if self.delay <= 0:
+            self.flush(socketio)
+
+    def flush(self, socketio, force=False):
+        """Emit the pending updates that are due (all of them with force=True)."""
+        now = self._clock()
+        with self._lock:
+            due = [uid for uid, (at, _, _) in self._pending.items() if force or at <= now]
+            batch = [self._pending.pop(uid) for uid in due]
+            self.emitted += len(batch)
+        for _, payload, rooms in batch:
+            socketio.emit('contact_updated', payload, to=rooms)
+        return len(batch)
+
+    def pending(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {'published': self.published, 'emitted': self.emitted, 'pending': len(self._pending)}
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self.published = self.emitted = 0
+
+
+fanout = ProfileFanout()
+
+
+def rebroadcast_all(socketio, batch_size=None):
+    """Broadcast every profile as PROFILES_UPDATED batches. Returns (profiles, emits)."""
+    batch_size = batch_size or REBROADCAST_BATCH
+    columns = (User.id, User.username, User.display_name, User.avatar_url, User.status)
+    rows = db.session.query(*columns).order_by(User.id).all()
+    emits = 0
+    for start in range(0, len(rows), batch_size):
+        data = [profile_data(row) for row in rows[start:start + batch_size]]
+        socketio.emit('contact_updated', {'event': 'PROFILES_UPDATED', 'data': data})
+        emits += 1
+    return len(rows), emits
+
+
+def start(socketio, tick=0.05):
+    """Run the sweeper that emits coalesced updates as a Socket.IO background task."""
+    def loop():
+        while True:
+            socketio.sleep(tick)
+            if not fanout.pending():
+                continue
+            try:
+                fanout.flush(socketio)
+            except Exception:
+                logger.exception('Profile fan-out failed')
+
+    return socketio.start_background_task(loop)
+
+
+def init_app(app, socketio):
+    fanout.delay = app.config.get('PROFILE_FANOUT_DELAY_MS', 250) / 1000.0
+    if fanout.delay > 0:
+        return start(socketio)
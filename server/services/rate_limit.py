@@ -1,15 +1,207 @@
+"""Token-bucket rate limiting for HTTP routes and Socket.IO events.
+
+Every (policy name, caller) pair owns a bucket of `capacity` tokens that
+refills evenly over `period` seconds; each call takes one token and is
+rejected once the bucket is empty. Policies live in RATE_LIMIT_POLICIES
+(name -> (capacity, period)); RATE_LIMIT_USER_POLICIES can give single users
+their own budget ({user_id: {name: (capacity, period)}}).
+
+The caller is the authenticated user (socket: presence registry, HTTP:
+bearer token), else the socket sid or the client IP. Behind a reverse proxy
+or the ngrok tunnel request.remote_addr is the proxy itself, so every
+anonymous caller would share one bucket: TRUSTED_PROXY_HOPS makes create_app
+take the client address from X-Forwarded-For (werkzeug ProxyFix).
+
+With RATE_LIMIT_STORE=redis (the 'auto' default in multi-node mode) buckets
+live in Redis, one hash per bucket updated atomically by a Lua script using
+the server clock and expiring once full again, so every node shares them.
+Otherwise, and while Redis is unreachable (see redis_client.call),
+LocalBuckets keeps them in process memory.
+
+Use the rate_limited() decorator on a view or below @socketio.on(...): the
+check runs before the handler body, so rejected calls never reach the DB.
+"""
+import functools
+import hashlib
+import threading
 import time
-from flask import request
+from collections import Counter, namedtuple
+
+from flask import current_app, has_request_context, jsonify, request
+
+from services import redis_client
+from utils.ttl_cache import TTLCache
+
+KEY_PREFIX = 'rate:'
+
+
+class Policy(namedtuple('Policy', 'capacity period')):
+    @property
+    def rate(self):
+        """Tokens added per second."""
+        return self.capacity / self.period
+
+
+_TAKE_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_ms = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  retry_ms = math.ceil((cost - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return retry_ms
+"""
+_TAKE_SHA = hashlib.sha1(_TAKE_LUA.encode('utf-8')).hexdigest()
+
+
+def _redis_take(r, key, policy, cost):
+    """Seconds to wait before retrying, 0 if the token was taken."""
+    from redis.exceptions import NoScriptError
+    args = (policy.capacity, policy.rate, cost)
+    try:
+        retry_ms = r.evalsha(_TAKE_SHA, 1, key, *args)
+    except NoScriptError:
+        retry_ms = r.eval(_TAKE_LUA, 1, key, *args)
+    return int(retry_ms) / 1000.0
+
+
+class LocalBuckets:
+    """In-process buckets: key -> (tokens, last refill), dropped once full again."""
+
+    def __init__(self, maxsize=100000, clock=time.monotonic):
+        self._clock = clock
+        self._buckets = TTLCache(maxsize=maxsize, ttl=60, clock=clock)
+        self._lock = threading.Lock()
+
+    def take(self, key, policy, cost=1):
+        now = self._clock()
+        with self._lock:
+            tokens, ts = self._buckets.get(key) or (policy.capacity, now)
+            tokens = min(policy.capacity, tokens + max(0.0, now - ts) * policy.rate)
+            retry_after = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / policy.rate
+            self._buckets.set(key, (tokens, now), ttl=(policy.capacity - tokens) / policy.rate + 1)
+        return retry_after
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class RateLimiter:
+    def __init__(self):
+        self.local = LocalBuckets()
+        self.rejected = Counter()  # policy name -> rejected calls
+
+    def policy_for(self, name, user_id=None):
+        config = current_app.config
+        if user_id is not None:
+            own = (config.get('RATE_LIMIT_USER_POLICIES') or {}).get(user_id) or {}
+            if name in own:
+                return Policy(*own[name])
+        policies = config.get('RATE_LIMIT_POLICIES') or {}
+        spec = policies.get(name) or policies.get('default')
+        return Policy(*spec) if spec else None
+
+    def hit(self, name, caller, user_id=None, cost=1):
+        """Take `cost` tokens from caller's bucket; returns 0 or seconds until allowed."""
+        if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+            return 0.0
+        policy = self.policy_for(name, user_id)
+        if policy is None:
+            return 0.0
+        retry_after = self.take(f'{KEY_PREFIX}{name}:{caller}', policy, cost)
+        if retry_after:
+            self.rejected[name] += 1
+        return retry_after
+
+    def take(self, key, policy, cost=1):
+        config = current_app.config
+        store = (config.get('RATE_LIMIT_STORE') or 'auto').lower()
+        if store == 'redis' or (store == 'auto' and config.get('MULTI_NODE')):
+            return redis_client.call(lambda r: _redis_take(r, key, policy, cost),
+                                     lambda: self.local.take(key, policy, cost))
+        return self.local.take(key, policy, cost)
+
+    def stats(self):
+        return dict(self.rejected)
+
+    def clear(self):
+        self.local.clear()
+        self.rejected.clear()
+
+
+limiter = RateLimiter()
+
+
+def current_caller():
+    """(bucket id, user id or None) for the request or socket event being handled."""
+    sid = getattr(request, 'sid', None)
+    if sid is not None:
+        from services.presence import registry as presence
+        user_id = presence.user_for(sid)
+        return (f'user:{user_id}', user_id) if user_id is not None else (f'sid:{sid}', None)
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        from services.auth_service import decode_token
+        payload = decode_token(auth.split(' ', 1)[1])
+        if payload and payload.get('user_id') is not None:
+            return f"user:{payload['user_id']}", payload['user_id']
+    return f'ip:{request.remote_addr}', None
+
+
+def notify_rate_limited(name, retry_after):
+    """Tell the socket that sent the current event it was rejected."""
+    from flask_socketio import emit
+    emit('rate_limited', {'event': name, 'retry_after': round(retry_after, 3)}, to=request.sid)
+
+
+def rate_limited(name, cost=1, key=None, on_reject=None):
+    """Apply policy `name` to a Flask view or a Socket.IO handler.
+
+    key() may return the bucket id to use instead of the caller (e.g. the
+    username + client IP on /login, where callers are anonymous). A rejected HTTP call
+    gets 429 with Retry-After; a rejected socket event gets a 'rate_limited'
+    event. on_reject(retry_after, *args, **kwargs) replaces that default reply.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not has_request_context():
+                return func(*args, **kwargs)
+            caller, user_id = current_caller()
+            custom = key() if key is not None else None
+            if custom:
+                caller = f'key:{custom}'
+            retry_after = limiter.hit(name, caller, user_id, cost)
+            if not retry_after:
+                return func(*args, **kwargs)
+            if on_reject is not None:
+                return on_reject(retry_after, *args, **kwargs)
+            if getattr(request, 'sid', None) is not None:
+                return notify_rate_limited(name, retry_after)
+            response = jsonify({'error': 'Too many requests', 'retry_after': round(retry_after, 3)})
+            response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+            return response, 429
+        return wrapper
+    return decorator
+
 
 def is_rate_limited(key):
-    import redis
-    from flask import current_app
-    r = redis.Redis.from_url(current_app.config['REDIS_URL'])
-    window = current_app.config['RATE_LIMIT_WINDOW']
-    limit = current_app.config['RATE_LIMIT']
-    now = int(time.time())
-    window_key = f"rate:{key}:{now // window}"
-    count = r.incr(window_key)
-    if count == 1:
-        r.expire(window_key, window)
-    return count > limit
+    """Legacy helper: RATE_LIMIT calls per RATE_LIMIT_WINDOW seconds for `key`."""
+    config = current_app.config
+    policy = Policy(config['RATE_LIMIT'], config['RATE_LIMIT_WINDOW'])
+    return limiter.take(f'{KEY_PREFIX}legacy:{key}', policy) > 0
@@ -0,0 +1,113 @@
+"""Message reactions and the message_reaction_count aggregate.
+
+add() / remove() change one (message, user, emoji) row and move the matching
+counter by +1 / -1. Both are single statements guarded by the unique index
+(INSERT ... ON CONFLICT DO NOTHING, DELETE), so a double click or two nodes
+racing cannot create duplicates or skew the count. Like
+services.conversation_summary, nothing here commits; the caller commits the
+reaction and the counter together.
+
+Events carry only the change (see delta_payload), never the full
+{emoji: [user_ids]} map.
+"""
+from collections import defaultdict
+
+from config.database import db
+from models.message_reaction_model import MessageReaction, MessageReactionCount
+
+
+def _insert(model):
+    """Dialect insert() with on_conflict_* support (SQLite and PostgreSQL)."""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def _bump(message_id, emoji, delta):
+    """Move the (message, emoji) counter by delta; returns the new count."""
+    stmt = _insert(MessageReactionCount).values(message_id=message_id, reaction_type=emoji, count=delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['message_id', 'reaction_type'],
+        set_={'count': MessageReactionCount.count + delta},
+    )
+    db.session.execute(stmt)
+    count = db.session.query(MessageReactionCount.count).filter_by(
+        message_id=message_id, reaction_type=emoji).scalar() or 0
+    if count <= 0:
+        MessageReactionCount.query.filter_by(message_id=message_id, reaction_type=emoji) \
+            .delete(synchronize_session=False)
+        count = 0
+    return count
+
+
+def add(message_id, user_id, emoji):
+    """Record user's emoji on message. Returns the new count, or None if it was already there."""
+    stmt = _insert(MessageReaction).values(message_id=message_id, user_id=user_id, reaction_type=emoji)
+    stmt = stmt.on_conflict_do_nothing(index_elements=['message_id', 'user_id', 'reaction_type'])
+    if db.session.execute(stmt).rowcount != 1:
+        return None
+    return _bump(message_id, emoji, +1)
+
+
+def remove(message_id, user_id, emoji):
+    """Drop user's emoji from message. Returns the new count, or None if it was not there."""
+    deleted = MessageReaction.query.filter_by(
+        message_id=message_id, user_id=user_id, reaction_type=emoji).delete(synchronize_session=False)
+    if not deleted:
+        return None
+    return _bump(message_id, emoji, -1)
+
+
+def counts_for(message_ids):
+    """{message_id: {emoji: count}} for the given messages, one indexed query."""
+    result = defaultdict(dict)
+    if not message_ids:
+        return result
+    rows = db.session.query(MessageReactionCount.message_id, MessageReactionCount.reaction_type,
+                            MessageReactionCount.count) \
+        .filter(MessageReactionCount.message_id.in_(list(message_ids))).all()
+    for message_id, emoji, count in rows:
+        result[message_id][emoji] = count
+    return result
+
+
+def mine_for(message_ids, user_id):
+    """{message_id: [emoji, ...]} that user_id reacted with, one query on the unique index."""
+    result = defaultdict(list)
+    if not message_ids or user_id is None:
+        return result
+    rows = db.session.query(MessageReaction.message_id, MessageReaction.reaction_type) \
+        .filter(MessageReaction.message_id.in_(list(message_ids)), MessageReaction.user_id == user_id) \
+        .order_by(MessageReaction.message_id, MessageReaction.id).all()
+    for message_id, emoji in rows:
+        result[message_id].append(emoji)
+    return result
+
+
+def forget_message(message_id):
+    """Delete the reactions and counters of a message that is being deleted."""
+    MessageReaction.query.filter_by(message_id=message_id).delete(synchronize_session=False)
+    MessageReactionCount.query.filter_by(message_id=message_id).delete(synchronize_session=False)
+
+
+def forget_user(user_id):
+    """Take a user's reactions out of the counters (before the user row is deleted)."""
+    rows = db.session.query(MessageReaction.message_id, MessageReaction.reaction_type) \
+        .filter_by(user_id=user_id).all()
+    for message_id, emoji in rows:
+        _bump(message_id, emoji, -1)
+    MessageReaction.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+
+def delta_payload(message_id, user_id, emoji, delta, count):
+    return {
+        'message_id': message_id,
+        'user_id': user_id,
+        'emoji': emoji,
+        # the web client reads `reaction`
+        'reaction': emoji,
+        'delta': delta,
+        'count': count,
+    }
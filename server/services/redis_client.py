@@ -0,0 +1,159 @@
+"""Shared Redis client for services that need cross-process state.
+
+One client (and therefore one connection pool) per URL is created lazily and
+reused. Under the gevent production worker each native thread of the offload
+pool gets its own client, since gevent sockets cannot be shared across
+threads. Tests can inject a fakeredis instance with set_client().
+
+Services with a local fallback (rate limiting, OTP storage) go through
+call(): a per-URL circuit breaker stops sending commands after
+REDIS_FAILURE_THRESHOLD consecutive failures, answers from the fallback for
+REDIS_RETRY_SECONDS, then lets a single PING through to decide whether Redis
+is back. A Redis outage therefore costs one short timeout per retry period
+instead of one per call.
+"""
+import logging
+import os
+import threading
+import time
+
+from services import offload
+
+logger = logging.getLogger(__name__)
+
+SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', '0.5'))
+HEALTH_CHECK_INTERVAL = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', '30'))
+FAILURE_THRESHOLD = int(os.environ.get('REDIS_FAILURE_THRESHOLD', '3'))
+RETRY_SECONDS = float(os.environ.get('REDIS_RETRY_SECONDS', '10'))
+
+_clients = {}
+_breakers = {}
+_lock = threading.Lock()
+
+
+def _default_url():
+    from flask import current_app
+    return current_app.config['REDIS_URL']
+
+
+def get_client(url=None):
+    """Return the shared redis.Redis for url (defaults to app config REDIS_URL)."""
+    if url is None:
+        url = _default_url()
+    key = (url, offload.native_thread_id()) if offload.active() else url
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    import redis
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = redis.Redis.from_url(
+                url,
+                socket_connect_timeout=SOCKET_TIMEOUT,
+                socket_timeout=SOCKET_TIMEOUT,
+                health_check_interval=HEALTH_CHECK_INTERVAL,
+            )
+            _clients[key] = client
+    return client
+
+
+def set_client(client, url=None):
+    """Install a client for url (used by tests and by app setup)."""
+    if url is None:
+        url = _default_url()
+    with _lock:
+        _clients[url] = client
+        _breakers.pop(url, None)
+
+
+class CircuitBreaker:
+    """closed -> (N consecutive failures) -> open -> (retry_after elapsed) -> one probe."""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, retry_after=RETRY_SECONDS, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.retry_after = retry_after
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if self._clock() - self.opened_at >= self.retry_after else 'open'
+
+    def allow(self, probe):
+        """True if a call may go to Redis. When a retry is due, probe() decides."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._probing or self._clock() - self.opened_at < self.retry_after:
+                return False
+            self._probing = True
+        try:
+            probe()
+        except Exception:
+            with self._lock:
+                self._probing = False
+                self.opened_at = self._clock()
+            return False
+        self.record_success()
+        return True
+
+    def record_success(self):
+        if not self.failures and self.opened_at is None:
+            return
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info('Redis reachable again, circuit closed')
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self, exc=None):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is None and self.failures >= self.failure_threshold:
+                self.opened_at = self._clock()
+                logger.warning('Redis unavailable (%s), using local fallback for %ss', exc, self.retry_after)
+
+
+def breaker(url=None):
+    if url is None:
+        url = _default_url()
+    b = _breakers.get(url)
+    if b is None:
+        with _lock:
+            b = _breakers.setdefault(url, CircuitBreaker())
+    return b
+
+
+def call(operation, fallback, url=None):
+    """operation(client) through the circuit breaker; fallback() when Redis is unusable."""
+    if url is None:
+        url = _default_url()
+    b = breaker(url)
+    try:
+        client = get_client(url)
+    except Exception as exc:  # redis package missing or malformed URL
+        b.record_failure(exc)
+        return fallback()
+    if not b.allow(client.ping):
+        return fallback()
+    from redis.exceptions import RedisError
+    try:
+        result = operation(client)
+    except RedisError as exc:
+        b.record_failure(exc)
+        return fallback()
+    b.record_success()
+    return result
+
+
+def reset():
+    with _lock:
+        _clients.clear()
+        _breakers.clear()
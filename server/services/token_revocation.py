@@ -0,0 +1,79 @@
+"""Revoked-token stores, keyed by the token's `jti` claim.
+
+Logout records the token id until the token's own `exp`; after that the
+signature check rejects the token anyway, so the entry can go. Tokens issued
+before `jti` existed are keyed by the sha256 of the raw token instead.
+
+MemoryRevocationStore keeps {jti: exp} in process memory and drops expired
+entries as it goes (the old module-level set grew forever). RedisRevocationStore
+writes one key per token expiring at `exp`, so revocations survive a restart
+and are seen by every node.
+"""
+import heapq
+import threading
+import time
+
+KEY_PREFIX = 'blacklist:'
+
+
+class MemoryRevocationStore:
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._expiry = {}  # jti -> exp (epoch seconds)
+        self._heap = []    # (exp, jti), oldest first
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            exp, jti = heapq.heappop(heap)
+            if self._expiry.get(jti) == exp:
+                del self._expiry[jti]
+
+    def revoke(self, jti, exp):
+        now = self._clock()
+        if exp <= now:
+            return
+        with self._lock:
+            self._purge(now)
+            self._expiry[jti] = exp
+            heapq.heappush(self._heap, (exp, jti))
+
+    def is_revoked(self, jti):
+        with self._lock:
+            exp = self._expiry.get(jti)
+            if exp is None:
+                return False
+            if exp <= self._clock():
+                self._purge(self._clock())
+                return False
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._expiry.clear()
+            self._heap.clear()
+
+    def __len__(self):
+        return len(self._expiry)
+
+
+class RedisRevocationStore:
+    """Takes a redis client, or a zero-argument callable returning one."""
+
+    def __init__(self, client, prefix=KEY_PREFIX, clock=time.time):
+        self._client = client
+        self.prefix = prefix
+        self._clock = clock
+
+    @property
+    def r(self):
+        return self._client() if callable(self._client) else self._client
+
+    def revoke(self, jti, exp):
+        ttl = int(exp - self._clock()) + 1
+        if ttl > 0:
+            self.r.set(self.prefix + jti, 1, ex=ttl)
+
+    def is_revoked(self, jti):
+        return bool(self.r.exists(self.prefix + jti))
@@ -0,0 +1,108 @@
+"""Server-side coalescing of typing indicators.
+
+Clients may send `typing` on every keystroke. Only state changes are
+forwarded as `user_typing`:
+
+  - the first is_typing=true for a (sender, room) pair emits "started" and
+    arms a stop deadline TYPING_TIMEOUT seconds ahead;
+  - further is_typing=true events inside that window are dropped and only
+    push the deadline back;
+  - is_typing=false emits "stopped" once; a repeated stop is dropped;
+  - when the deadline passes without news (tab closed, connection lost) the
+    sweeper emits the "stopped" itself.
+
+Counters of emitted and dropped events per room are kept for the admin
+stats endpoint. State is per process, like the rate-limit fallback; a
+sender's typing events arrive over their own socket and so reach one node.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class TypingCoalescer:
+    def __init__(self, timeout=5.0, clock=time.monotonic):
+        self.timeout = timeout
+        self._clock = clock
+        self._deadlines = {}  # (str(sender_id), room) -> (time the stop is due, sender_id)
+        self._lock = threading.Lock()
+        self.emitted = Counter()  # room -> user_typing events sent
+        self.dropped = Counter()  # room -> typing events swallowed
+
+    def update(self, sender_id, room, is_typing):
+        """Record a typing event; returns True/False to emit that state, None to drop it."""
+        key = (str(sender_id), room)
+        now = self._clock()
+        with self._lock:
+            active = key in self._deadlines
+            if is_typing:
+                self._deadlines[key] = (now + self.timeout, sender_id)
+                change = None if active else True
+            else:
+                change = False if self._deadlines.pop(key, None) is not None else None
+            if change is None:
+                self.dropped[room] += 1
+            else:
+                self.emitted[room] += 1
+        return change
+
+    def expire(self):
+        """Pop the (sender_id, room) pairs whose stop is due; each counts as one emit."""
+        now = self._clock()
+        with self._lock:
+            due = [key for key, (deadline, _) in self._deadlines.items() if deadline <= now]
+            expired = []
+            for key in due:
+                _, sender_id = self._deadlines.pop(key)
+                self.emitted[key[1]] += 1
+                expired.append((sender_id, key[1]))
+        return expired
+
+    def stats(self):
+        with self._lock:
+            return {
+                'typing_now': len(self._deadlines),
+                'emitted': sum(self.emitted.values()),
+                'dropped': sum(self.dropped.values()),
+                'rooms': {room: {'emitted': self.emitted[room], 'dropped': self.dropped[room]}
+                          for room in set(self.emitted) | set(self.dropped)},
+            }
+
+    def clear(self):
+        with self._lock:
+            self._deadlines.clear()
+            self.emitted.clear()
+            self.dropped.clear()
+
+
+coalescer = TypingCoalescer()
+
+
+def payload(sender_id, is_typing):
+    return {'sender_id': sender_id, 'is_typing': is_typing}
+
+
+def emit_expired(socketio):
+    for sender_id, room in coalescer.expire():
+        socketio.emit('user_typing', payload(sender_id, False), room=room)
+
+
+def start(socketio, tick=0.5):
+    """Run the sweeper that emits the expiring stops as a Socket.IO background task."""
+    def loop():
+        while True:
+            socketio.sleep(tick)
+            try:
+                emit_expired(socketio)
+            except Exception:
+                logger.exception('Typing sweeper failed')
+
+    return socketio.start_background_task(loop)
+
+
+def init_app(app, socketio):
+    coalescer.timeout = float(app.config.get('TYPING_TIMEOUT', 5))
+    return start(socketio)
@@ -0,0 +1,137 @@
+"""Accent-insensitive user search (GET /users/search).
+
+User rows carry search_username / search_name: the username and display
+name passed through utils.search_text.fold (lowercase, no diacritics), so
+"nguyen" finds "Nguyễn". They are filled by a before_insert/before_update
+hook on the model and indexed.
+
+A query is folded the same way and answered in up to four bounded steps:
+
+  1. prefix: one range scan per column (key <= column < key + U+10FFFF),
+     ordered by the index, so exact matches come first for free;
+  2. infix, only when the prefix scans found fewer than `limit` users and
+     the key has at least 3 characters: SQLite FTS5 trigram table
+     `user_search_fts` (external content over the two columns, synced by
+     triggers) or pg_trgm GIN indexes on PostgreSQL;
+  3. for a signed-in caller, the users of their 2-hop neighbourhood
+     (friend_suggestions.neighbourhood) that match the key, with their mutual
+     friend counts, in one grouped query. A friend of a friend is found even
+     when the alphabetical window of steps 1-2 stopped before their name, and
+     since every candidate matches the key, anyone missing from this step has
+     no mutual friend.
+
+Results are ranked exact > prefix > infix, then by mutual friends (friends
+of friends first), then by name.
+"""
+from collections import Counter
+
+from sqlalchemy import and_, column, func, literal_column, or_, table, text
+
+from config.database import db
+from models.user_model import User
+from utils.search_text import fold
+
+DEFAULT_LIMIT = 50
+MIN_INFIX_LENGTH = 3  # shorter keys have no trigram to look up
+_PREFIX_END = '\U0010ffff'
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS user_search_fts USING fts5(
+        search_username, search_name, content='user', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_fts_insert AFTER INSERT ON user BEGIN
+        INSERT INTO user_search_fts (rowid, search_username, search_name)
+        VALUES (new.id, new.search_username, new.search_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_fts_delete AFTER DELETE ON user BEGIN
+        INSERT INTO user_search_fts (user_search_fts, rowid, search_username, search_name)
+        VALUES ('delete', old.id, old.search_username, old.search_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_fts_update AFTER UPDATE OF search_username, search_name ON user BEGIN
+        INSERT INTO user_search_fts (user_search_fts, rowid, search_username, search_name)
+        VALUES ('delete', old.id, old.search_username, old.search_name);
+        INSERT INTO user_search_fts (rowid, search_username, search_name)
+        VALUES (new.id, new.search_username, new.search_name);
+    END""",
+]
+
+POSTGRES_DDL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ix_user_search_username_trgm ON "user" USING GIN (search_username gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_user_search_name_trgm ON "user" USING GIN (search_name gin_trgm_ops)',
+]
+
+_fts = table('user_search_fts', column('rowid'))
+
+
+def install(connection):
+    """Create the infix index (and its triggers on SQLite) on connection (idempotent)."""
+    ddl = POSTGRES_DDL if connection.dialect.name == 'postgresql' else SQLITE_DDL
+    for statement in ddl:
+        connection.execute(text(statement))
+
+
+def uninstall(connection):
+    if connection.dialect.name == 'postgresql':
+        for name in ('ix_user_search_username_trgm', 'ix_user_search_name_trgm'):
+            connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    else:
+        connection.execute(text('DROP TABLE IF EXISTS user_search_fts'))
+
+
+def _prefix(col, key, limit):
+    return User.query.filter(col >= key, col < key + _PREFIX_END).order_by(col).limit(limit).all()
+
+
+def _matches(key):
+    """SQL filter for users whose folded username or name contains key as a prefix (or infix)."""
+    cols = (User.search_username, User.search_name)
+    if len(key) >= MIN_INFIX_LENGTH:
+        return or_(*[col.contains(key, autoescape=True) for col in cols])
+    return or_(*[and_(col >= key, col < key + _PREFIX_END) for col in cols])
+
+
+def _near(viewer_id, key):
+    """[(User, mutual friends)] for the viewer's friends of friends matching key."""
+    from services.friend_suggestions import neighbourhood
+    hops = neighbourhood(viewer_id)
+    return db.session.query(User, func.count()).join(hops, hops.c.candidate == User.id) \
+        .filter(_matches(key)).group_by(User.id).all()
+
+
+def _infix(key, limit):
+    if db.engine.dialect.name == 'postgresql':
+        return User.query.filter(or_(User.search_username.contains(key, autoescape=True),
+                                     User.search_name.contains(key, autoescape=True))).limit(limit).all()
+    # a quoted phrase is a substring match with the trigram tokenizer
+    match = '"' + key.replace('"', '""') + '"'
+    return User.query.join(_fts, _fts.c.rowid == User.id) \
+        .filter(literal_column('user_search_fts').op('MATCH')(match)).limit(limit).all()
+
+
+def _tier(user, key):
+    if key in (user.search_username, user.search_name):
+        return 0
+    if (user.search_username or '').startswith(key) or (user.search_name or '').startswith(key):
+        return 1
+    return 2
+
+
+def search(q, viewer_id=None, limit=DEFAULT_LIMIT):
+    """Ranked [(User, mutual friend count)] matching q."""
+    key = fold(q)
+    if not key:
+        return []
+    found = {}
+    for col in (User.search_username, User.search_name):
+        for u in _prefix(col, key, limit):
+            found[u.id] = u
+    if len(found) < limit and len(key) >= MIN_INFIX_LENGTH:
+        for u in _infix(key, limit + len(found)):
+            found.setdefault(u.id, u)
+    mutual = Counter()
+    if viewer_id is not None:
+        for u, n in _near(viewer_id, key):
+            found.setdefault(u.id, u)
+            mutual[u.id] = n
+    ranked = sorted(found.values(), key=lambda u: (_tier(u, key), -mutual[u.id], u.search_name or '', u.id))
+    return [(u, mutual[u.id]) for u in ranked[:limit]]
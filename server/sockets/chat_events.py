@@ -10,47 +10,38 @@ from models.group_model import Group, GroupMember
 from config.database import db
 import logging
 from services.auth_service import decode_token
+from services import conversation_summary
+from services.presence import registry as presence
+from services import group_presence
+from services import group_rooms
+from services import access_cache
+from services import friend_suggestions
+from services import typing_indicator
+from services import reactions
+from services.message_writer import writer as message_writer
+from services.rate_limit import rate_limited, notify_rate_limited
 import traceback
 import os
 
 # module logger
 logger = logging.getLogger(__name__)
 
-# Store mapping of user_id -> socket.sid for direct targeting
-user_sockets = {}
-
 def register_chat_events(socketio):
     def GetContactsList(user_id):
         """Return a list of contact dicts for given user_id: {id, name, online}.
-        Looks up Friend relations with status 'accepted' and queries User for profile.
-        Online detection uses the in-memory `user_sockets` mapping.
+        Friend ids come from the presence registry cache, profiles from one IN query.
+        Online detection uses the presence registry.
         """
         try:
-            # Find both directions where relationship exists
-            outgoing = Friend.query.filter_by(user_id=user_id, status='accepted').all() or []
-            incoming = Friend.query.filter_by(friend_id=user_id, status='accepted').all() or []
-            rows = []
-            for f in outgoing:
-                fid = f.friend_id
-                u = User.query.get(fid)
-                if not u:
-                    continue
-                rows.append({
-                    'id': str(u.id),
-                    'name': u.display_name or u.username,
-                    'online': fid in user_sockets
-                })
-            for f in incoming:
-                fid = f.user_id
-                u = User.query.get(fid)
-                if not u:
-                    continue
-                rows.append({
-                    'id': str(u.id),
-                    'name': u.display_name or u.username,
-                    'online': fid in user_sockets
-                })
-            return rows
+            friend_ids = presence.friend_ids(user_id)
+            if not friend_ids:
+                return []
+            users = User.query.filter(User.id.in_(friend_ids)).order_by(User.id).all()
+            return [{
+                'id': str(u.id),
+                'name': u.display_name or u.username,
+                'online': presence.is_online(u.id)
+            } for u in users]
         except Exception as e:
             print(f"[CONTACTS] Error building contacts list: {e}")
             return []
@@ -64,6 +55,8 @@ def register_chat_events(socketio):
             b = Block(user_id=user_id, target_id=target_id)
             db.session.add(b)
             db.session.commit()
+            access_cache.invalidate_block(user_id, target_id)
+            friend_suggestions.invalidate(user_id, target_id)
             return True, b
         except Exception as e:
             print(f"[BLOCK] Error adding block: {e}")
@@ -77,6 +70,8 @@ def register_chat_events(socketio):
                 return False, 'not_found'
             db.session.delete(b)
             db.session.commit()
+            access_cache.invalidate_block(user_id, target_id)
+            friend_suggestions.invalidate(user_id, target_id)
             return True, None
         except Exception as e:
             print(f"[BLOCK] Error removing block: {e}")
@@ -141,6 +136,7 @@ def register_chat_events(socketio):
             fr = Friend(user_id=sender_id, friend_id=target.id, status='pending')
             db.session.add(fr)
             db.session.commit()
+            friend_suggestions.invalidate(sender_id, target.id)
             return True, 'created', fr, target.id
         except Exception as e:
             print(f"[FRIENDS] Error creating friend request: {e}")
@@ -163,6 +159,8 @@ def register_chat_events(socketio):
             fr.status = 'accepted'
             db.session.commit()
             requester_id = fr.user_id
+            presence.invalidate_friends(fr.user_id, fr.friend_id)
+            friend_suggestions.invalidate_edge(fr.user_id, fr.friend_id)
             return True, 'accepted', fr, requester_id
         except Exception as e:
             print(f"[FRIENDS] Error accepting friend request: {e}")
@@ -184,12 +182,27 @@ def register_chat_events(socketio):
             # delete the pending request
             db.session.delete(fr)
             db.session.commit()
+            friend_suggestions.invalidate(requester_id, rejector_user_id)
             return True, 'rejected', requester_id
         except Exception as e:
             print(f"[FRIENDS] Error rejecting friend request: {e}")
             db.session.rollback()
             return False, 'error', None
 
+    def reject_send(event):
+        """on_reject for the send handlers: the client also gets a message_sent_ack
+        so the pending bubble can be marked failed instead of spinning."""
+        def on_reject(retry_after, data=None, *args):
+            notify_rate_limited(event, retry_after)
+            client_message_id = data.get('client_message_id') if isinstance(data, dict) else None
+            if client_message_id:
+                socketio.emit('message_sent_ack', {
+                    'client_message_id': client_message_id,
+                    'status': 'rate_limited',
+                    'retry_after': round(retry_after, 3),
+                }, room=request.sid)
+        return on_reject
+
     @socketio.on('connect')
     def handle_connect():
         ip = request.remote_addr
@@ -197,6 +210,7 @@ def register_chat_events(socketio):
         emit('connected', {'msg': 'Connected to chat server'})
 
     @socketio.on('join')
+    @rate_limited('join')
     def handle_join(data):
         """
         Expect data to include either:
@@ -208,11 +222,16 @@ def register_chat_events(socketio):
         user_id = data.get('user_id')
         room = data.get('room')
         
+        came_online = False
         if user_id:
             room_name = f'user-{user_id}'
-            # Store user_id -> sid mapping
-            user_sockets[user_id] = request.sid
-            logger.debug("Stored mapping: user_id=%s -> sid=%s", user_id, request.sid)
+            # Register this sid for the user (a user may have several tabs/devices)
+            try:
+                came_online = presence.add(user_id, request.sid)
+            except (TypeError, ValueError):
+                logger.warning("Invalid user_id in join request: %r", user_id)
+                return
+            logger.debug("Registered sid=%s for user_id=%s (came_online=%s)", request.sid, user_id, came_online)
         elif room:
             room_name = room
             logger.debug("Using explicit room: %s", room_name)
@@ -224,23 +243,30 @@ def register_chat_events(socketio):
 
         join_room(room_name)
         logger.info("User joined room: %s", room_name)
-        logger.debug("Current user_sockets mapping: %s", user_sockets)
+        logger.debug("Presence: %s", presence.stats())
         
+        # Every socket of a member sits in the group-<id> rooms so group traffic is emitted once
+        group_ids = None
+        if user_id:
+            try:
+                group_ids = group_presence.member_group_ids(user_id)
+                group_rooms.enter_groups(socketio, request.sid, group_ids)
+            except Exception:
+                logger.exception('Failed to enter group rooms for user %s', user_id)
+
         # Notify the user's own room (useful for multi-tab clients)
         socketio.emit('user_joined', {'user_id': user_id, 'room': room_name}, room=room_name)
 
+        # Extra tabs of an already-online user do not change presence for anyone else
+        if user_id and not came_online:
+            logger.info("[JOIN] END - SUCCESS user=%s room=%s (additional connection)", user_id, room_name)
+            return
+
         # Additionally notify the user's friends that this user is online.
-        # Find all accepted friends and emit `user_joined` to their rooms so they can update presence.
+        # Emit `user_joined` to each accepted friend's room so they can update presence.
         try:
             if user_id:
-                # collect friend ids in both directions
-                outgoing = Friend.query.filter_by(user_id=user_id, status='accepted').all() or []
-                incoming = Friend.query.filter_by(friend_id=user_id, status='accepted').all() or []
-                friend_ids = set()
-                for f in outgoing:
-                    friend_ids.add(f.friend_id)
-                for f in incoming:
-                    friend_ids.add(f.user_id)
+                friend_ids = presence.friend_ids(user_id)
                 for fid in friend_ids:
                     try:
                         socketio.emit('user_joined', {'user_id': user_id}, room=f'user-{fid}')
@@ -249,67 +275,24 @@ def register_chat_events(socketio):
                         logger.exception('Error emitting user_joined to friend %s', fid)
         except Exception:
             logger.exception('Error while notifying friends about user_joined')
-        # Update persistent user status immediately so REST endpoints reflect online state
+        # Persist online status and move group online counters up in one commit;
+        # only groups crossing the threshold are written and announced
         try:
             if user_id:
                 u = User.query.get(int(user_id))
                 if u:
                     u.status = 'online'
-                    db.session.commit()
-                    logger.debug('Set User.%s status=online in DB', user_id)
+                flips = group_presence.user_transition(user_id, +1, group_ids)
+                db.session.commit()
+                logger.debug('Set User.%s status=online, group flips=%s', user_id, flips)
+                group_presence.emit_updates(socketio, flips)
         except Exception:
             db.session.rollback()
-            logger.exception('Failed to persist user online status for %s', user_id)
-
-        # Recompute group online status: if at least 2 members online -> group is online
-        try:
-            if user_id:
-                # find groups where this user is a member
-                gms = GroupMember.query.filter_by(user_id=int(user_id)).all()
-                group_ids = set([gm.group_id for gm in gms])
-                for gid in group_ids:
-                    try:
-                        members = GroupMember.query.filter_by(group_id=gid).all()
-                        online_count = 0
-                        for m in members:
-                            try:
-                                # prefer in-memory mapping for immediacy
-                                if str(m.user_id) in user_sockets or m.user_id in user_sockets:
-                                    online_count += 1
-                                else:
-                                    # fallback to DB status
-                                    mu = User.query.get(m.user_id)
-                                    if mu and mu.status == 'online':
-                                        online_count += 1
-                            except Exception:
-                                continue
-                        grp = Group.query.get(gid)
-                        if grp:
-                            new_status = 'online' if online_count >= 2 else 'offline'
-                            if getattr(grp, 'status', None) != new_status:
-                                try:
-                                    grp.status = new_status
-                                    db.session.commit()
-                                except Exception:
-                                    db.session.rollback()
-                                # notify group members about updated status (emit to each member's personal room)
-                                try:
-                                    for m in members:
-                                        try:
-                                            socketio.emit('group_updated', { 'group_id': gid, 'status': new_status }, room=f'user-{m.user_id}')
-                                        except Exception:
-                                            logger.exception('Failed to emit group_updated to user %s for group %s', m.user_id, gid)
-                                except Exception:
-                                    logger.exception('Failed to emit group_updated for %s', gid)
-                    except Exception:
-                        logger.exception('Error computing online count for group %s', gid)
-        except Exception:
-            logger.exception('Error while recomputing groups after join for user %s', user_id)
-        except Exception:
-            logger.exception('Error while notifying friends about user_joined')
+            logger.exception('Failed to persist online status / group counters for %s', user_id)
         logger.info("[JOIN] END - SUCCESS user=%s room=%s", user_id, room_name)
 
     @socketio.on('send_message')
+    @rate_limited('send_message', on_reject=reject_send('send_message'))
     def handle_send_message(data):
         """Handle 1:1 messages with support for reply_to, forward_from, reactions."""
         sender_id = data.get('sender_id')
@@ -348,8 +331,8 @@ def register_chat_events(socketio):
             # Check block list for 1:1 messages only. For group messages we'll still allow save
             if not group_id:
                 try:
-                    blocked_by_receiver = Block.query.filter_by(user_id=receiver_id, target_id=sender_id).first()
-                    blocked_by_sender = Block.query.filter_by(user_id=sender_id, target_id=receiver_id).first()
+                    # cached; invalidated by AddBlock/RemoveBlock
+                    blocked_by_receiver, blocked_by_sender = access_cache.block_status(sender_id, receiver_id)
                 except Exception as e:
                     logger.warning("Block check skipped due to error (schema may be missing): %s", e)
                     blocked_by_receiver = None
@@ -383,22 +366,29 @@ def register_chat_events(socketio):
                 except Exception:
                     logger.warning('Invalid group_id provided: %s', group_id)
                     return
-                grp = Group.query.get(gid)
+                # owner + member ids come from the access cache (no DB round-trip when warm)
+                grp = access_cache.group_info(gid)
                 if not grp:
                     logger.warning('Group not found: %s', gid)
                     return
+                owner_id, member_ids = grp
                 # verify sender is a member
-                is_member = GroupMember.query.filter_by(group_id=gid, user_id=int(sender_id)).first()
-                if not is_member:
+                if int(sender_id) not in member_ids:
                     logger.warning('Sender %s is not a member of group %s', sender_id, gid)
                     return
                 # use group's owner as receiver_id placeholder (DB requires receiver_id non-null)
-                receiver_for_db = grp.owner_id or int(sender_id)
+                receiver_for_db = owner_id or int(sender_id)
                 msg = Message(sender_id=sender_id, receiver_id=receiver_for_db, content=content, group_id=gid)
             else:
                 msg = Message(sender_id=sender_id, receiver_id=receiver_id, content=content)
-            db.session.add(msg)
-            db.session.commit()
+            if message_writer.enabled:
+                # write-behind: id + journal now, committed with the next batch
+                message_writer.submit(msg)
+            else:
+                db.session.add(msg)
+                db.session.flush()
+                conversation_summary.record_message(msg)
+                db.session.commit()
             print('[DEBUG SEND_MESSAGE] DB commit succeeded, msg.id=', getattr(msg, 'id', None))
             logger.info("Message saved to DB: message_id=%s timestamp=%s", msg.id, msg.timestamp)
         except Exception as e:
@@ -463,17 +453,11 @@ def register_chat_events(socketio):
             socketio.emit('message_sent_ack', ack_data, room=request.sid)
             logger.debug("Sent ACK to sender: %s", ack_data)
 
-        # Broadcast: if group message, emit to all group members; otherwise emit to single receiver
+        # Broadcast: if group message, emit once to the group room; otherwise emit to single receiver
         if group_id:
             try:
-                members = GroupMember.query.filter_by(group_id=int(group_id)).all()
-                for m in members:
-                    try:
-                        room = f'user-{m.user_id}'
-                        socketio.emit('receive_message', message_data, room=room)
-                    except Exception:
-                        logger.exception('Error emitting group message to user %s in group %s', m.user_id, group_id)
-                logger.info('Emitted group message_id=%s to group %s members count=%s', msg.id, group_id, len(members))
+                group_rooms.emit_to_group(socketio, 'receive_message', message_data, int(group_id))
+                logger.info('Emitted group message_id=%s to room group-%s', msg.id, group_id)
             except Exception:
                 logger.exception('Error broadcasting group message for group %s', group_id)
         else:
@@ -487,71 +471,64 @@ def register_chat_events(socketio):
 
         logger.debug("[SEND_MESSAGE] END - SUCCESS sender=%s receiver=%s message_id=%s", sender_id, receiver_id, msg.id)
 
-    @socketio.on('add_reaction')
-    def handle_add_reaction(data):
-        """Handle emoji reactions to messages."""
+    def _reaction_rooms(message_id):
+        """Rooms of a message's participants (None if the message does not exist)."""
+        msg = Message.query.get(message_id)
+        if msg is None:
+            return None
+        if msg.group_id:
+            # one emit into the group room reaches every member socket
+            return [group_rooms.room_name(msg.group_id)]
+        return sorted({f'user-{msg.sender_id}', f'user-{msg.receiver_id}'})
+
+    def _change_reaction(data, delta):
+        """Shared body of add_reaction / remove_reaction: apply, commit, emit the delta."""
+        event = 'add_reaction' if delta > 0 else 'remove_reaction'
         message_id = data.get('message_id')
         user_id = data.get('user_id')
         reaction = data.get('reaction')  # emoji like '❤️', '😂', etc
-        logger.debug("[CHAT][RECV] add_reaction message_id=%s user=%s reaction=%s", message_id, user_id, reaction)
+        logger.debug("[CHAT][RECV] %s message_id=%s user=%s reaction=%s", event, message_id, user_id, reaction)
 
         if not message_id or not user_id or not reaction:
-            logger.warning("Missing fields in add_reaction: message_id=%s user_id=%s reaction=%s", message_id, user_id, reaction)
+            logger.warning("Missing fields in %s: message_id=%s user_id=%s reaction=%s", event, message_id, user_id, reaction)
             return
 
         try:
-            # avoid duplicate same-reaction by same user
-            exists = MessageReaction.query.filter_by(message_id=message_id, user_id=user_id, reaction_type=reaction).first()
-            if exists:
-                logger.debug("Reaction already exists for message=%s user=%s reaction=%s - ignoring", message_id, user_id, reaction)
+            message_id, user_id = int(message_id), int(user_id)
+            message_writer.ensure_persisted(message_id)
+            rooms = _reaction_rooms(message_id)
+            if rooms is None:
+                logger.debug("%s for unknown message=%s - ignoring", event, message_id)
                 return
-
-            mr = MessageReaction(message_id=message_id, user_id=user_id, reaction_type=reaction)
-            db.session.add(mr)
-            db.session.commit()
-            logger.info("Saved reaction for message=%s by user=%s reaction=%s", message_id, user_id, reaction)
-
-            # Aggregate reactions for this message
-            reactions = MessageReaction.query.filter_by(message_id=message_id).all()
-            agg = {}
-            for r in reactions:
-                agg.setdefault(r.reaction_type, []).append(r.user_id)
-
-            # Emit aggregated reactions to interested parties (sender & receiver rooms)
-            msg = Message.query.get(message_id)
-            target_rooms = set()
-            if msg:
-                if msg.group_id:
-                    # emit to all group members
-                    members = GroupMember.query.filter_by(group_id=msg.group_id).all()
-                    for m in members:
-                        target_rooms.add(f'user-{m.user_id}')
-                else:
-                    target_rooms.add(f'user-{msg.sender_id}')
-                    target_rooms.add(f'user-{msg.receiver_id}')
+            if delta > 0:
+                count = reactions.add(message_id, user_id, reaction)
             else:
-                target_rooms = None
-
-            payload = {
-                'message_id': message_id,
-                'reactions': agg
-            }
+                count = reactions.remove(message_id, user_id, reaction)
+            if count is None:
+                # already there / not there: nothing changed, nothing to tell anyone
+                db.session.rollback()
+                return
+            db.session.commit()
+            logger.info("%s message=%s user=%s reaction=%s count=%s", event, message_id, user_id, reaction, count)
+            socketio.emit('message_reaction', reactions.delta_payload(message_id, user_id, reaction, delta, count), to=rooms)
+        except Exception:
+            db.session.rollback()
+            logger.exception("Error saving/emitting %s for message=%s", event, message_id)
 
-            if target_rooms:
-                for r in target_rooms:
-                    try:
-                        socketio.emit('message_reaction', payload, room=r)
-                        logger.debug("Emitted message_reaction to room=%s", r)
-                    except Exception:
-                        logger.exception("Error emitting reaction to room %s", r)
-            else:
-                socketio.emit('message_reaction', payload, broadcast=True)
-                logger.debug("Broadcasted message_reaction for message=%s", message_id)
+    @socketio.on('add_reaction')
+    @rate_limited('add_reaction')
+    def handle_add_reaction(data):
+        """Handle emoji reactions to messages."""
+        _change_reaction(data, +1)
 
-        except Exception:
-            logger.exception("Error saving/emitting reaction for message=%s", message_id)
+    @socketio.on('remove_reaction')
+    @rate_limited('add_reaction')  # same budget, toggling does not double it
+    def handle_remove_reaction(data):
+        """Undo one emoji reaction. data: { message_id, user_id, reaction }"""
+        _change_reaction(data, -1)
 
     @socketio.on('send_sticker')
+    @rate_limited('send_sticker', on_reject=reject_send('send_sticker'))
     def handle_send_sticker(data):
         """Handle sticker messages (Giphy, EmojiOne, Twemoji, custom pack)."""
         sender_id = data.get('sender_id')
@@ -576,15 +553,15 @@ def register_chat_events(socketio):
                 except Exception:
                     print('[STICKER] invalid group_id')
                     return
-                grp = Group.query.get(gid)
+                grp = access_cache.group_info(gid)
                 if not grp:
                     print('[STICKER] group not found')
                     return
-                is_member = GroupMember.query.filter_by(group_id=gid, user_id=int(sender_id)).first()
-                if not is_member:
+                owner_id, member_ids = grp
+                if int(sender_id) not in member_ids:
                     print('[STICKER] sender not member of group')
                     return
-                receiver_for_db = grp.owner_id or int(sender_id)
+                receiver_for_db = owner_id or int(sender_id)
                 msg = Message(
                     sender_id=sender_id,
                     receiver_id=receiver_for_db,
@@ -604,6 +581,8 @@ def register_chat_events(socketio):
                     sticker_url=sticker_url
                 )
             db.session.add(msg)
+            db.session.flush()
+            conversation_summary.record_message(msg)
             db.session.commit()
             print(f"[CHAT][GỬI] ✅ Sticker saved to DB: message_id={msg.id}")
         except Exception as e:
@@ -642,12 +621,10 @@ def register_chat_events(socketio):
             print(f"[CHAT][GỬI] 📋 Sending ACK for sticker to sender: {ack_data}")
             socketio.emit('message_sent_ack', ack_data, room=request.sid)
         
-        # Broadcast: group -> all members, otherwise single receiver
+        # Broadcast: group -> group room (one emit), otherwise single receiver
         if group_id:
             try:
-                members = GroupMember.query.filter_by(group_id=int(group_id)).all()
-                for m in members:
-                    socketio.emit('receive_message', sticker_data, room=f'user-{m.user_id}')
+                group_rooms.emit_to_group(socketio, 'receive_message', sticker_data, int(group_id))
                 print(f"[CHAT][GỬI] ✅ Sticker emitted to group {group_id}")
             except Exception as e:
                 print(f"[ERROR] ❌ ERROR emitting sticker to group {group_id}: {e}")
@@ -663,6 +640,7 @@ def register_chat_events(socketio):
         print("[CHAT][GỬI] [STICKER] END - SUCCESS")
 
     @socketio.on('send_file_message')
+    @rate_limited('send_file_message', on_reject=reject_send('send_file_message'))
     def handle_send_file_message(data):
         """Handle file messages that were uploaded to S3.
         Expected data: { sender_id, receiver_id, file_url, file_name, file_size, file_type, client_message_id }
@@ -685,9 +663,8 @@ def register_chat_events(socketio):
             return
 
         try:
-            # Check block list: TWO-WAY check
-            blocked_by_receiver = Block.query.filter_by(user_id=receiver_id, target_id=sender_id).first()
-            blocked_by_sender = Block.query.filter_by(user_id=sender_id, target_id=receiver_id).first()
+            # Check block list: TWO-WAY check (cached; invalidated by AddBlock/RemoveBlock)
+            blocked_by_receiver, blocked_by_sender = access_cache.block_status(sender_id, receiver_id)
             if blocked_by_receiver or blocked_by_sender:
                 logger.info("Block detected for file send - rejecting")
                 if client_message_id:
@@ -714,15 +691,15 @@ def register_chat_events(socketio):
                 except Exception:
                     logger.warning('Invalid group_id for file message: %s', group_id)
                     return
-                grp = Group.query.get(gid)
+                grp = access_cache.group_info(gid)
                 if not grp:
                     logger.warning('Group not found for file message: %s', gid)
                     return
-                is_member = GroupMember.query.filter_by(group_id=gid, user_id=int(sender_id)).first()
-                if not is_member:
+                owner_id, member_ids = grp
+                if int(sender_id) not in member_ids:
                     logger.warning('Sender not member of group for file message: %s', sender_id)
                     return
-                receiver_for_db = grp.owner_id or int(sender_id)
+                receiver_for_db = owner_id or int(sender_id)
                 msg = Message(
                     sender_id=sender_id,
                     receiver_id=receiver_for_db,
@@ -740,6 +717,8 @@ def register_chat_events(socketio):
                     file_url=file_url
                 )
             db.session.add(msg)
+            db.session.flush()
+            conversation_summary.record_message(msg)
             db.session.commit()
             logger.info("File message saved to DB: message_id=%s file=%s", msg.id, file_name)
         except Exception as e:
@@ -779,13 +758,11 @@ def register_chat_events(socketio):
             socketio.emit('message_sent_ack', ack_data, room=request.sid)
             logger.debug("Sent ACK for file message to sender: %s", ack_data)
 
-        # Broadcast: group -> all members, otherwise single receiver
+        # Broadcast: group -> group room (one emit), otherwise single receiver
         if group_id:
             try:
-                members = GroupMember.query.filter_by(group_id=int(group_id)).all()
-                for m in members:
-                    socketio.emit('receive_message', message_data, room=f'user-{m.user_id}')
-                logger.info('Emitted file message_id=%s to group %s members=%s', msg.id, group_id, len(members))
+                group_rooms.emit_to_group(socketio, 'receive_message', message_data, int(group_id))
+                logger.info('Emitted file message_id=%s to room group-%s', msg.id, group_id)
             except Exception:
                 logger.exception('Error emitting file message to group %s', group_id)
         else:
@@ -800,23 +777,25 @@ def register_chat_events(socketio):
         logger.debug("[SEND_FILE_MESSAGE] END - SUCCESS sender=%s receiver=%s message_id=%s", sender_id, receiver_id, msg.id)
 
     @socketio.on('typing')
+    @rate_limited('typing')
     def handle_typing(data):
-        """Broadcast typing indicator."""
+        """Forward typing start/stop to the receiver, coalesced (see services/typing_indicator)."""
         sender_id = data.get('sender_id')
         receiver_id = data.get('receiver_id')
-        is_typing = data.get('is_typing', False)
-        
-        print(f"[CHAT][NHẬN] [TYPING] sender={sender_id} receiver={receiver_id} typing={is_typing}")
-        
-        # Send to receiver only
+        is_typing = bool(data.get('is_typing', False))
+        if not sender_id or not receiver_id:
+            return
+
+        # Send to receiver only, and only when the state changes
         receiver_room = f'user-{receiver_id}'
-        socketio.emit('user_typing', {
-            'sender_id': sender_id,
-            'is_typing': is_typing
-        }, room=receiver_room)
-        print(f"[CHAT][GỬI] user_typing -> room={receiver_room}")
+        change = typing_indicator.coalescer.update(sender_id, receiver_room, is_typing)
+        if change is None:
+            return
+        socketio.emit('user_typing', typing_indicator.payload(sender_id, change), room=receiver_room)
+        logger.debug("[CHAT][GỬI] user_typing -> room=%s typing=%s", receiver_room, change)
 
     @socketio.on('command')
+    @rate_limited('command')
     def handle_command(payload):
         """Handle generic JSON command payloads from client.
         Expected format: { action: 'GET_CONTACTS_LIST', data: {...}, token: 'jwt' }
@@ -1016,6 +995,7 @@ def register_chat_events(socketio):
             logger.exception('Error in handle_group_created_notify')
 
     @socketio.on('edit_message')
+    @rate_limited('edit_message')
     def handle_edit_message(data):
         """Allow sender to edit their message. data: { message_id, user_id, new_content }"""
         message_id = data.get('message_id')
@@ -1026,6 +1006,7 @@ def register_chat_events(socketio):
             print('[EDIT] Missing fields')
             return
         try:
+            message_writer.ensure_persisted(message_id)
             msg = Message.query.get(message_id)
             if not msg:
                 print('[EDIT] Message not found')
@@ -1036,6 +1017,7 @@ def register_chat_events(socketio):
             msg.content = new_content
             from datetime import datetime
             msg.timestamp = datetime.utcnow()
+            conversation_summary.record_edit(msg)
             db.session.commit()
             # Emit update to participants
             target_rooms = [f'user-{msg.sender_id}', f'user-{msg.receiver_id}']
@@ -1055,6 +1037,7 @@ def register_chat_events(socketio):
             print('[EDIT] Error:', e)
 
     @socketio.on('recall_message')
+    @rate_limited('recall_message')
     def handle_recall_message(data):
         """Allow sender to recall (delete) a message. data: { message_id, user_id }"""
         message_id = data.get('message_id')
@@ -1064,6 +1047,7 @@ def register_chat_events(socketio):
             print('[RECALL] Missing fields')
             return
         try:
+            message_writer.ensure_persisted(message_id)
             msg = Message.query.get(message_id)
             if not msg:
                 print('[RECALL] Message not found')
@@ -1072,6 +1056,8 @@ def register_chat_events(socketio):
                 print('[RECALL] User not owner of message')
                 return
             # Simple recall: delete row from DB
+            conversation_summary.record_recall(msg)
+            reactions.forget_message(msg.id)
             db.session.delete(msg)
             db.session.commit()
             payload = {'message_id': message_id}
@@ -1089,25 +1075,15 @@ def register_chat_events(socketio):
     @socketio.on('disconnect')
     def handle_disconnect(data=None):
         print(f"[CHAT][NHẬN] [DISCONNECT] sid={request.sid}")
-        # Remove user_id from mapping on disconnect
-        for uid, sid in list(user_sockets.items()):
-            if sid == request.sid:
-                # remove mapping and remember uid for notifying friends
-                del user_sockets[uid]
-                removed_uid = uid
-                print(f"[CHAT][NHẬN] ✅ Removed user_id={uid} from mapping")
-                break
-        # Notify friends that the user went offline (if we know which user was removed)
+        # Read the friend set before removal: the cache is dropped when the user goes offline
+        uid = presence.user_for(request.sid)
+        friend_ids = presence.friend_ids(uid) if uid is not None else frozenset()
+        removed_uid, went_offline = presence.remove(request.sid)
+        if removed_uid is not None:
+            print(f"[CHAT][NHẬN] ✅ Removed sid={request.sid} of user_id={removed_uid} (offline={went_offline})")
+        # Notify friends that the user went offline (only when their last connection closed)
         try:
-            if 'removed_uid' in locals():
-                # Find friends in both directions
-                outgoing = Friend.query.filter_by(user_id=removed_uid, status='accepted').all() or []
-                incoming = Friend.query.filter_by(friend_id=removed_uid, status='accepted').all() or []
-                friend_ids = set()
-                for f in outgoing:
-                    friend_ids.add(f.friend_id)
-                for f in incoming:
-                    friend_ids.add(f.user_id)
+            if went_offline:
                 for fid in friend_ids:
                     try:
                         # emit to each friend's personal room
@@ -1115,54 +1091,17 @@ def register_chat_events(socketio):
                         print(f"[CHAT][GỬI] user_offline emitted for {removed_uid} to user-{fid}")
                     except Exception:
                         print(f"[CHAT][GỬI] Error emitting user_offline to user-{fid}")
-                # Persist offline status
+                # Persist offline status and move group online counters down in one commit
                 try:
                     u = User.query.get(int(removed_uid))
                     if u:
                         u.status = 'offline'
-                        db.session.commit()
+                    flips = group_presence.user_transition(removed_uid, -1)
+                    db.session.commit()
+                    group_presence.emit_updates(socketio, flips)
                 except Exception:
                     db.session.rollback()
-                    print('[CHAT] Failed to persist user offline status for', removed_uid)
-                # Recompute group online status for groups the user belonged to
-                try:
-                    gms = GroupMember.query.filter_by(user_id=int(removed_uid)).all()
-                    group_ids = set([gm.group_id for gm in gms])
-                    for gid in group_ids:
-                        try:
-                            members = GroupMember.query.filter_by(group_id=gid).all()
-                            online_count = 0
-                            for m in members:
-                                try:
-                                    if str(m.user_id) in user_sockets or m.user_id in user_sockets:
-                                        online_count += 1
-                                    else:
-                                        mu = User.query.get(m.user_id)
-                                        if mu and mu.status == 'online':
-                                            online_count += 1
-                                except Exception:
-                                    continue
-                            grp = Group.query.get(gid)
-                            if grp:
-                                new_status = 'online' if online_count >= 2 else 'offline'
-                                if getattr(grp, 'status', None) != new_status:
-                                    try:
-                                        grp.status = new_status
-                                        db.session.commit()
-                                    except Exception:
-                                        db.session.rollback()
-                                    try:
-                                        for m in members:
-                                            try:
-                                                socketio.emit('group_updated', {'group_id': gid, 'status': new_status}, room=f'user-{m.user_id}')
-                                            except Exception:
-                                                print('[CHAT] Failed to emit group_updated to user', m.user_id)
-                                    except Exception:
-                                        print('[CHAT] Failed to emit group_updated for', gid)
-                        except Exception:
-                            print('[CHAT] Error recomputing online count for group', gid)
-                except Exception:
-                    print('[CHAT] Error while recomputing groups after disconnect for user', removed_uid)
+                    print('[CHAT] Failed to persist offline status / group counters for', removed_uid)
             # also broadcast a generic offline event for compatibility
             emit('user_offline', {'sid': request.sid}, broadcast=True)
         except Exception:
@@ -0,0 +1,66 @@
+from config.database import db
+from conftest import QueryCounter, make_user
+from models.group_model import Group, GroupMember
+from services import access_cache
+from services.auth_service import create_token_for_user
+from utils.ttl_cache import TTLCache
+
+
+def _acks(client):
+    return [e['args'][0] for e in client.get_received() if e['name'] == 'message_sent_ack']
+
+
+def test_ttl_cache_expires_and_evicts():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)  # evicts least recently used 'b'
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+    now[0] = 11
+    assert cache.get('a') is None
+
+
+def test_block_checks_are_cached_and_invalidated(app, socketio):
+    alice, bob = make_user('alice'), make_user('bob')
+    a, b = alice.id, bob.id
+    client = socketio.test_client(app)
+    client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': 'one', 'client_message_id': 'c1'})
+
+    with QueryCounter(db.engine) as qc:
+        client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': 'two', 'client_message_id': 'c2'})
+    assert not [sql for sql in qc.statements if 'block' in sql.lower()]
+    assert [ack['status'] for ack in _acks(client)] == ['sent', 'sent']
+
+    token = create_token_for_user(db.session.get(type(bob), b))
+    client.emit('command', {'action': 'BLOCK_USER', 'token': token, 'data': {'target': a}})
+    client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': 'three', 'client_message_id': 'c3'})
+    assert _acks(client)[-1]['status'] == 'blocked'
+
+    client.emit('command', {'action': 'UNBLOCK_USER', 'token': token, 'data': {'target': a}})
+    client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': 'four', 'client_message_id': 'c4'})
+    assert _acks(client)[-1]['status'] == 'sent'
+
+
+def test_group_membership_cache_follows_member_routes(app, socketio):
+    alice, bob = make_user('alice'), make_user('bob')
+    g = Group(name='g', owner_id=alice.id)
+    db.session.add(g)
+    db.session.commit()
+    db.session.add(GroupMember(group_id=g.id, user_id=alice.id, role='owner'))
+    db.session.commit()
+    gid, a, b = g.id, alice.id, bob.id
+    headers = {'Authorization': f'Bearer {create_token_for_user(alice)}'}
+    client = socketio.test_client(app)
+
+    client.emit('send_message', {'sender_id': b, 'group_id': gid, 'content': 'x', 'client_message_id': 'c1'})
+    assert _acks(client) == []
+    app.test_client().post(f'/groups/{gid}/members', json={'user_id': b}, headers=headers)
+    client.emit('send_message', {'sender_id': b, 'group_id': gid, 'content': 'y', 'client_message_id': 'c2'})
+    assert [ack['status'] for ack in _acks(client)] == ['sent']
+
+    app.test_client().delete(f'/groups/{gid}/members/{b}', headers=headers)
+    client.emit('send_message', {'sender_id': b, 'group_id': gid, 'content': 'z', 'client_message_id': 'c3'})
+    assert _acks(client) == []
+    assert access_cache.is_group_member(gid, a) and not access_cache.is_group_member(gid, b)
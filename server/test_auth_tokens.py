@@ -0,0 +1,67 @@
+import datetime
+
+import jwt
+from flask import g
+
+from conftest import make_user
+from services import auth_service
+from services.auth_service import create_token_for_user, decode_token
+from services.token_revocation import MemoryRevocationStore
+
+
+def _count_verifies(monkeypatch):
+    calls = []
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(1)
+        return real_decode(*args, **kwargs)
+    monkeypatch.setattr(auth_service.jwt, 'decode', counting_decode)
+    return calls
+
+
+def test_claims_are_verified_once_per_token(app, monkeypatch):
+    token = create_token_for_user(make_user('alice'))
+    calls = _count_verifies(monkeypatch)
+    with app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+        assert decode_token(token)['user_id'] == 1
+        assert decode_token(token)['user_id'] == 1
+    # the test app context outlives the request, drop its memo to hit the LRU
+    g.pop('_jwt_claims', None)
+    with app.test_request_context():
+        assert decode_token(token)['user_id'] == 1
+    assert len(calls) == 1
+
+
+def test_logout_revokes_only_that_token(app):
+    from routes.auth.logout import auth_logout_bp
+    app.register_blueprint(auth_logout_bp)
+    user = make_user('alice')
+    token, other = create_token_for_user(user), create_token_for_user(user)
+    client = app.test_client()
+
+    assert client.post('/logout', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+    assert decode_token(token) is None
+    assert decode_token(other)['user_id'] == user.id
+    assert client.post('/logout').status_code == 400
+
+
+def test_legacy_token_without_jti_can_be_revoked(app):
+    exp = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    token = jwt.encode({'user_id': 7, 'exp': exp}, 'test-secret', algorithm='HS256')
+    assert decode_token(token)['user_id'] == 7
+    auth_service.logout_user(token)
+    assert decode_token(token) is None
+
+
+def test_memory_store_forgets_entries_at_exp():
+    now = [1000.0]
+    store = MemoryRevocationStore(clock=lambda: now[0])
+    store.revoke('a', 1010)
+    store.revoke('b', 1100)
+    store.revoke('c', 990)  # already expired
+    assert store.is_revoked('a') and store.is_revoked('b') and not store.is_revoked('c')
+    now[0] = 1050
+    assert not store.is_revoked('a')
+    store.revoke('d', 2000)
+    assert len(store) == 2
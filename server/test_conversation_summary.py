@@ -0,0 +1,111 @@
+from config.database import db
+from conftest import make_user
+from models.conversation_summary_model import ConversationSummary
+from models.group_model import Group, GroupMember
+from models.message_model import Message
+from services.auth_service import create_token_for_user
+
+
+def _inbox(app, user):
+    headers = {'Authorization': f'Bearer {create_token_for_user(user)}'}
+    return app.test_client().get('/messages/conversations', headers=headers).get_json()
+
+
+def test_socket_writes_keep_inbox_in_sync(app, socketio):
+    alice, bob = make_user('alice'), make_user('bob')
+    a, b = alice.id, bob.id
+    client = socketio.test_client(app)
+    client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': 'hi', 'client_message_id': 'c1'})
+    client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': 'again', 'client_message_id': 'c2'})
+    acks = [e['args'][0] for e in client.get_received() if e['name'] == 'message_sent_ack']
+    last_id = acks[-1]['message_id']
+
+    [row] = _inbox(app, bob)
+    assert (row['type'], row['id'], row['last_message'], row['unread_count']) == ('user', a, 'again', 2)
+    [row] = _inbox(app, alice)
+    assert (row['id'], row['unread_count']) == (b, 0)
+
+    client.emit('edit_message', {'message_id': last_id, 'user_id': a, 'new_content': 'edited'})
+    assert _inbox(app, bob)[0]['last_message'] == 'edited'
+
+    client.emit('recall_message', {'message_id': last_id, 'user_id': a})
+    [row] = _inbox(app, bob)
+    assert (row['last_message'], row['unread_count']) == ('hi', 1)
+
+    # opening the newest page of the conversation marks it read
+    app.test_client().get(f'/messages?sender_id={b}&receiver_id={a}',
+                          headers={'Authorization': f'Bearer {create_token_for_user(bob)}'})
+    assert _inbox(app, bob)[0]['unread_count'] == 0
+
+
+def test_group_message_updates_every_member(app, socketio):
+    alice, bob, carol = make_user('alice'), make_user('bob'), make_user('carol')
+    g = Group(name='team', owner_id=alice.id)
+    db.session.add(g)
+    db.session.commit()
+    db.session.add_all([GroupMember(group_id=g.id, user_id=u.id) for u in (alice, bob, carol)])
+    db.session.commit()
+
+    client = socketio.test_client(app)
+    client.emit('send_message', {'sender_id': bob.id, 'group_id': g.id, 'content': 'hello team'})
+
+    rows = ConversationSummary.query.filter_by(kind='group', target_id=g.id).all()
+    assert {r.user_id: r.unread_count for r in rows} == {alice.id: 1, bob.id: 0, carol.id: 1}
+    [row] = _inbox(app, carol)
+    assert (row['type'], row['group_name'], row['last_message']) == ('group', 'team', 'hello team')
+
+
+def test_recall_skips_group_messages_of_the_same_pair(app, socketio):
+    alice, bob = make_user('alice'), make_user('bob')
+    a, b = alice.id, bob.id
+    g = Group(name='team', owner_id=b)
+    db.session.add(g)
+    db.session.commit()
+    db.session.add_all([GroupMember(group_id=g.id, user_id=u) for u in (a, b)])
+    db.session.commit()
+
+    client = socketio.test_client(app)
+    client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': 'dm', 'client_message_id': 'c1'})
+    # stored with receiver_id = group owner (bob)
+    client.emit('send_message', {'sender_id': a, 'group_id': g.id, 'content': 'to the team'})
+    client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': 'latest dm', 'client_message_id': 'c2'})
+    acks = [e['args'][0] for e in client.get_received() if e['name'] == 'message_sent_ack']
+    latest_id = acks[-1]['message_id']
+
+    client.emit('recall_message', {'message_id': latest_id, 'user_id': a})
+    rows = ConversationSummary.query.filter_by(kind='user').all()
+    assert {(r.user_id, r.target_id): r.preview for r in rows} == {(a, b): 'dm', (b, a): 'dm'}
+
+
+def test_recalling_an_older_unread_message_decrements_the_counter(app, socketio):
+    alice, bob, carol = make_user('alice'), make_user('bob'), make_user('carol')
+    a, b, c = alice.id, bob.id, carol.id
+    client = socketio.test_client(app)
+    for i in range(3):
+        client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': f'm{i}', 'client_message_id': f'c{i}'})
+    client.emit('send_message', {'sender_id': b, 'receiver_id': a, 'content': 'reply', 'client_message_id': 'r'})
+    ids = [e['args'][0]['message_id'] for e in client.get_received() if e['name'] == 'message_sent_ack']
+
+    client.emit('recall_message', {'message_id': ids[0], 'user_id': a})
+    [row] = _inbox(app, bob)
+    assert (row['last_message'], row['unread_count']) == ('reply', 2)
+
+    # bob reads, then gets one more: only that one is unread
+    app.test_client().get(f'/messages?sender_id={b}&receiver_id={a}',
+                          headers={'Authorization': f'Bearer {create_token_for_user(bob)}'})
+    client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': 'm3', 'client_message_id': 'c3'})
+    client.emit('recall_message', {'message_id': ids[1], 'user_id': a})
+    assert _inbox(app, bob)[0]['unread_count'] == 1
+
+    g = Group(name='team', owner_id=a)
+    db.session.add(g)
+    db.session.commit()
+    db.session.add_all([GroupMember(group_id=g.id, user_id=u) for u in (a, b, c)])
+    db.session.commit()
+    client.get_received()
+    client.emit('send_message', {'sender_id': a, 'group_id': g.id, 'content': 'g1'})
+    client.emit('send_message', {'sender_id': b, 'group_id': g.id, 'content': 'g2'})
+    first = min(m.id for m in Message.query.filter_by(group_id=g.id))
+    client.emit('recall_message', {'message_id': first, 'user_id': a})
+    rows = ConversationSummary.query.filter_by(kind='group', target_id=g.id).all()
+    assert {r.user_id: r.unread_count for r in rows} == {a: 1, b: 0, c: 1}
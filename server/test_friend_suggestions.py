@@ -0,0 +1,96 @@
+import pytest
+
+from config.database import db
+from conftest import QueryCounter, make_user
+from models.block_model import Block
+from models.friend_model import Friend
+from models.user_model import User
+from services import friend_suggestions
+from services.auth_service import create_token_for_user
+from services.presence import registry as presence
+
+
+@pytest.fixture
+def client(app):
+    from routes.friends import friends_bp
+    from routes.users import users_bp
+    app.register_blueprint(friends_bp)
+    app.register_blueprint(users_bp)
+    presence.clear()
+    return app.test_client()
+
+
+def _link(a, b, status='accepted'):
+    db.session.add(Friend(user_id=a.id, friend_id=b.id, status=status))
+    db.session.commit()
+
+
+def _auth(user):
+    return {'Authorization': f'Bearer {create_token_for_user(user)}'}
+
+
+def _suggested(client, user, **params):
+    resp = client.get('/users/suggestions', query_string=params, headers=_auth(user))
+    assert resp.status_code == 200
+    return [(u['username'], u['mutuals']) for u in resp.get_json()]
+
+
+def test_candidates_are_ranked_by_mutual_friends(client):
+    me, f1, f2, f3 = (make_user(n) for n in ('me', 'f1', 'f2', 'f3'))
+    two, one, pending, blocked = (make_user(n) for n in ('two', 'one', 'pending', 'blocked'))
+    stranger = make_user('stranger')
+    for f in (f1, f2, f3):
+        _link(me, f)
+    _link(two, f1)
+    _link(f2, two)
+    _link(f3, one)
+    _link(f1, f2)  # my friends know each other: neither is suggested
+    for u in (pending, blocked):
+        _link(f1, u)
+        _link(f2, u)
+    _link(pending, me, status='pending')
+    db.session.add(Block(user_id=blocked.id, target_id=me.id))
+    db.session.commit()
+
+    assert _suggested(client, me) == [('two', 2), ('one', 1), ('stranger', 0)]
+    assert _suggested(client, me, limit=1, offset=1) == [('one', 1)]
+
+
+def test_pages_are_cached_until_a_friendship_changes(client):
+    me, friend, other = make_user('me'), make_user('friend'), make_user('other')
+    me_id, friend_id, other_id = me.id, friend.id, other.id
+    _link(me, friend)
+    _link(friend, other, status='pending')
+    assert _suggested(client, me) == [('other', 0)]
+
+    with QueryCounter(db.engine) as qc:
+        assert _suggested(client, me) == [('other', 0)]
+    # one IN query for the profiles of the page
+    assert len(qc.statements) == 1
+
+    # other accepts friend: other becomes a friend of a friend for me
+    resp = client.post(f'/friends/{friend_id}/accept', headers=_auth(db.session.get(User, other_id)))
+    assert resp.status_code == 200
+    assert _suggested(client, me) == [('other', 1)]
+
+    client.post(f'/friends/{other_id}/remove', headers=_auth(db.session.get(User, friend_id)))
+    assert _suggested(client, me) == [('other', 0)]
+    assert friend_suggestions.ranked(me_id) == ((other_id, 0),)
+
+
+def test_two_hop_counts_come_from_one_query(app):
+    me = make_user('me')
+    me_id = me.id
+    friends = [make_user(f'f{i}') for i in range(10)]
+    candidates = [make_user(f'c{i}') for i in range(10)]
+    for i, f in enumerate(friends):
+        _link(me, f)
+        for c in candidates[:i + 1]:
+            _link(c, f)
+    db.session.remove()
+
+    with QueryCounter(db.engine) as qc:
+        ranked = friend_suggestions.ranked(me_id)
+    assert [n for _, n in ranked] == list(range(10, 0, -1))
+    # relations + blocks + mutual counts of every candidate + newest-users filler
+    assert len(qc.statements) == 4
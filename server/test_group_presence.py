@@ -0,0 +1,84 @@
+import pytest
+
+from config.database import db
+from conftest import QueryCounter, make_user
+from models.group_model import Group, GroupMember
+from services import group_presence
+from services.auth_service import create_token_for_user
+from services.presence import registry
+
+
+def _groups_with_members(owner, others, n_groups):
+    groups = [Group(name=f'g{i}', owner_id=owner.id) for i in range(n_groups)]
+    db.session.add_all(groups)
+    db.session.commit()
+    db.session.add_all([GroupMember(group_id=g.id, user_id=owner.id, role='owner') for g in groups])
+    db.session.add_all([GroupMember(group_id=g.id, user_id=u.id) for g in groups for u in others])
+    db.session.commit()
+    return [g.id for g in groups]
+
+
+def _status(gid):
+    return db.session.get(Group, gid).status
+
+
+@pytest.mark.parametrize('n_groups', [3, 40])
+def test_join_cost_does_not_grow_with_groups(app, socketio, n_groups):
+    alice, bob = make_user('alice'), make_user('bob')
+    others = [bob] + [make_user(f'u{i}') for i in range(10)]
+    _groups_with_members(alice, others, n_groups)
+    bob_client = socketio.test_client(app)
+    bob_client.emit('join', {'user_id': bob.id})
+    alice_id = alice.id
+    db.session.remove()
+
+    client = socketio.test_client(app)
+    with QueryCounter(db.engine) as qc:
+        client.emit('join', {'user_id': alice_id})
+    # friends + user + membership ids + one UPDATE for flipped groups + UPDATE user + member lookup for emits
+    assert qc.count <= 6
+    updates = [e['args'][0] for e in bob_client.get_received() if e['name'] == 'group_updated']
+    assert len(updates) == n_groups and all(u['status'] == 'online' for u in updates)
+
+
+def test_group_status_follows_online_counter(app, socketio):
+    alice, bob, carol = make_user('alice'), make_user('bob'), make_user('carol')
+    [gid] = _groups_with_members(alice, [bob], 1)
+
+    a = socketio.test_client(app)
+    a.emit('join', {'user_id': alice.id})
+    assert registry.group_online_count(gid) == 1 and _status(gid) == 'offline'
+    b = socketio.test_client(app)
+    b.emit('join', {'user_id': bob.id})
+    assert registry.group_online_count(gid) == 2 and _status(gid) == 'online'
+
+    # an online user added over REST moves the counter too
+    c = socketio.test_client(app)
+    c.emit('join', {'user_id': carol.id})
+    headers = {'Authorization': f'Bearer {create_token_for_user(alice)}'}
+    app.test_client().post(f'/groups/{gid}/members', json={'user_id': carol.id}, headers=headers)
+    assert registry.group_online_count(gid) == 3
+
+    b.disconnect()
+    c.disconnect()
+    assert registry.group_online_count(gid) == 1
+    db.session.expire_all()
+    assert _status(gid) == 'offline'
+
+
+def test_reconcile_drops_status_left_by_a_previous_run(app):
+    registry.clear()
+    alice, bob = make_user('alice'), make_user('bob')
+    stale, live = _groups_with_members(alice, [bob], 2)
+    # a restart loses the in-memory counters but not Group.status
+    Group.query.update({'status': 'online'})
+    db.session.commit()
+    registry.incr_groups([live], 2)
+
+    group_presence.reconcile()
+    db.session.commit()
+    assert (_status(stale), _status(live)) == ('offline', 'online')
+    # the next join is a real crossing again
+    registry.incr_groups([live], -2)
+    assert group_presence.apply_delta([stale], 2) == {stale: 'online'}
+    registry.clear()
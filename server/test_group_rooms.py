@@ -0,0 +1,57 @@
+from config.database import db
+from conftest import make_user
+from models.group_model import Group, GroupMember
+from services.auth_service import create_token_for_user
+
+
+def _messages(client):
+    return [e['args'][0]['content'] for e in client.get_received() if e['name'] == 'receive_message']
+
+
+def _connect(app, socketio, user):
+    client = socketio.test_client(app)
+    client.emit('join', {'user_id': user.id})
+    client.get_received()
+    return client
+
+
+def test_group_message_is_emitted_once_to_the_group_room(app, socketio, monkeypatch):
+    users = [make_user(f'user{i}') for i in range(5)]
+    outsider = make_user('outsider')
+    g = Group(name='g', owner_id=users[0].id)
+    db.session.add(g)
+    db.session.commit()
+    db.session.add_all([GroupMember(group_id=g.id, user_id=u.id) for u in users])
+    db.session.commit()
+    clients = [_connect(app, socketio, u) for u in users + [outsider]]
+    second_tab = _connect(app, socketio, users[1])
+
+    emitted = []
+    original = socketio.emit
+    monkeypatch.setattr(socketio, 'emit', lambda event, *a, **kw: emitted.append((event, kw.get('room'))) or original(event, *a, **kw))
+    clients[0].emit('send_message', {'sender_id': users[0].id, 'group_id': g.id, 'content': 'hello'})
+
+    assert [room for event, room in emitted if event == 'receive_message'] == [f'group-{g.id}']
+    assert [_messages(c) for c in clients] == [['hello']] * 5 + [[]]
+    assert _messages(second_tab) == ['hello']
+
+
+def test_rest_membership_changes_keep_rooms_in_sync(app, socketio):
+    alice, bob = make_user('alice'), make_user('bob')
+    g = Group(name='g', owner_id=alice.id)
+    db.session.add(g)
+    db.session.commit()
+    db.session.add(GroupMember(group_id=g.id, user_id=alice.id, role='owner'))
+    db.session.commit()
+    a, b = _connect(app, socketio, alice), _connect(app, socketio, bob)
+    headers = {'Authorization': f'Bearer {create_token_for_user(alice)}'}
+    http = app.test_client()
+
+    http.post(f'/groups/{g.id}/members', json={'user_id': bob.id}, headers=headers)
+    a.emit('send_message', {'sender_id': alice.id, 'group_id': g.id, 'content': 'welcome'})
+    assert _messages(b) == ['welcome']
+
+    http.delete(f'/groups/{g.id}/members/{bob.id}', headers=headers)
+    a.emit('send_message', {'sender_id': alice.id, 'group_id': g.id, 'content': 'bye'})
+    assert _messages(b) == []
+    assert _messages(a) == ['welcome', 'bye']
@@ -1,10 +1,17 @@
 import os
+import sys
 import json
 import random
 import string
-from utils.logging_exchange import log_http_exchange, log_socket_event, log_upload, gen_request_id, mask_sensitive
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Ghi log test ra thư mục tạm thay vì server/logs
+os.environ.setdefault('EXCHANGE_LOG_FILE', os.path.join(tempfile.mkdtemp(), 'exchange.log.jsonl'))
+
+from utils.logging_exchange import log_http_exchange, log_socket_event, log_upload, gen_request_id, mask_sensitive, get_writer, ExchangeLogWriter
 from flask import Flask, request, g
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
 
 def random_str(length=8):
@@ -70,13 +77,67 @@ def test_mask_sensitive():
     masked = mask_sensitive(data)
     print('Masked:', masked)
 
+
+def test_writer_appends_json_lines():
+    writer = get_writer()
+    writer.flush()
+    before = writer.stats()['written']
+    test_log_socket()
+    test_log_upload()
+    writer.flush()
+    assert writer.stats()['written'] == before + 2
+    with open(writer.path, 'r', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    assert lines[-1]['event_name'] == 'upload_file'
+    assert lines[-1]['source'] == 'server'
+
+
+def test_writer_rotates_by_size():
+    path = os.path.join(tempfile.mkdtemp(), 'rotate.jsonl')
+    writer = ExchangeLogWriter(path, max_bytes=200, rotate_seconds=0, backup_count=2, flush_interval=0.05)
+    for i in range(20):
+        writer.enqueue({'i': i, 'pad': 'x' * 50})
+        writer.flush()
+    writer.close()
+    assert writer.rotations > 0
+    assert os.path.exists(path + '.1')
+    assert not os.path.exists(path + '.3')
+
+
+def test_writer_rotates_an_old_file_after_restart():
+    path = os.path.join(tempfile.mkdtemp(), 'age.jsonl')
+    # file left by a previous process, first entry two hours old
+    with open(path, 'w', encoding='utf-8') as f:
+        old = (datetime.utcnow() - timedelta(hours=2)).isoformat()
+        f.write(json.dumps({'time': old}) + '\n')
+    writer = ExchangeLogWriter(path, max_bytes=0, rotate_seconds=3600, backup_count=1, flush_interval=0.05)
+    writer.enqueue({'i': 1})
+    writer.flush()
+    writer.close()
+    assert writer.rotations == 1
+    with open(path + '.1', encoding='utf-8') as f:
+        assert json.loads(f.readline())['time'] == old
+
+
+def test_writer_counts_dropped_entries():
+    path = os.path.join(tempfile.mkdtemp(), 'drop.jsonl')
+    writer = ExchangeLogWriter(path, queue_size=1, flush_interval=0.05)
+    writer.start()
+    # chiếm lock ghi file để thread ghi bị chặn, hàng đợi đầy nhanh
+    with writer._lock:
+        results = [writer.enqueue({'i': i}) for i in range(50)]
+    writer.close()
+    assert results.count(False) == writer.dropped
+    assert writer.dropped > 0
+
 if __name__ == '__main__':
     test_log_http()
     test_log_socket()
     test_log_upload()
     test_mask_sensitive()
     # Hiển thị nội dung log
-    log_path = 'server/logs/exchange.log.jsonl'
+    get_writer().flush()
+    log_path = get_writer().path
     if os.path.exists(log_path):
         with open(log_path, 'r', encoding='utf-8') as f:
             print('\n--- Log file content ---')
@@ -0,0 +1,132 @@
+import pytest
+
+from config.database import db
+from conftest import QueryCounter, make_user
+from models.group_model import Group, GroupMember
+from models.message_model import Message
+from services import reactions
+from services.auth_service import create_token_for_user
+
+
+def test_direct_history_pages_newest_first(app):
+    alice, bob, carol = make_user('alice'), make_user('bob'), make_user('carol')
+    for i in range(25):
+        s, r = (alice, bob) if i % 2 == 0 else (bob, alice)
+        db.session.add(Message(sender_id=s.id, receiver_id=r.id, content=f'm{i}'))
+    db.session.add(Message(sender_id=alice.id, receiver_id=carol.id, content='other'))
+    db.session.commit()
+    client = app.test_client()
+
+    resp = client.get(f'/messages?sender_id={alice.id}&receiver_id={bob.id}&limit=10')
+    page = resp.get_json()
+    assert [m['content'] for m in page] == [f'm{i}' for i in range(15, 25)]
+    assert resp.headers['X-Has-More'] == 'true'
+
+    before = resp.headers['X-Next-Before-Id']
+    resp = client.get(f'/messages?sender_id={alice.id}&receiver_id={bob.id}&limit=10&before_id={before}')
+    assert [m['content'] for m in resp.get_json()] == [f'm{i}' for i in range(5, 15)]
+
+    before = resp.headers['X-Next-Before-Id']
+    resp = client.get(f'/messages?sender_id={alice.id}&receiver_id={bob.id}&limit=10&before_id={before}')
+    assert [m['content'] for m in resp.get_json()] == [f'm{i}' for i in range(0, 5)]
+    assert resp.headers['X-Has-More'] == 'false'
+
+    first_id = page[0]['id']
+    resp = client.get(f'/messages?sender_id={bob.id}&receiver_id={alice.id}&after_id={first_id}&limit=3')
+    assert [m['content'] for m in resp.get_json()] == ['m16', 'm17', 'm18']
+    assert resp.headers['X-Has-More'] == 'true'
+
+
+def test_direct_history_skips_group_messages(app):
+    alice, bob = make_user('alice'), make_user('bob')
+    g = Group(name='g', owner_id=bob.id)
+    db.session.add(g)
+    db.session.commit()
+    # group messages are stored with receiver_id = group owner
+    db.session.add(Message(sender_id=alice.id, receiver_id=bob.id, group_id=g.id, content='in group'))
+    db.session.add(Message(sender_id=alice.id, receiver_id=bob.id, content='direct'))
+    db.session.commit()
+
+    resp = app.test_client().get(f'/messages?sender_id={alice.id}&receiver_id={bob.id}')
+    assert [m['content'] for m in resp.get_json()] == ['direct']
+
+
+def test_history_rejects_bad_cursor(app):
+    client = app.test_client()
+    assert client.get('/messages?sender_id=1&receiver_id=2&before_id=abc').status_code == 400
+    assert client.get('/messages?sender_id=1&receiver_id=2&before_id=5&after_id=1').status_code == 400
+
+
+def test_group_history_is_paginated(app):
+    alice, bob = make_user('alice'), make_user('bob')
+    g = Group(name='g', owner_id=alice.id)
+    db.session.add(g)
+    db.session.commit()
+    db.session.add_all([GroupMember(group_id=g.id, user_id=alice.id, role='owner'),
+                        GroupMember(group_id=g.id, user_id=bob.id)])
+    for i in range(7):
+        db.session.add(Message(sender_id=bob.id, receiver_id=alice.id, group_id=g.id, content=f'g{i}'))
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {create_token_for_user(alice)}'}
+    client = app.test_client()
+
+    resp = client.get(f'/groups/{g.id}/messages?limit=4', headers=headers)
+    assert [m['content'] for m in resp.get_json()] == ['g3', 'g4', 'g5', 'g6']
+    assert resp.headers['X-Has-More'] == 'true'
+    resp = client.get(f'/groups/{g.id}/messages?limit=4&before_id={resp.headers["X-Next-Before-Id"]}', headers=headers)
+    assert [m['content'] for m in resp.get_json()] == ['g0', 'g1', 'g2']
+    assert resp.headers['X-Has-More'] == 'false'
+
+
+def _seed_conversation(users, group, n):
+    for i in range(n):
+        sender = users[i % len(users)]
+        receiver = users[1] if sender is users[0] else users[0]
+        db.session.add(Message(sender_id=sender.id, receiver_id=receiver.id, group_id=group.id if group else None, content=f'x{i}'))
+    db.session.commit()
+    # every other message gets reactions so hydration cost can be compared
+    for m in Message.query.all()[::2]:
+        for u in users:
+            reactions.add(m.id, u.id, '👍')
+        reactions.add(m.id, users[0].id, '❤️')
+    db.session.commit()
+    # Drop the identity map so sender lookups really hit the database
+    db.session.remove()
+
+
+@pytest.mark.parametrize('n_messages', [5, 60])
+def test_group_history_query_count_is_fixed(app, n_messages):
+    users = [make_user(f'user{i}') for i in range(6)]
+    g = Group(name='g', owner_id=users[0].id)
+    db.session.add(g)
+    db.session.commit()
+    db.session.add_all([GroupMember(group_id=g.id, user_id=u.id) for u in users])
+    db.session.commit()
+    gid, token = g.id, create_token_for_user(users[0])
+    _seed_conversation(users, g, n_messages)
+
+    with QueryCounter(db.engine) as qc:
+        resp = app.test_client().get(f'/groups/{gid}/messages?limit=50', headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 200
+    assert len(resp.get_json()) == min(n_messages, 50)
+    assert all(m['sender_username'] for m in resp.get_json())
+    assert all(m['reactions'] == ({'👍': 6, '❤️': 1} if m['id'] % 2 else {}) for m in resp.get_json())
+    assert all(m['my_reactions'] == (['👍', '❤️'] if m['id'] % 2 else []) for m in resp.get_json())
+    # group lookup + membership check + page + one batched sender query
+    # + reaction summaries + the viewer's own reactions + mark-read update
+    assert qc.count == 7
+
+
+@pytest.mark.parametrize('n_messages', [5, 60])
+def test_direct_history_query_count_is_fixed(app, n_messages):
+    alice, bob = make_user('alice'), make_user('bob')
+    a, b = alice.id, bob.id
+    _seed_conversation([alice, bob], None, n_messages)
+
+    with QueryCounter(db.engine) as qc:
+        resp = app.test_client().get(f'/messages?sender_id={a}&receiver_id={b}&limit=50')
+    assert len(resp.get_json()) == min(n_messages, 50)
+    assert all(m['reactions'] == ({'👍': 2, '❤️': 1} if m['id'] % 2 else {}) for m in resp.get_json())
+    assert all(m['my_reactions'] == [] for m in resp.get_json())
+    # one range scan per direction + one batched sender query + one reaction summary query
+    assert qc.count == 4
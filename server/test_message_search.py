@@ -0,0 +1,100 @@
+from config.database import db
+from conftest import make_user
+from models.group_model import Group, GroupMember
+from models.message_model import Message
+from services import message_search
+from services.auth_service import create_token_for_user
+
+
+def _send(sender, receiver, content, group=None):
+    m = Message(sender_id=sender.id, receiver_id=receiver.id, group_id=group.id if group else None, content=content)
+    db.session.add(m)
+    db.session.commit()
+    return m.id
+
+
+def _search(app, user, query=None, **params):
+    params = {'q': query, **params} if query is not None else params
+    return app.test_client().get('/messages/search', query_string=params,
+                                 headers={'Authorization': f'Bearer {create_token_for_user(user)}'})
+
+
+def _ids(resp):
+    assert resp.status_code == 200, resp.get_json()
+    return [m['id'] for m in resp.get_json()]
+
+
+def test_search_is_accent_insensitive(app):
+    alice, bob = make_user('alice'), make_user('bob')
+    hanoi = _send(alice, bob, 'Đường đi Hà Nội rất đẹp')
+    viet = _send(bob, alice, 'Tiếng Việt có dấu')
+    _send(alice, bob, 'xin chào')
+
+    assert _ids(_search(app, alice, 'duong ha noi')) == [hanoi]
+    assert _ids(_search(app, alice, 'ĐẸP')) == [hanoi]
+    assert _ids(_search(app, alice, 'tiếng viet')) == [viet]
+    # the last word matches as a prefix
+    assert _ids(_search(app, bob, 'tieng vi')) == [viet]
+    # FTS syntax typed by users is searched as plain words
+    assert _ids(_search(app, alice, 'chao" OR *')) == []
+    assert message_search.fold('Đường Hà Nội') == 'duong ha noi'
+
+
+def test_index_follows_edit_and_recall(app):
+    alice, bob = make_user('alice'), make_user('bob')
+    mid = _send(alice, bob, 'hẹn gặp lúc 5 giờ')
+    assert _ids(_search(app, bob, 'gap')) == [mid]
+
+    db.session.get(Message, mid).content = 'đổi sang 6 giờ'
+    db.session.commit()
+    assert _ids(_search(app, bob, 'gap')) == []
+    assert _ids(_search(app, bob, 'doi sang')) == [mid]
+
+    db.session.delete(db.session.get(Message, mid))
+    db.session.commit()
+    assert _ids(_search(app, bob, 'doi')) == []
+
+
+def test_search_is_scoped_to_the_callers_conversations(app):
+    alice, bob, carol = make_user('alice'), make_user('bob'), make_user('carol')
+    g = Group(name='g', owner_id=alice.id)
+    db.session.add(g)
+    db.session.commit()
+    db.session.add_all([GroupMember(group_id=g.id, user_id=u.id) for u in (alice, bob)])
+    db.session.commit()
+    direct = _send(alice, bob, 'bí mật')
+    group = _send(alice, bob, 'bí mật của nhóm', group=g)
+    other = _send(carol, bob, 'bí mật khác')
+
+    assert sorted(_ids(_search(app, alice, 'bi mat'))) == [direct, group]
+    assert sorted(_ids(_search(app, bob, 'bi mat'))) == [direct, group, other]
+    assert _ids(_search(app, carol, 'bi mat')) == [other]
+    assert _ids(_search(app, bob, 'bi mat', peer_id=carol.id)) == [other]
+    assert _ids(_search(app, bob, 'bi mat', group_id=g.id)) == [group]
+    # not a member: nothing, even when asking for the group explicitly
+    assert _ids(_search(app, carol, 'bi mat', group_id=g.id)) == []
+
+
+def test_search_ranks_and_paginates(app):
+    alice, bob = make_user('alice'), make_user('bob')
+    weak = _send(alice, bob, 'cà phê sáng nay ở quán quen gần công ty mới mở')
+    strong = _send(alice, bob, 'cà phê cà phê cà phê')
+    for i in range(5):
+        _send(bob, alice, f'ca phe {i} ly nữa đi mà, hôm nay trời lạnh quá')
+
+    first = _search(app, alice, 'ca phe', limit=4)
+    assert _ids(first)[0] == strong
+    assert first.headers['X-Has-More'] == 'true'
+    rest = _search(app, alice, 'ca phe', limit=4, offset=first.headers['X-Next-Offset'])
+    assert rest.headers['X-Has-More'] == 'false'
+    everything = _ids(first) + _ids(rest)
+    assert len(everything) == len(set(everything)) == 7
+    assert weak in everything
+
+
+def test_search_requires_auth_and_query(app):
+    alice = make_user('alice')
+    assert app.test_client().get('/messages/search?q=x').status_code == 401
+    assert _search(app, alice).status_code == 400
+    assert _search(app, alice, '  !? ').status_code == 400
+    assert _search(app, alice, 'x', peer_id=1, group_id=1).status_code == 400
@@ -0,0 +1,122 @@
+import os
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from config.database import db
+from conftest import make_user
+from models.conversation_summary_model import ConversationSummary
+from models.message_model import Message
+from services.message_writer import IdAllocator, writer
+
+
+@pytest.fixture
+def write_behind(app, tmp_path):
+    writer.configure(batch_size=2, flush_ms=10, durability='flush', journal_dir=str(tmp_path / 'journal'))
+    writer.enable()
+    yield writer
+    writer.disable()
+
+
+def _acks(client):
+    return [e['args'][0] for e in client.get_received() if e['name'] == 'message_sent_ack']
+
+
+def test_send_is_acked_before_commit_and_batched(app, socketio, write_behind):
+    alice, bob = make_user('alice'), make_user('bob')
+    a, b = alice.id, bob.id
+    client = socketio.test_client(app)
+    for i in range(3):
+        client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': f'm{i}', 'client_message_id': f'c{i}'})
+
+    acks = _acks(client)
+    assert [ack['status'] for ack in acks] == ['sent'] * 3
+    ids = [ack['message_id'] for ack in acks]
+    assert ids == sorted(set(ids))
+    assert Message.query.count() == 0 and writer.pending() == 3
+
+    batches = writer.batches
+    assert writer.flush() == 3
+    assert writer.batches - batches == 2  # batch_size=2
+    assert [m.id for m in Message.query.order_by(Message.id)] == ids
+    summary = ConversationSummary.query.filter_by(user_id=b, kind='user', target_id=a).one()
+    assert summary.last_message_id == ids[-1] and summary.unread_count == 3
+    assert writer.pending() == 0
+
+
+def test_reads_flush_pending_messages(app, socketio, write_behind):
+    alice, bob = make_user('alice'), make_user('bob')
+    a, b = alice.id, bob.id
+    client = socketio.test_client(app)
+    client.emit('send_message', {'sender_id': a, 'receiver_id': b, 'content': 'hi', 'client_message_id': 'c1'})
+    mid = _acks(client)[0]['message_id']
+
+    client.emit('edit_message', {'message_id': mid, 'user_id': a, 'new_content': 'hello'})
+    assert db.session.get(Message, mid).content == 'hello'
+
+
+def test_sync_inserts_use_the_allocator(app, write_behind):
+    alice, bob = make_user('alice'), make_user('bob')
+    queued = writer.submit(Message(sender_id=alice.id, receiver_id=bob.id, content='queued'))
+    direct = Message(sender_id=alice.id, receiver_id=bob.id, content='direct')
+    db.session.add(direct)
+    db.session.commit()
+    assert direct.id == queued.id + 1
+    writer.flush()
+    assert Message.query.count() == 2
+
+
+def test_recover_replays_acked_but_uncommitted(app, tmp_path, write_behind):
+    alice, bob = make_user('alice'), make_user('bob')
+    first = writer.submit(Message(sender_id=alice.id, receiver_id=bob.id, content='committed'))
+    writer.flush()
+    lost = writer.submit(Message(sender_id=alice.id, receiver_id=bob.id, content='lost in crash'))
+    writer.disable()  # crash: pending batch is gone, journal is not
+
+    writer.configure(batch_size=2, flush_ms=10, durability='flush', journal_dir=str(tmp_path / 'journal'))
+    assert writer.recover() == 1
+    assert writer.recover() == 0
+    assert [m.content for m in Message.query.order_by(Message.id)] == ['committed', 'lost in crash']
+    assert db.session.get(Message, lost.id) is not None and first.id < lost.id
+
+
+def test_transient_commit_error_keeps_the_message_and_its_journal(app, monkeypatch, write_behind):
+    alice, bob = make_user('alice'), make_user('bob')
+    writer.journal.segment_bytes = 1  # one record per segment
+    msg = writer.submit(Message(sender_id=alice.id, receiver_id=bob.id, content='acked'))
+    [segment] = writer.journal.segments()
+
+    real_commit = db.session.commit
+    calls = []
+
+    def locked_once():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OperationalError('COMMIT', {}, Exception('database is locked'))
+        return real_commit()
+
+    monkeypatch.setattr(db.session, 'commit', locked_once)
+    dropped = writer.dropped
+    assert writer.flush() == 0
+    assert writer.dropped == dropped and writer.pending() == 1
+    assert not writer.due()  # backing off
+    later = writer.submit(Message(sender_id=alice.id, receiver_id=bob.id, content='later'))
+    assert os.path.exists(segment)
+    assert [r['id'] for r in writer.journal.read_all()] == [msg.id, later.id]
+
+    assert writer.flush() == 2
+    assert [m.content for m in Message.query.order_by(Message.id)] == ['acked', 'later']
+    assert not os.path.exists(segment) and writer.pending() == 0
+    writer.ensure_persisted(msg.id)  # nothing pending any more
+
+
+def test_write_behind_is_refused_in_multi_node_mode(app):
+    from services import message_writer
+    app.config.update(MULTI_NODE=True, MESSAGE_WRITE_BEHIND=True)
+    assert message_writer.init_app(app, socketio=None) is False
+    assert not writer.enabled
+
+
+def test_id_allocator_starts_after_last_id():
+    alloc = IdAllocator(41)
+    assert [alloc.next(), alloc.next()] == [42, 43]
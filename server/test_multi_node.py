@@ -0,0 +1,74 @@
+import time
+
+import pytest
+from flask import Flask
+from flask_socketio import SocketIO
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from services import redis_client
+from services.auth_service import create_token_for_user, decode_token, logout_user
+from services.presence import PresenceRegistry, RedisPresenceStore
+
+
+@pytest.fixture
+def redis_server():
+    yield fakeredis.FakeServer()
+    redis_client.reset()
+
+
+def test_presence_is_shared_between_nodes(redis_server):
+    node_a = PresenceRegistry(RedisPresenceStore(fakeredis.FakeRedis(server=redis_server), 'a'),
+                              friend_loader=lambda uid: frozenset({2}))
+    node_b = PresenceRegistry(RedisPresenceStore(fakeredis.FakeRedis(server=redis_server), 'b'),
+                              friend_loader=lambda uid: frozenset())
+
+    assert node_a.add(1, 'sid-a') is True
+    assert node_b.add('1', 'sid-b') is False
+    assert node_b.sids_for(1) == {'sid-a', 'sid-b'}
+    assert node_a.friend_ids(1) == {2}
+    # node b reads the cache filled by node a
+    assert node_b.friend_ids(1) == {2}
+
+    assert node_a.remove('sid-a') == (1, False)
+    assert node_a.is_online(1)
+    # node b restarts: its leftover sids are purged and the user goes offline
+    assert node_b.store.purge_node() == [1]
+    assert not node_a.is_online(1)
+    assert node_a.online_user_ids() == set()
+
+
+def test_logout_is_visible_on_every_node(app, redis_server):
+    from conftest import make_user
+    app.config.update(MULTI_NODE=True, REDIS_URL='redis://shared')
+    redis_client.set_client(fakeredis.FakeRedis(server=redis_server), 'redis://shared')
+    token = create_token_for_user(make_user('alice'))
+    assert decode_token(token)
+
+    logout_user(token)
+    assert decode_token(token) is None
+    other_node = fakeredis.FakeRedis(server=redis_server)
+    [key] = other_node.keys('blacklist:*')
+    assert 0 < other_node.ttl(key) <= 24 * 3600 + 1
+
+
+def test_emits_are_published_to_the_message_queue(redis_server, monkeypatch):
+    import json
+    import redis
+    monkeypatch.setattr(redis.Redis, 'from_url', classmethod(lambda cls, url, **kw: fakeredis.FakeRedis(server=redis_server)))
+    # Flask-SocketIO's test client refuses message queues, so listen on the channel
+    # the other workers subscribe to instead.
+    listener = fakeredis.FakeRedis(server=redis_server).pubsub(ignore_subscribe_messages=True)
+    listener.subscribe('flask-socketio')
+
+    node = Flask(__name__)
+    sio = SocketIO(node, async_mode='threading', message_queue='redis://queue')
+    sio.emit('receive_message', {'content': 'hi'}, room='user-7')
+
+    deadline = time.time() + 5
+    msg = None
+    while msg is None and time.time() < deadline:
+        msg = listener.get_message(timeout=0.1)
+    data = json.loads(msg['data'])
+    assert (data['method'], data['event'], data['room'], data['data']) == ('emit', 'receive_message', 'user-7', [{'content': 'hi'}])
+
@@ -0,0 +1,70 @@
+import contextvars
+import threading
+
+import pytest
+
+from services import offload
+
+
+class FakeSocketIO:
+    async_mode = 'gevent'
+    server_options = {}
+
+    def __init__(self):
+        self.handlers = {}
+        self.emitted = []
+
+    def emit(self, event, data=None, **kwargs):
+        self.emitted.append((event, data, threading.get_ident()))
+
+    def on(self, message, namespace=None):
+        def register(handler):
+            self.handlers[message] = handler
+            return handler
+        return register
+
+
+@pytest.fixture
+def gevent_offload():
+    pytest.importorskip('gevent')
+    yield
+    offload._state.update(pool=None, hub=None)
+
+
+def test_install_is_noop_outside_gevent(socketio):
+    assert offload.install(socketio) is False
+    assert not offload.active()
+    assert offload.run_blocking(lambda x: x + 1, 1) == 2
+
+
+def test_handlers_run_in_pool_and_emit_on_hub(gevent_offload):
+    import gevent
+    request_id = contextvars.ContextVar('request_id')
+    sio = FakeSocketIO()
+    assert offload.install(sio, pool_size=2)
+    hub_thread = offload.native_thread_id()
+
+    @sio.on('ping')
+    def on_ping(data):
+        sio.emit('pong', (data, request_id.get()))
+        return offload.native_thread_id()
+
+    request_id.set('r1')
+    worker_thread = sio.handlers['ping']('hi')
+    gevent.sleep(0.05)  # let the hub run the marshalled emit
+
+    assert worker_thread != hub_thread
+    assert sio.emitted == [('pong', ('hi', 'r1'), hub_thread)]
+
+
+def test_blocking_rejects_wrong_arity_before_offloading(gevent_offload):
+    sio = FakeSocketIO()
+    offload.install(sio)
+
+    @sio.on('connect')
+    def on_connect():
+        return 'ok'
+
+    with pytest.raises(TypeError):
+        sio.handlers['connect']({'token': 'x'})
+    assert sio.handlers['connect']() == 'ok'
@@ -0,0 +1,47 @@
+from config.database import db
+from conftest import make_user
+from models.friend_model import Friend
+from services.presence import PresenceRegistry, registry
+
+
+def test_registry_tracks_multiple_sids_per_user():
+    calls = []
+    reg = PresenceRegistry(friend_loader=lambda uid: calls.append(uid) or frozenset({99}))
+    assert reg.add('1', 'sid-a') is True
+    assert reg.add(1, 'sid-b') is False
+    assert reg.sids_for(1) == {'sid-a', 'sid-b'}
+    assert reg.friend_ids(1) == {99} and reg.friend_ids(1) == {99}
+    assert calls == [1]
+
+    assert reg.remove('sid-a') == (1, False)
+    assert reg.is_online(1)
+    assert reg.remove('sid-b') == (1, True)
+    assert not reg.is_online(1)
+    assert reg.remove('sid-b') == (None, False)
+    # cache is dropped once the user is offline
+    reg.friend_ids(1)
+    assert calls == [1, 1]
+
+
+def test_second_tab_keeps_user_online(app, socketio):
+    alice, bob = make_user('alice'), make_user('bob')
+    db.session.add(Friend(user_id=alice.id, friend_id=bob.id, status='accepted'))
+    db.session.commit()
+
+    bob_client = socketio.test_client(app)
+    bob_client.emit('join', {'user_id': bob.id})
+    tab1 = socketio.test_client(app)
+    tab2 = socketio.test_client(app)
+    tab1.emit('join', {'user_id': alice.id})
+    tab2.emit('join', {'user_id': str(alice.id)})
+    joined = [e for e in bob_client.get_received() if e['name'] == 'user_joined' and e['args'][0]['user_id'] != bob.id]
+    assert len(joined) == 1
+
+    tab1.disconnect()
+    assert registry.is_online(alice.id)
+    assert not [e for e in bob_client.get_received() if e['name'] == 'user_offline' and 'user_id' in e['args'][0]]
+
+    tab2.disconnect()
+    assert not registry.is_online(alice.id)
+    offline = [e['args'][0] for e in bob_client.get_received() if e['name'] == 'user_offline' and 'user_id' in e['args'][0]]
+    assert offline == [{'user_id': alice.id}]
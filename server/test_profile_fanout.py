@@ -0,0 +1,74 @@
+from config.database import db
+from conftest import make_user
+from models.friend_model import Friend
+from models.group_model import Group, GroupMember
+from services import profile_fanout
+from services.auth_service import create_token_for_user
+from services.profile_fanout import ProfileFanout
+
+
+def _updates(client):
+    return [e['args'][0] for e in client.get_received() if e['name'] == 'contact_updated']
+
+
+def _connect(app, socketio, user):
+    client = socketio.test_client(app)
+    client.emit('join', {'user_id': user.id})
+    client.get_received()
+    return client
+
+
+def test_profile_update_reaches_friends_and_groups_only(app, socketio):
+    from routes.users import users_bp
+    app.register_blueprint(users_bp)
+    alice, bob, carol, dave = (make_user(n) for n in ('alice', 'bob', 'carol', 'dave'))
+    db.session.add(Friend(user_id=alice.id, friend_id=bob.id, status='accepted'))
+    group = Group(name='g', owner_id=alice.id)
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([GroupMember(group_id=group.id, user_id=alice.id, role='owner'),
+                        GroupMember(group_id=group.id, user_id=carol.id, role='member')])
+    db.session.commit()
+    clients = {u.username: _connect(app, socketio, u) for u in (alice, bob, carol, dave)}
+
+    headers = {'Authorization': f'Bearer {create_token_for_user(alice)}'}
+    assert app.test_client().patch('/users/me', json={'display_name': 'Al'}, headers=headers).status_code == 200
+
+    for name in ('alice', 'bob', 'carol'):
+        [update] = _updates(clients[name])
+        assert update['event'] == 'PROFILE_UPDATED'
+        assert (update['data']['id'], update['data']['display_name']) == (alice.id, 'Al')
+    assert _updates(clients['dave']) == []
+
+
+def test_rapid_edits_are_coalesced(app, socketio, monkeypatch):
+    alice, bob = make_user('alice'), make_user('bob')
+    db.session.add(Friend(user_id=alice.id, friend_id=bob.id, status='accepted'))
+    db.session.commit()
+    watcher = _connect(app, socketio, bob)
+    now = [0.0]
+    fanout = ProfileFanout(delay=0.25, clock=lambda: now[0])
+    monkeypatch.setattr(profile_fanout, 'fanout', fanout)
+
+    for name in ('A', 'Al', 'Alice'):
+        alice.display_name = name
+        fanout.publish(alice, socketio)
+    assert fanout.flush(socketio) == 0 and _updates(watcher) == []
+    now[0] = 0.3
+    assert fanout.flush(socketio) == 1
+    assert [u['data']['display_name'] for u in _updates(watcher)] == ['Alice']
+    assert fanout.stats() == {'published': 3, 'emitted': 1, 'pending': 0}
+
+
+def test_rebroadcast_sends_batches(app, socketio, monkeypatch):
+    from routes.users import users_bp
+    app.register_blueprint(users_bp)
+    users = [make_user(f'user{i}') for i in range(5)]
+    watcher = _connect(app, socketio, users[0])
+    monkeypatch.setattr(profile_fanout, 'REBROADCAST_BATCH', 2)
+
+    response = app.test_client().post('/users/admin/rebroadcast_profiles')
+    assert response.json == {'ok': True, 'count': 5, 'emits': 3}
+    batches = _updates(watcher)
+    assert [b['event'] for b in batches] == ['PROFILES_UPDATED'] * 3
+    assert [p['id'] for b in batches for p in b['data']] == [u.id for u in users]
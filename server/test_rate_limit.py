@@ -0,0 +1,108 @@
+import pytest
+
+from conftest import make_user
+from models.message_model import Message
+from services import rate_limit, redis_client
+from services.rate_limit import LocalBuckets, Policy
+
+
+def test_local_bucket_allows_burst_then_refills():
+    now = [0.0]
+    buckets = LocalBuckets(clock=lambda: now[0])
+    policy = Policy(3, 3)  # 3 tokens, one per second
+    assert [buckets.take('k', policy) for _ in range(4)] == [0, 0, 0, 1.0]
+    now[0] = 0.5
+    assert buckets.take('k', policy) == pytest.approx(0.5)
+    now[0] = 1.0
+    assert buckets.take('k', policy) == 0
+    assert buckets.take('other', policy) == 0
+
+
+def test_socket_flood_is_rejected_before_the_handler(app, socketio):
+    app.config['RATE_LIMIT_POLICIES'] = {'send_message': (3, 60)}
+    alice, bob = make_user('alice'), make_user('bob')
+    client = socketio.test_client(app)
+    client.emit('join', {'user_id': alice.id})
+    for i in range(5):
+        client.emit('send_message', {'sender_id': alice.id, 'receiver_id': bob.id,
+                                     'content': f'm{i}', 'client_message_id': f'c{i}'})
+
+    assert Message.query.count() == 3
+    received = client.get_received()
+    acks = [e['args'][0]['status'] for e in received if e['name'] == 'message_sent_ack']
+    assert acks == ['sent'] * 3 + ['rate_limited'] * 2
+    [limited, _] = [e['args'][0] for e in received if e['name'] == 'rate_limited']
+    assert limited['event'] == 'send_message' and limited['retry_after'] > 0
+    assert rate_limit.limiter.stats() == {'send_message': 2}
+
+
+def test_http_policy_per_key_and_user_override(app):
+    from routes.auth.login import auth_login_bp
+    app.register_blueprint(auth_login_bp)
+    app.config['RATE_LIMIT_POLICIES'] = {'login': (2, 60)}
+    make_user('alice')
+    client = app.test_client()
+
+    codes = [client.post('/login', json={'username': 'alice', 'password': 'bad'}).status_code for _ in range(3)]
+    assert codes == [401, 401, 429]
+    response = client.post('/login', json={'username': 'alice', 'password': 'bad'})
+    assert response.headers['Retry-After'] == '30'
+    # another account has its own bucket
+    assert client.post('/login', json={'username': 'bob', 'password': 'bad'}).status_code == 401
+    # and so does the same account from another address: nobody can lock alice out
+    other_ip = {'REMOTE_ADDR': '10.0.0.2'}
+    assert client.post('/login', json={'username': 'alice', 'password': 'bad'},
+                       environ_base=other_ip).status_code == 401
+
+    app.config['RATE_LIMIT_USER_POLICIES'] = {7: {'login': (100, 1)}}
+    with app.test_request_context():
+        assert rate_limit.limiter.policy_for('login', 7) == Policy(100, 1)
+        assert rate_limit.limiter.policy_for('login', 8) == Policy(2, 60)
+
+
+def test_otp_sends_are_per_caller_and_verify_has_its_own_budget(app, monkeypatch):
+    from routes.auth import forgot_password
+    app.register_blueprint(forgot_password.auth_forgot_bp)
+    app.config['RATE_LIMIT_POLICIES'] = {'otp_send': (2, 300), 'otp_verify': (3, 300)}
+    monkeypatch.setattr(forgot_password, 'send_otp', lambda contact, method=None: {'success': True})
+    client = app.test_client()
+    victim = {'contact': 'victim@example.com'}
+
+    def send(ip):
+        return client.post('/forgot-password', json=victim, environ_base={'REMOTE_ADDR': ip}).status_code
+
+    assert [send('6.6.6.6') for _ in range(3)] == [200, 200, 429]
+    # the victim's own address still gets codes and can still verify them
+    assert send('10.0.0.2') == 200
+    verify = [client.post('/forgot-password/verify', json=dict(victim, otp='000000')).status_code
+              for _ in range(4)]
+    assert verify == [400, 400, 400, 429]
+
+
+class _Down:
+    def __getattr__(self, name):
+        from redis.exceptions import ConnectionError
+        def command(*args, **kwargs):
+            raise ConnectionError('down')
+        return command
+
+
+def test_buckets_stay_local_while_redis_is_down(app):
+    app.config.update(RATE_LIMIT_STORE='redis', REDIS_URL='redis://down')
+    redis_client.set_client(_Down(), 'redis://down')
+    try:
+        with app.test_request_context():
+            policy = Policy(2, 60)
+            assert [rate_limit.limiter.take('rate:t:x', policy) > 0 for _ in range(3)] == [False, False, True]
+    finally:
+        redis_client.reset()
+
+
+def test_redis_bucket_script(app):
+    pytest.importorskip('lupa')
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeRedis()
+    policy = Policy(2, 60)
+    assert [rate_limit._redis_take(server, 'rate:t:y', policy, 1) for _ in range(2)] == [0, 0]
+    assert rate_limit._redis_take(server, 'rate:t:y', policy, 1) == pytest.approx(30, abs=0.1)
+    assert 0 < server.pttl('rate:t:y') <= 61000
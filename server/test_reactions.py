@@ -0,0 +1,63 @@
+from config.database import db
+from conftest import make_user, QueryCounter
+from models.message_model import Message
+from models.message_reaction_model import MessageReaction, MessageReactionCount
+from services import reactions
+
+
+def _message(sender, receiver):
+    msg = Message(sender_id=sender.id, receiver_id=receiver.id, content='hi')
+    db.session.add(msg)
+    db.session.commit()
+    return msg
+
+
+def _deltas(client):
+    return [e['args'][0] for e in client.get_received() if e['name'] == 'message_reaction']
+
+
+def test_reaction_events_carry_only_the_delta(app, socketio):
+    alice, bob = make_user('alice'), make_user('bob')
+    msg = _message(alice, bob)
+    a, b, mid = alice.id, bob.id, msg.id
+    sender, receiver = socketio.test_client(app), socketio.test_client(app)
+    sender.emit('join', {'user_id': a})
+    receiver.emit('join', {'user_id': b})
+    sender.get_received(), receiver.get_received()
+
+    sender.emit('add_reaction', {'message_id': mid, 'user_id': a, 'reaction': '❤️'})
+    sender.emit('add_reaction', {'message_id': mid, 'user_id': a, 'reaction': '❤️'})  # duplicate
+    receiver.emit('add_reaction', {'message_id': mid, 'user_id': b, 'reaction': '❤️'})
+    receiver.emit('remove_reaction', {'message_id': mid, 'user_id': b, 'reaction': '❤️'})
+    receiver.emit('remove_reaction', {'message_id': mid, 'user_id': b, 'reaction': '❤️'})  # already gone
+
+    expected = [(a, 1, 1), (b, 1, 2), (b, -1, 1)]
+    for client in (sender, receiver):
+        events = _deltas(client)
+        assert [(e['user_id'], e['delta'], e['count']) for e in events] == expected
+        assert all(e['emoji'] == '❤️' and set(e) == {'message_id', 'user_id', 'emoji', 'reaction', 'delta', 'count'}
+                   for e in events)
+    assert MessageReaction.query.count() == 1
+    assert reactions.counts_for([mid]) == {mid: {'❤️': 1}}
+
+
+def test_counts_stay_consistent_with_rows(app):
+    alice, bob = make_user('alice'), make_user('bob')
+    a, b = alice.id, bob.id
+    first, second = _message(alice, bob).id, _message(bob, alice).id
+    for mid in (first, second):
+        for uid in (a, b):
+            reactions.add(mid, uid, '👍')
+        reactions.add(mid, a, '😂')
+    db.session.commit()
+    with QueryCounter(db.engine) as qc:
+        counts = reactions.counts_for([first, second])
+    assert len(qc.statements) == 1
+    assert counts == {first: {'👍': 2, '😂': 1}, second: {'👍': 2, '😂': 1}}
+
+    reactions.forget_user(b)
+    reactions.forget_message(second)
+    db.session.commit()
+    assert reactions.counts_for([first, second]) == {first: {'👍': 1, '😂': 1}}
+    assert MessageReactionCount.query.count() == 2
+    assert MessageReaction.query.filter_by(user_id=b).count() == 0
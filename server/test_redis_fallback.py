@@ -0,0 +1,69 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from conftest import make_user
+from services import otp_service, redis_client
+
+URL = 'redis://test'
+
+
+class DownRedis:
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.calls += 1
+            raise RedisConnectionError('connection refused')
+        return command
+
+
+@pytest.fixture
+def redis_app(app):
+    app.config.update(REDIS_URL=URL, OTP_EXPIRE_SECONDS=300)
+    otp_service.otp_storage.clear()
+    yield app
+    redis_client.reset()
+
+
+def test_circuit_opens_and_probes_before_closing(redis_app):
+    down = DownRedis()
+    redis_client.set_client(down, URL)
+    now = [0.0]
+    redis_client._breakers[URL] = redis_client.CircuitBreaker(failure_threshold=2, retry_after=10, clock=lambda: now[0])
+
+    for _ in range(5):
+        assert redis_client.call(lambda r: r.get('k'), lambda: 'local') == 'local'
+    # two failures opened the circuit, the other calls never reached Redis
+    assert down.calls == 2 and redis_client.breaker(URL).state == 'open'
+
+    now[0] = 11
+    assert redis_client.call(lambda r: r.get('k'), lambda: 'local') == 'local'
+    assert down.calls == 3  # one failed PING, circuit re-opened
+
+    redis_client._clients[URL] = fakeredis.FakeRedis()
+    now[0] = 22
+    assert redis_client.call(lambda r: r.set('k', 1), lambda: 'local') is True
+    assert redis_client.breaker(URL).state == 'closed'
+
+
+def test_otp_falls_back_to_expiring_memory_store(redis_app, monkeypatch):
+    make_user('alice')
+    redis_client.set_client(DownRedis(), URL)
+    assert otp_service.send_otp('alice')['success']
+    [(contact, (_, code))] = otp_service.otp_storage._data.items()
+    assert contact == 'alice'
+    # Redis is back, the OTP stored meanwhile still verifies
+    redis_client.set_client(fakeredis.FakeRedis(), URL)
+    assert otp_service._verify_otp('alice', code)
+    assert otp_service.reset_password('alice', code, 'new-password')['success']
+    assert otp_service.otp_storage.get('alice') is None
+
+    clock = [0.0]
+    store = otp_service.otp_storage
+    monkeypatch.setattr(store, '_clock', lambda: clock[0])
+    store.set('bob', '123456', ttl=300)
+    clock[0] = 301
+    assert store.get('bob') is None and len(store) == 0
@@ -0,0 +1,67 @@
+import os
+
+import flask_migrate
+from flask import Flask
+from sqlalchemy import inspect
+
+from config.database import current_revision, db, ensure_schema, head_revision, init_db, migrate
+from conftest import QueryCounter
+import models.block_model  # noqa: F401  (register every table on db.metadata)
+import models.contact_model  # noqa: F401
+import models.contact_sync_model  # noqa: F401
+import models.conversation_summary_model  # noqa: F401
+import models.friend_model  # noqa: F401
+import models.group_model  # noqa: F401
+import models.message_model  # noqa: F401
+import models.message_reaction_model  # noqa: F401
+import models.sticker_model  # noqa: F401
+import models.user_model  # noqa: F401
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'migrations')
+
+
+def _app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'chat.db'}",
+                      SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    init_db(app)
+    migrate.init_app(app, db, directory=MIGRATIONS)
+    return app
+
+
+def _indexes(table):
+    return {ix['name'] for ix in inspect(db.engine).get_indexes(table)}
+
+
+def test_fresh_database_is_created_and_stamped(tmp_path):
+    app = _app(tmp_path)
+    with app.app_context():
+        assert ensure_schema(app) == 'created'
+        assert current_revision() == head_revision(app)
+        assert 'uq_group_member_group_user' in _indexes('group_member')
+
+        # next boot: no create_all, no table introspection
+        with QueryCounter(db.engine) as qc:
+            assert ensure_schema(app) == 'current'
+        assert not [sql for sql in qc.statements if 'table_info' in sql.lower() or 'create' in sql.lower()]
+        db.engine.dispose()
+
+
+def test_upgrade_dedupes_and_adds_indexes(tmp_path):
+    app = _app(tmp_path)
+    with app.app_context():
+        db.create_all()
+        for name in ('uq_group_member_group_user', 'ix_group_member_user_id'):
+            db.session.execute(db.text(f'DROP INDEX {name}'))
+        db.session.execute(db.text("INSERT INTO user (id, username, password_hash) VALUES (1, 'a', 'x'), (2, 'b', 'x')"))
+        db.session.execute(db.text("INSERT INTO \"group\" (id, name, owner_id) VALUES (1, 'g', 1)"))
+        db.session.execute(db.text('INSERT INTO group_member (group_id, user_id) VALUES (1, 2), (1, 2), (1, 1)'))
+        db.session.commit()
+        flask_migrate.stamp(MIGRATIONS, 'b71d4c08e5a2')
+
+        assert ensure_schema(app) == 'upgraded'
+        assert current_revision() == head_revision(app)
+        rows = db.session.execute(db.text('SELECT user_id FROM group_member ORDER BY id')).scalars().all()
+        assert rows == [2, 1]
+        assert {'uq_group_member_group_user', 'ix_group_member_user_id'} <= _indexes('group_member')
+        db.engine.dispose()
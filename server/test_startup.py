@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from commands import register_commands
+from models.user_model import User
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+# cumulative `import app` time (module import + create_app) on a database already at head
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', '1500'))
+LAZY_MODULES = ('boto3', 'botocore', 'pyngrok')
+
+
+def _import_app(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'chat.db'}", LOG_LEVEL='WARNING',
+               EXCHANGE_LOG_FILE=str(tmp_path / 'exchange.jsonl'), EXCHANGE_LOG_ECHO='false',
+               MULTI_NODE='false', MESSAGE_WRITE_BEHIND='false')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=SERVER_DIR, env=env,
+                          capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                timings.setdefault(name.strip(), int(cumulative) / 1000.0)
+    return timings
+
+
+def test_import_app_within_budget_without_heavy_deps(tmp_path):
+    _import_app(tmp_path)  # first boot creates + stamps the database
+    timings = _import_app(tmp_path)
+
+    assert timings['app'] <= STARTUP_BUDGET_MS, f"import app took {timings['app']:.0f}ms (budget {STARTUP_BUDGET_MS:.0f}ms)"
+    assert not [m for m in timings if m.split('.')[0] in LAZY_MODULES]
+    # no demo seeding on boot
+    with sqlite3.connect(tmp_path / 'chat.db') as conn:
+        assert conn.execute('SELECT COUNT(*) FROM user').fetchone()[0] == 0
+
+
+def test_seed_demo_command(app):
+    register_commands(app)
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['seed-demo'])
+    assert 'alice, bob, carol' in result.output
+    assert User.query.count() == 3
+    assert 'nothing seeded' in runner.invoke(args=['seed-demo']).output
@@ -0,0 +1,51 @@
+import pytest
+from flask import Flask
+
+from config.database import db, engine_options, init_db, resolve_profile
+
+
+def _app(uri, **config):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=uri, SQLALCHEMY_TRACK_MODIFICATIONS=False, **config)
+    return app
+
+
+def _pragma(name):
+    return db.session.execute(db.text(f'PRAGMA {name}')).scalar()
+
+
+def test_profile_resolution():
+    assert resolve_profile({'SQLALCHEMY_DATABASE_URI': 'sqlite:///x.db'}) == 'sqlite-wal'
+    assert resolve_profile({'SQLALCHEMY_DATABASE_URI': 'postgresql://u@h/db'}) == 'postgres'
+    assert resolve_profile({'SQLALCHEMY_DATABASE_URI': 'sqlite:///x.db', 'STORAGE_PROFILE': 'sqlite'}) == 'sqlite'
+    with pytest.raises(ValueError):
+        resolve_profile({'STORAGE_PROFILE': 'mysql'})
+
+
+def test_postgres_pool_options():
+    opts = engine_options('postgres', {'SQLALCHEMY_DATABASE_URI': 'postgresql://u@h/db', 'DB_POOL_SIZE': 5})
+    assert opts['pool_size'] == 5 and opts['pool_pre_ping'] is True
+    # explicit engine options still win
+    opts = engine_options('postgres', {'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': 50}})
+    assert opts['pool_size'] == 50
+
+
+def test_sqlite_wal_pragmas_applied_on_connect(tmp_path):
+    app = _app(f"sqlite:///{tmp_path / 'chat.db'}", SQLITE_BUSY_TIMEOUT_MS=1234)
+    assert init_db(app) == 'sqlite-wal'
+    with app.app_context():
+        assert _pragma('journal_mode') == 'wal'
+        assert _pragma('synchronous') == 1  # NORMAL
+        assert _pragma('busy_timeout') == 1234
+        assert _pragma('cache_size') == -64 * 1024
+        assert db.engine.pool.size() == 10
+        db.engine.dispose()
+
+
+def test_legacy_sqlite_profile_keeps_rollback_journal(tmp_path):
+    app = _app(f"sqlite:///{tmp_path / 'chat.db'}", STORAGE_PROFILE='sqlite')
+    init_db(app)
+    with app.app_context():
+        assert _pragma('journal_mode') == 'delete'
+        assert _pragma('synchronous') == 2  # FULL
+        db.engine.dispose()
@@ -0,0 +1,45 @@
+from conftest import make_user
+from services import typing_indicator
+from services.typing_indicator import TypingCoalescer
+
+
+def _typing(client):
+    return [e['args'][0]['is_typing'] for e in client.get_received() if e['name'] == 'user_typing']
+
+
+def test_repeated_typing_events_are_coalesced(app, socketio):
+    alice, bob = make_user('alice'), make_user('bob')
+    sender, receiver = socketio.test_client(app), socketio.test_client(app)
+    receiver.emit('join', {'user_id': bob.id})
+    receiver.get_received()
+
+    for _ in range(10):
+        sender.emit('typing', {'sender_id': alice.id, 'receiver_id': bob.id, 'is_typing': True})
+    sender.emit('typing', {'sender_id': alice.id, 'receiver_id': bob.id, 'is_typing': False})
+    sender.emit('typing', {'sender_id': alice.id, 'receiver_id': bob.id, 'is_typing': False})
+
+    assert _typing(receiver) == [True, False]
+    room = typing_indicator.coalescer.stats()['rooms'][f'user-{bob.id}']
+    assert room == {'emitted': 2, 'dropped': 10}
+
+
+def test_typing_stops_when_the_window_expires(app, socketio, monkeypatch):
+    alice, bob = make_user('alice'), make_user('bob')
+    receiver = socketio.test_client(app)
+    receiver.emit('join', {'user_id': bob.id})
+    receiver.get_received()
+    now = [0.0]
+    coalescer = TypingCoalescer(timeout=5, clock=lambda: now[0])
+    monkeypatch.setattr(typing_indicator, 'coalescer', coalescer)
+    sender = socketio.test_client(app)
+    sender.emit('typing', {'sender_id': alice.id, 'receiver_id': bob.id, 'is_typing': True})
+    now[0] = 4
+    # still typing: only pushes the deadline back
+    sender.emit('typing', {'sender_id': alice.id, 'receiver_id': bob.id, 'is_typing': True})
+    now[0] = 8
+    typing_indicator.emit_expired(socketio)
+    assert _typing(receiver) == [True]
+    now[0] = 9
+    typing_indicator.emit_expired(socketio)
+    assert _typing(receiver) == [False]
+    assert coalescer.stats()['typing_now'] == 0
@@ -0,0 +1,107 @@
+import pytest
+
+from config.database import db
+from conftest import QueryCounter
+from models.friend_model import Friend
+from models.user_model import User
+from services import user_search
+from services.auth_service import create_token_for_user
+from services.presence import registry as presence
+
+
+@pytest.fixture
+def client(app):
+    from routes.users import users_bp
+    app.register_blueprint(users_bp)
+    presence.clear()
+    return app.test_client()
+
+
+def _user(username, display_name=None):
+    u = User(username=username, password_hash='x', display_name=display_name)
+    db.session.add(u)
+    db.session.commit()
+    return u
+
+
+def _befriend(a, b):
+    db.session.add(Friend(user_id=a.id, friend_id=b.id, status='accepted'))
+    db.session.commit()
+
+
+def _names(resp):
+    assert resp.status_code == 200
+    return [u['username'] for u in resp.get_json()]
+
+
+def test_search_is_accent_insensitive_and_ranked(client):
+    _user('lan', 'Lan')
+    _user('anh', 'Nguyễn Văn Anh')
+    _user('an', 'An')
+    _user('tuan', 'Đặng Tuấn')
+
+    assert _names(client.get('/users/search?q=Nguyen')) == ['anh']
+    assert _names(client.get('/users/search?q=dang tuan')) == ['tuan']
+    # exact, then prefix; 2 letters are too short for the infix fallback
+    assert _names(client.get('/users/search?q=AN')) == ['an', 'anh']
+    # infix matches come after the prefix ones
+    assert _names(client.get('/users/search?q=tua')) == ['tuan']
+    assert _names(client.get('/users/search?q=uấn')) == ['tuan']
+    assert _names(client.get('/users/search?q=van a')) == ['anh']
+
+
+def test_friends_of_friends_rank_first_within_a_tier(client):
+    me, friend = _user('me'), _user('friend')
+    minh1, minh2, minh3 = _user('minh1'), _user('minh2'), _user('minh3')
+    _befriend(me, friend)
+    _befriend(friend, minh3)
+    _befriend(minh2, friend)
+    _befriend(minh2, me)  # a direct friend is not a mutual of itself
+
+    resp = client.get('/users/search?q=minh', headers={'Authorization': f'Bearer {create_token_for_user(me)}'})
+    assert _names(resp) == ['minh2', 'minh3', 'minh1']
+    assert [u['mutuals'] for u in resp.get_json()] == [1, 1, 0]
+    # anonymous callers get the plain ranking
+    assert _names(client.get('/users/search?q=minh')) == ['minh1', 'minh2', 'minh3']
+
+
+def test_renamed_users_are_found_by_their_new_name(client):
+    u = _user('u1', 'Phạm Hương')
+    assert _names(client.get('/users/search?q=huong')) == ['u1']
+    u.display_name = 'Lê Thảo'
+    db.session.commit()
+    assert _names(client.get('/users/search?q=huong')) == []
+    assert _names(client.get('/users/search?q=thao')) == ['u1']
+    db.session.delete(u)
+    db.session.commit()
+    assert _names(client.get('/users/search?q=thao')) == []
+
+
+def test_search_uses_the_indexes(app):
+    for i in range(30):
+        _user(f'user{i}', f'Người dùng {i}')
+    db.session.remove()
+    with QueryCounter(db.engine) as qc:
+        assert len(user_search.search('nguoi dung 1', limit=5)) == 5
+    # two prefix range scans, no infix fallback, no mutual lookup without a viewer
+    assert len(qc.statements) == 2
+    plan = db.session.execute(db.text(
+        "EXPLAIN QUERY PLAN SELECT id FROM user WHERE search_name >= 'ng' AND search_name < 'ng\U0010ffff'")).all()
+    assert 'ix_user_search_name' in str(plan)
+
+
+def test_friends_of_friends_outside_the_alphabetical_window_are_found(app):
+    me, friend = _user('me'), _user('friend')
+    for i in range(5):
+        _user(f'minh{i}')
+    late = _user('minhz', 'Zuong Minh')
+    _befriend(me, friend)
+    _befriend(late, friend)
+    me_id, late_id = me.id, late.id
+    db.session.remove()
+
+    hits = user_search.search('minh', viewer_id=me_id, limit=3)
+    assert [(u.id, n) for u, n in hits][0] == (late_id, 1)
+    assert len(hits) == 3
+    # a stranger's view of the same query stops at the window
+    assert late_id not in [u.id for u, _ in user_search.search('minh', limit=3)]
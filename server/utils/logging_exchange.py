@@ -1,14 +1,26 @@
-
 import json
 import time
 import uuid
+import queue
+import atexit
 import threading
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from flask import request, g
 
-LOG_FILE = 'server/logs/exchange.log.json'
-LOG_LOCK = threading.Lock()
+# Log dạng JSON Lines (mỗi dòng một entry) - chỉ append, không đọc lại cả file.
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
+LOG_FILE = os.environ.get('EXCHANGE_LOG_FILE', os.path.join(LOG_DIR, 'exchange.log.jsonl'))
+
+# Rotation: xoay file khi vượt quá kích thước hoặc quá thời gian (0 = tắt)
+LOG_MAX_BYTES = int(os.environ.get('EXCHANGE_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_ROTATE_SECONDS = int(os.environ.get('EXCHANGE_LOG_ROTATE_SECONDS', str(24 * 3600)))
+LOG_BACKUP_COUNT = int(os.environ.get('EXCHANGE_LOG_BACKUP_COUNT', '5'))
+# Hàng đợi trong bộ nhớ có giới hạn; khi đầy thì bỏ entry và đếm số lượng bị bỏ
+LOG_QUEUE_SIZE = int(os.environ.get('EXCHANGE_LOG_QUEUE_SIZE', '10000'))
+LOG_FLUSH_INTERVAL = float(os.environ.get('EXCHANGE_LOG_FLUSH_INTERVAL', '0.5'))
+# In entry ra stdout (hành vi cũ); tắt bằng EXCHANGE_LOG_ECHO=false
+LOG_ECHO = os.environ.get('EXCHANGE_LOG_ECHO', 'true').lower() == 'true'
 
 SENSITIVE_KEYS = {'password', 'otp', 'token', 'phone'}
 MASK = '***MASKED***'
@@ -21,19 +33,173 @@ def mask_sensitive(data):
         return [mask_sensitive(v) for v in data]
     return data
 
-def write_log(entry, columns=None):
-    with LOG_LOCK:
-        logs = []
-        if os.path.exists(LOG_FILE):
+
+class ExchangeLogWriter:
+    """Append-only JSON Lines writer with a background flush thread.
+
+    Callers only enqueue entries (non-blocking); a daemon thread drains the
+    queue in batches, appends them to `path` and rotates the file by size or
+    age. When the queue is full the entry is dropped and counted in `dropped`
+    so request latency never depends on disk speed or log size.
+    """
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, rotate_seconds=LOG_ROTATE_SECONDS,
+                 backup_count=LOG_BACKUP_COUNT, queue_size=LOG_QUEUE_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._file = None
+        self._opened_at = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='exchange-log-writer', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, entry):
+        """Queue one entry for writing. Returns False if it was dropped."""
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+
+    def flush(self, timeout=5.0):
+        """Block until every queued entry has been written (used by tests/shutdown)."""
+        # Queue.join() has no timeout: wait for it in a helper thread instead
+        waiter = threading.Thread(target=self._queue.join, name='exchange-log-flush', daemon=True)
+        waiter.start()
+        waiter.join(timeout)
+        with self._lock:
+            if self._file:
+                self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'rotations': self.rotations,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            # gom thêm các entry đang chờ để ghi một lần
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
             try:
-                with open(LOG_FILE, 'r', encoding='utf-8') as f:
-                    logs = json.load(f)
+                self._write_batch(batch)
             except Exception:
-                logs = []
-        entry['source'] = 'server'
-        logs.append(entry)
-        with open(LOG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(logs, f, ensure_ascii=False, indent=2)
+                with self._stats_lock:
+                    self.dropped += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch):
+        lines = ''.join(json.dumps(e, ensure_ascii=False, default=str) + '\n' for e in batch)
+        with self._lock:
+            self._maybe_rotate()
+            if self._file is None:
+                self._open()
+            self._file.write(lines)
+            self._file.flush()
+            self.written += len(batch)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._opened_at = self._started_at() if os.path.exists(self.path) else time.time()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _started_at(self):
+        """Age origin of an existing log file, so a restart does not postpone rotation.
+
+        Creation time where the OS records it, else the time of the first
+        entry (Linux has no birth time in os.stat), else the last write.
+        """
+        st = os.stat(self.path)
+        born = getattr(st, 'st_birthtime', None)
+        if born:
+            return born
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                first = json.loads(f.readline())
+            stamp = first.get('time') or first.get('time_start') or first.get('time_end')
+            return datetime.fromisoformat(stamp).replace(tzinfo=timezone.utc).timestamp()
+        except (ValueError, TypeError, AttributeError):
+            return st.st_mtime
+
+    def _maybe_rotate(self):
+        if self._file is None:
+            if not os.path.exists(self.path):
+                return
+            self._open()
+        too_big = self.max_bytes and self._file.tell() >= self.max_bytes
+        too_old = self.rotate_seconds and (time.time() - self._opened_at) >= self.rotate_seconds
+        if not (too_big or too_old) or self._file.tell() == 0:
+            return
+        self._file.close()
+        self._file = None
+        # exchange.log.jsonl -> exchange.log.jsonl.1 -> ... -> .N (cũ nhất bị xoá)
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f'{self.path}.{i}'
+            if os.path.exists(src):
+                os.replace(src, f'{self.path}.{i + 1}')
+        if self.backup_count > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+
+_writer = ExchangeLogWriter(LOG_FILE)
+atexit.register(_writer.close)
+
+
+def get_writer():
+    return _writer
+
+
+def write_log(entry, columns=None):
+    entry['source'] = 'server'
+    _writer.enqueue(entry)
 
 # Generate summary for request body
 def summarize_body(body):
@@ -66,7 +232,8 @@ def log_http_exchange(event_name, user_id=None, status=None, extra=None, stage="
     }
     columns = ['request_id','event_name','time_start','time_end','duration_ms','method','url','user_id','ip','body_summary','status','extra']
     write_log(entry, columns)
-    print('[LOG]', entry)
+    if LOG_ECHO:
+        print('[LOG]', entry)
 
 # Main logger for socket event
 def log_socket_event(event_name, from_user=None, to_user=None, to_room=None, payload=None):
@@ -81,7 +248,8 @@ def log_socket_event(event_name, from_user=None, to_user=None, to_room=None, pay
     }
     columns = ['request_id','event_name','time','from_user','to_user','to_room','payload_summary']
     write_log(entry, columns)
-    print('[SOCKET]', entry)
+    if LOG_ECHO:
+        print('[SOCKET]', entry)
 
 # Main logger for upload
 def log_upload(user_id, filename, file_size, status, duration_ms):
@@ -97,4 +265,5 @@ def log_upload(user_id, filename, file_size, status, duration_ms):
     }
     columns = ['request_id','event_name','time','user_id','filename','file_size','status','duration_ms']
     write_log(entry, columns)
-    print('[UPLOAD]', entry)
+    if LOG_ECHO:
+        print('[UPLOAD]', entry)
@@ -0,0 +1,11 @@
+import unicodedata
+
+
+def fold(value):
+    """Lowercase, strip diacritics and collapse spaces: ' Đường  Hà Nội' -> 'duong ha noi'.
+
+    Shared by message search (query side) and the normalized user search
+    columns, so what is typed and what is stored fold the same way.
+    """
+    value = unicodedata.normalize('NFD', (value or '').lower().replace('đ', 'd'))
+    return ' '.join(''.join(ch for ch in value if not unicodedata.combining(ch)).split())
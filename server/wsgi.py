@@ -0,0 +1,31 @@
+"""Production entry point: gevent worker with a connection cap.
+
+    python wsgi.py            (or scripts/run_backend.sh with BACKEND_MODE=production)
+
+Differences from `python app.py` (Werkzeug threading dev server):
+  - gevent monkey-patching and Socket.IO async_mode='gevent', so idle
+    websocket/polling connections cost a greenlet instead of an OS thread;
+  - at most MAX_CONNECTIONS concurrent connections (gevent Pool passed to the
+    WSGIServer as `spawn`); further clients wait in the listen backlog;
+  - blocking SQLAlchemy work runs in a DB_THREADPOOL_SIZE thread pool (see
+    services/offload.py) so one slow commit does not freeze every socket.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import os
+
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'gevent')
+
+from gevent.pool import Pool
+
+from app import app, socketio, logger
+
+if __name__ == '__main__':
+    host = os.environ.get('BACKEND_HOST', '0.0.0.0')
+    port = int(os.environ.get('BACKEND_PORT', '5000'))
+    max_connections = app.config.get('MAX_CONNECTIONS', 1000)
+    logger.info('Starting gevent worker on %s:%s (max %s connections, %s DB threads)',
+                host, port, max_connections, app.config.get('DB_THREADPOOL_SIZE'))
+    socketio.run(app, host=host, port=port, debug=False, log_output=False,
+                 spawn=Pool(max_connections))